@@ -1,20 +1,32 @@
 import os
 import re
 import subprocess
-from typing import Tuple, Optional, List, Iterable
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Tuple, Optional, List
 
 import numpy as np
-import pandas as pd
 
-
-# -----------------------------
-# Helpers
-# -----------------------------
-def _split_csv_like(s: str) -> List[str]:
-    """
-    Split an input like 'a, b ,c' into ['a','b','c'] with trimming and no empties.
-    """
-    return [t.strip() for t in s.split(",") if t.strip()]
+from src.check_result import CheckResult, parse_batch_output, parse_check_output
+from src.config import COMPLEX_TASK_TYPES
+from src.figures import figure_base, get_figure_policy
+from src.metadata import allows_subcircuits, get_store
+from src.netlist_ir import CUTOFF, GROUND, TRIODE, MosfetTable, Netlist
+from src.prompts import load_template
+from src.sim_batch import BATCHABLE_TYPES
+from src.sim_pool import run_python
+from src.simulator import run_code
+from src.static_check import analyze_design_file
+from src.task_rules import get_rule_engine
+
+TEST_BENCH_DIR = Path(__file__).resolve().parent.parent / "test_bench"
+# Task types whose test bench runs in the pipeline. The other test benches
+# (VCO, PLL and the COMPLEX_TASK_TYPES of src/config.py) need the bias voltage of the
+# retrieved subcircuits substituted for [BIAS_VOLTAGE] and are not run here;
+# those designs are judged by the static and operating-point stages only.
+CHECKER_TYPES = ("CurrentMirror", "Inverter", "Amplifier", "Opamp")
 
 
 # -----------------------------
@@ -169,185 +181,198 @@ def connect_vinn_vinp(dc_sweep_code: str,
 
 
 # -----------------------------
-# Tables / notes / call info
+# Checking / validation
 # -----------------------------
-def get_subcircuits_info(subcircuits: Iterable[int],
-                         lib_data_path: str = "lib_info.tsv",
-                         task_data_path: str = "problem_set.tsv") -> str:
+def _test_bench_code(task_type: str, figure_path: str = "") -> str:
+    """Checker source for a task type, preceded by the shared result-protocol prelude.
+
+    figure_path is where the check's figure data goes under the current figure
+    policy (see src/figures.py); without one no figure is kept.
     """
-    Build a tab-separated info table for the requested subcircuit IDs.
+    prelude = (TEST_BENCH_DIR / "_prelude.py").read_text()
+    prelude = prelude.replace("[FIGURE_POLICY]", get_figure_policy() if figure_path else "off")
+    prelude = prelude.replace("[FIGURE_PATH]", figure_path)
+    return prelude + "\n" + (TEST_BENCH_DIR / f"{task_type}.py").read_text()
+
+
+def _checker_design_code(code_path: str, task_type: str) -> str:
+    """Design code as the checker runs it: Amplifier/Opamp inputs also get a 1 uV AC drive."""
+    with open(code_path, "r") as fcode:
+        lines = fcode.readlines()
+    if task_type not in ("Amplifier", "Opamp"):
+        return "".join(lines)
+    out = []
+    for line in lines:
+        if line.startswith("circuit.V") and "vin" in line.lower():
+            parts = line.split("#")[0].strip().rstrip(")").split(",")
+            raw_voltage = parts[-1].strip()
+            if raw_voltage and raw_voltage[0] in ("'", '"'):
+                raw_voltage = raw_voltage[1:-1]
+            voltage = raw_voltage.split(" ")[1] if "dc" in raw_voltage.lower() else raw_voltage
+            parts[-1] = f' "dc {voltage} ac 1u"'
+            line = ",".join(parts) + ")\n"
+        out.append(line)
+    return "".join(out)
+
+
+def static_precheck(task_id: int, code_path: str, task_type: str) -> Optional[CheckResult]:
     """
-    lib_df = pd.read_csv(lib_data_path, delimiter="\t")
-    task_df = pd.read_csv(task_data_path, delimiter="\t")
-
-    columns = [
-        "Id",
-        "Circuit Type",
-        "Gain/Differential-mode gain (dB)",
-        "Common-mode gain (dB)",
-        "Input",
-        "Output",
-    ]
-    subcircuits_df = pd.DataFrame(columns=columns)
-
-    for sub_id in subcircuits:
-        # .item() will raise if missing; that's fine to surface a clean error
-        sub_type = task_df.loc[task_df["Id"] == sub_id, "Type"].item()
-        sub_gain = float(lib_df.loc[lib_df["Id"] == sub_id, "Av (dB)"].item())
-        sub_com_gain = float(lib_df.loc[lib_df["Id"] == sub_id, "Com Av (dB)"].item())
-
-        sub_input = task_df.loc[task_df["Id"] == sub_id, "Input"].item()
-        input_node_list = [n for n in _split_csv_like(sub_input) if "bias" not in n.lower()]
-
-        sub_output = task_df.loc[task_df["Id"] == sub_id, "Output"].item()
-        # keep only "plain" outputs (drop differential labels), case-insensitive
-        output_node_list = [
-            n for n in _split_csv_like(sub_output)
-            if ("outn" not in n.lower() and "outp" not in n.lower())
-        ]
-
-        new_row = {
-            "Id": sub_id,
-            "Circuit Type": sub_type,
-            "Gain/Differential-mode gain (dB)": f"{sub_gain:.2f}",
-            "Common-mode gain (dB)": f"{sub_com_gain:.2f}",
-            "Input": ", ".join(input_node_list),
-            "Output": ", ".join(output_node_list),
-        }
-        subcircuits_df = pd.concat([subcircuits_df, pd.DataFrame([new_row])], ignore_index=True)
-
-    return subcircuits_df.to_csv(sep="\t", index=False)
-
-
-def get_note_info(subcircuits: Iterable[int],
-                  lib_data_path: str = "lib_info.tsv",
-                  task_data_path: str = "problem_set.tsv"):
+    Judge a design from its source alone (see static_check). Returns a failed
+    result carrying the error feedback, or None if the design needs simulating.
     """
-    Compose note text for amplifier/opamp subcircuits; also return bias voltage.
-    Returns (note_info: str, sub_bias_voltage: float)
+    try:
+        row = get_store().task(task_id)
+        input_nodes, output_nodes = row.input_nodes, row.output_nodes
+    except (KeyError, ValueError, TypeError):
+        input_nodes, output_nodes = [], []
+    report = analyze_design_file(code_path, input_nodes, output_nodes,
+                                 allow_subcircuits=allows_subcircuits(task_type))
+    if report.ok:
+        return None
+    return CheckResult(passed=False, code=report.code, message=report.feedback())
+
+
+def run_checker(task_id: int, code_path: str, task_type: str, precheck: bool = True) -> CheckResult:
     """
-    lib_df = pd.read_csv(lib_data_path, delimiter="\t")
-    task_df = pd.read_csv(task_data_path, delimiter="\t")
-
-    note_info_lines: List[str] = []
-    sub_bias_voltage = 0.0  # last seen
-
-    for sub_id in subcircuits:
-        sub_type = task_df.loc[task_df["Id"] == sub_id, "Type"].item()
-        sub_name = task_df.loc[task_df["Id"] == sub_id, "Submodule Name"].item()
-        sub_bias_voltage = float(lib_df.loc[lib_df["Id"] == sub_id, "Voltage Bias"].item())
-
-        # Only craft notes for amplifier-like types
-        if ("Amplifier" not in sub_type) and ("Opamp" not in sub_type):
-            continue
-
-        # Column name as provided (kept verbatim)
-        sub_phase = task_df.loc[task_df["Id"] == sub_id, "Vin(n) Phase"].item()
-        other_sub_phase = "non-inverting" if str(sub_phase).lower() == "inverting" else "inverting"
-
-        if sub_type == "Amplifier":
-            note_info_lines.append(f"The Vin of {sub_name} is the {sub_phase} input.")
-            note_info_lines.append(f"There is NO {other_sub_phase} input in {sub_name}.")
-            note_info_lines.append(f"The DC operating voltage for Vin is {sub_bias_voltage} V.")
-        elif sub_type == "Opamp":
-            note_info_lines.append(f"The Vinn of {sub_name} is the {sub_phase} input.")
-            note_info_lines.append(f"The Vinp of {sub_name} is the {other_sub_phase} input.")
-            note_info_lines.append(f"The DC operating voltage for Vinn/Vinp is {sub_bias_voltage} V.")
+    Append the checker code for the given task type, execute it in the
+    simulation pool and return its parsed result record. Designs that fail
+    the static pre-check are rejected without simulating (unless the caller
+    already ran it: precheck=False).
+    """
+    fwrite_code_path = f"{code_path.rsplit('.', 1)[0]}_check.py"
+    if task_type not in CHECKER_TYPES:
+        return CheckResult(passed=True, code="no_checker")
+    check = static_precheck(task_id, code_path, task_type) if precheck else None
+    if check is not None:
+        print(check.message)
+        print(f"function error ({check.code}).")
+        return check
+    try:
+        test_code = _test_bench_code(task_type, figure_base(fwrite_code_path))
+        design_code = _checker_design_code(code_path, task_type)
+        with open(fwrite_code_path, "w") as out:
+            out.write(design_code + "\n" + test_code)
+    except FileNotFoundError as e:
+        # Bubble up a clean message if check files are missing
+        return CheckResult(passed=False, code="checker_missing", message=f"Checker assets missing: {e}")
 
-    return ("\n".join(note_info_lines) + ("\n" if note_info_lines else "")), sub_bias_voltage
+    try:
+        result = run_python(fwrite_code_path)
+        check = parse_check_output(result.returncode, result.stdout, result.stderr)
+    except subprocess.CalledProcessError as e:
+        print("e.stderr", e.stderr)
+        check = parse_check_output(e.returncode, e.stdout or "", e.stderr or "")
+    except subprocess.TimeoutExpired:
+        check = CheckResult(passed=False, code="timeout", message="The checker timed out.\n", returncode=-9)
+    print(check.message)
+    print("function correct." if check.passed else f"function error ({check.code}).")
+    return check
 
 
-def get_call_info(subcircuits: Iterable[int],
-                  lib_data_path: str = "lib_info.tsv",
-                  task_data_path: str = "problem_set.tsv") -> str:
+def run_checkers(task_id: int, code_paths: List[str], task_type: str, precheck: bool = True) -> List[CheckResult]:
     """
-    Return example usage snippets for the subcircuits.
-    Uses info from problem_set.tsv to build an X-instance call with proper pin order.
+    Check several candidate designs of one task. Batchable task types are
+    simulated together in one job (see sim_batch); candidates the batch
+    could not judge are checked one by one with run_checker.
     """
-    task_df = pd.read_csv(task_data_path, delimiter="\t")
-
-    template = (
-        "```python\n"
-        "from p[ID]_lib import *\n"
-        "# declare the subcircuit\n"
-        "circuit.subcircuit([SUBMODULE_NAME]())\n"
-        "# create a subcircuit instance\n"
-        "circuit.X('1', '[SUBMODULE_NAME]', [INPUT_OUTPUT])\n"
-        "```\n"
-    )
-
-    call_info_parts: List[str] = []
-    for sub_id in subcircuits:
-        row = task_df.loc[task_df["Id"] == sub_id]
-        if row.empty:
-            # Surface an explicit, concise message per missing ID
-            call_info_parts.append(f"# Warning: subcircuit Id {sub_id} not found in {task_data_path}\n")
-            continue
-
-        submodule_name = row["Submodule Name"].item()
-        # Build pin list (inputs then outputs), preserving CSV order given in file
-        inputs = _split_csv_like(row["Input"].item())
-        outputs = _split_csv_like(row["Output"].item())
-        io = ", ".join([*inputs, *outputs])  # PySpice expects ordered node list
+    results: Dict[int, CheckResult] = {}
+    if precheck and task_type in BATCHABLE_TYPES:
+        for i, path in enumerate(code_paths):
+            check = static_precheck(task_id, path, task_type)
+            if check is not None:
+                results[i] = check
+    pending = [i for i in range(len(code_paths)) if i not in results]
+    if len(pending) > 1 and task_type in BATCHABLE_TYPES:
+        # Only the netlist part: the batch runs its own analyses, not the designs'.
+        codes = [_netlist_part(_checker_design_code(code_paths[i], task_type)) for i in pending]
+        job_path = f"{code_paths[pending[0]].rsplit('.', 1)[0]}_batch_check.py"
+        with open(job_path, "w") as out:
+            out.write("from src.sim_batch import run_batch_job\n"
+                      f"run_batch_job({task_type!r}, {codes!r}, {[code_paths[i] for i in pending]!r})\n")
+        try:
+            batch = parse_batch_output(run_python(job_path).stdout)
+            results.update((pending[j], check) for j, check in batch.items())
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            print(f"Batch check failed, checking candidates one by one: {e}")
+    return [results[i] if i in results else run_checker(task_id, path, task_type, precheck=precheck)
+            for i, path in enumerate(code_paths)]
 
-        snippet = template.replace("[ID]", str(sub_id)) \
-                          .replace("[SUBMODULE_NAME]", submodule_name) \
-                          .replace("[INPUT_OUTPUT]", io)
-        call_info_parts.append(snippet)
 
-    return "".join(call_info_parts)
+def check_function(task_id: int, code_path: str, task_type: str):
+    """
+    Run the checker for the given task type. Returns (func_error_flag, message).
+    """
+    check = run_checker(task_id, code_path, task_type)
+    return (0, "") if check.passed else (1, check.message)
 
 
 # -----------------------------
-# Checking / validation
+# Netlist checks (on the IR of src/netlist_ir.py, task rules in src/task_rules.py)
 # -----------------------------
-def check_function(task_id: int, code_path: str, task_type: str):
-    """
-    Append the checker code for the given task type and execute it.
-    Returns (func_error_flag, message).
+def _op_voltages(netlist: Netlist, op_text: str) -> np.ndarray:
+    """Operating-point voltage of every netlist node (0 for nodes missing from the OP file)."""
+    voltages = np.zeros(netlist.n_nodes)
+    for line in op_text.splitlines():
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        node = netlist.node(parts[0])
+        if node > 0:
+            try:
+                voltages[node] = float(parts[1])
+            except ValueError:
+                continue
+    return voltages
+
+
+def _mosfet_messages(netlist: Netlist, mos: MosfetTable, voltages: np.ndarray) -> Tuple[str, str]:
     """
-    fwrite_code_path = f"{code_path.rsplit('.', 1)[0]}_check.py"
-    try:
-        if task_type == "CurrentMirror":
-            with open("../test_bench/CurrentMirror.py", "r") as ftest, open(code_path, "r") as fcode, open(fwrite_code_path, "w") as out:
-                out.write(fcode.read() + "\n" + ftest.read())
-        elif task_type in ("Amplifier", "Opamp"):
-            test_code = open(f"test_bench/{task_type}.py", "r").read()
-            with open(code_path, "r") as fcode, open(fwrite_code_path, "w") as out:
-                for line in fcode.readlines():
-                    if line.startswith("circuit.V") and "vin" in line.lower():
-                        parts = line.split("#")[0].strip().rstrip(")").split(",")
-                        raw_voltage = parts[-1].strip()
-                        if raw_voltage and raw_voltage[0] in ("'", '"'):
-                            raw_voltage = raw_voltage[1:-1]
-                        voltage = raw_voltage.split(" ")[1] if "dc" in raw_voltage.lower() else raw_voltage
-                        parts[-1] = f' "dc {voltage} ac 1u"'
-                        line = ",".join(parts) + ")\n"
-                    out.write(line)
-                out.write("\n" + test_code)
-        elif task_type == "Inverter":
-            with open("../test_bench/Inverter.py", "r") as ftest, open(code_path, "r") as fcode, open(fwrite_code_path, "w") as out:
-                out.write(fcode.read() + "\n" + ftest.read())
-        else:
-            return 0, ""
-    except FileNotFoundError as e:
-        # Bubble up a clean message if check files are missing
-        return 1, f"Checker assets missing: {e}"
+    Operating-region diagnostics of every MOSFET. Regions are classified in one
+    vectorized pass (MosfetTable.bias, with each model's VTO); only the flagged
+    devices are turned into messages.
 
-    try:
-        result = subprocess.run(
-            ["python", "-u", fwrite_code_path],
-            check=True, text=True,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        print(result.stdout)
-        print("function correct.")
-        return 0, ""
-    except subprocess.CalledProcessError as e:
-        print("function error.")
-        print("e.stdout", e.stdout)
-        print("e.stderr", e.stderr)
-        return 1, "\n".join(e.stdout.split("\n"))
+    Returns (warnings, notes). Triode devices are only notes: MOS resistors and
+    cascode or tail devices near the edge are legitimately biased there, so
+    they never fail a design on their own.
+    """
+    if not len(mos):
+        return "", ""
+    bias = mos.bias(voltages)
+    drain_on_rail = np.where(mos.is_pmos, mos.drain == netlist.node("vdd"), mos.drain == GROUND)
+    shorted = mos.gate == mos.source
+    reversed_vds = (bias.vds < 0) & ~drain_on_rail
+    cutoff = (bias.region == CUTOFF) & ~shorted
+    triode = (bias.region == TRIODE) & ~reversed_vds & ~drain_on_rail
+    flagged = np.flatnonzero(drain_on_rail | shorted | reversed_vds | cutoff | triode)
+
+    names = netlist.node_names
+    message = notes = ""
+    for i in flagged.tolist():
+        pmos = bool(mos.is_pmos[i])
+        kind = "PMOS" if pmos else "NMOS"
+        device = f"{kind} {netlist.element_names[mos.index[i]]}"
+        drain, gate, source = names[mos.drain[i]], names[mos.gate[i]], names[mos.source[i]]
+        vgs, vds, vth = float(bias.vgs[i]), float(bias.vds[i]), float(mos.vth[i])
+        vgs_label, vds_label, vth_label = ("V_SG", "V_SD", "|V_TH|") if pmos else ("V_GS", "V_DS", "V_TH")
+        if drain_on_rail[i]:
+            message += ("Suggestion: Please avoid connecting PMOS drain to VDD directly.\n" if pmos else
+                        "Suggestion: Please avoid connecting NMOS drain to ground.\n")
+        if reversed_vds[i]:
+            direction = "higher" if pmos else "lower"
+            message += f"For {device}, the drain node ({drain}) voltage is {direction} than the source node ({source}) voltage.\n"
+            message += (f"Suggestion: Ensure the device is active and V_DS {'<' if pmos else '>'} V_GS - V_TH.\n")
+        elif triode[i]:
+            notes += (f"For {device}, {vds_label} = {vds:.3f} V is below {vgs_label} - {vth_label} = "
+                      f"{bias.overdrive[i]:.3f} V (triode region).\n")
+        if shorted[i]:
+            message += f"For {device}, the gate node ({gate}) is shorted to the source node ({source}).\n"
+            message += "Suggestion: Separate the gate and source connections.\n"
+        elif cutoff[i]:
+            message += (f"For {device}, {vgs_label} = {vgs:.3f} V is not above "
+                        f"{vth_label} = {vth:.3f} V (cutoff region).\n")
+            message += ("Suggestion: Decrease gate or increase source so that V_GS < -V_TH (pmos on).\n" if pmos else
+                        "Suggestion: Increase gate or decrease source to satisfy V_GS > V_TH.\n")
+    return message, notes
 
 
 def check_netlist(netlist_path: str,
@@ -360,25 +385,25 @@ def check_netlist(netlist_path: str,
     Analyze operating point and netlist for MOSFET sanity checks and task-specific constraints.
     Returns (warning_flag, message).
     """
-    warning = 0
     warning_message = ""
 
     if not os.path.exists(operating_point_path):
         return 0, ""
 
     fopen_op_text = open(operating_point_path, "r").read()
+    op_text_lower = fopen_op_text.lower()
 
     # Verify given input/output node names appear in OP results (case-insensitive)
+    missing_io = False
     for input_node in input_nodes.split(", "):
-        if input_node.lower() not in fopen_op_text.lower():
+        if input_node.lower() not in op_text_lower:
             warning_message += f"The given input node ({input_node}) is not found in the netlist.\n"
-            warning = 1
+            missing_io = True
     for output_node in output_nodes.split(", "):
-        if output_node.lower() not in fopen_op_text.lower():
+        if output_node.lower() not in op_text_lower:
             warning_message += f"The given output node ({output_node}) is not found in the netlist.\n"
-            warning = 1
-
-    if warning == 1:
+            missing_io = True
+    if missing_io:
         warning_message += (
             "Suggestion: You can replace the nodes actually used for input/output with the given names. "
             "Please rewrite the corrected complete code.\n"
@@ -387,202 +412,180 @@ def check_netlist(netlist_path: str,
     if task_type == "Inverter":
         return (1 if warning_message else 0), warning_message.strip()
 
-    # Parse key node voltages from OP file
-    vdd_voltage = 5.0
-    vinn_voltage = 1.0
-    vinp_voltage = 1.0
-    for line in fopen_op_text.splitlines():
-        line_l = line.lower()
-        try:
-            if line_l.startswith("vdd"):
-                vdd_voltage = float(line.split("\t")[-1])
-            if line_l.startswith("vinn"):
-                vinn_voltage = float(line.split("\t")[-1])
-            if line_l.startswith("vinp"):
-                vinp_voltage = float(line.split("\t")[-1])
-        except Exception:
-            pass
-
+    netlist = Netlist.from_file(netlist_path)
+    voltages = _op_voltages(netlist, fopen_op_text)
+    vinn, vinp = netlist.node("vinn"), netlist.node("vinp")
+    vinn_voltage = voltages[vinn] if vinn > 0 else 1.0
+    vinp_voltage = voltages[vinp] if vinp > 0 else 1.0
     if abs(vinn_voltage - vinp_voltage) > 1e-12:
         warning_message += "The given input voltages of Vinn and Vinp are not equal.\n"
-        warning = 1
         warning_message += "Suggestion: Please make sure the input voltages are equal.\n"
 
-    # Load OP voltages into dict
-    voltages: dict = {}
-    for line in fopen_op_text.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) < 2:
-            continue
-        node, voltage = parts[0], parts[1]
-        try:
-            voltages[node.lower()] = float(voltage)
-        except Exception:
-            continue
-    voltages["0"] = 0.0
-    voltages["gnd"] = 0.0
-
-    vthn = 0.5
-    vthp = 0.5
-    miller_node_1 = None
-    miller_node_2 = None
-    resistance_exist = 0
-    has_diodeload = 0
-    first_stage_out = None
-
-    with open(netlist_path, "r") as fnet:
-        for line in fnet:
-            if not line.strip() or line.startswith("."):
-                continue
-
-            if line.startswith("C"):
-                if task_id == 9:
-                    tokens = line.split()
-                    if len(tokens) >= 3:
-                        miller_node_1 = tokens[1].lower()
-                        miller_node_2 = tokens[2].lower()
-
-            if line.startswith("R"):
-                resistance_exist = 1
-
-            if line.startswith("M"):
-                tokens = line.split()
-                if len(tokens) < 6:
-                    continue
-                _, drain, gate, source, bulk, model = tokens[:6]
-                drain = drain.lower()
-                source = source.lower()
-                bulk = bulk.lower()
-                gate = gate.lower()
-                mos_type = "NMOS" if "nmos" in model.lower() else "PMOS"
-
-                # Task-specific structural checks
-                if task_id == 4:
-                    if drain == "vin" or gate == "vin":
-                        warning_message += "For a common-gate amplifier, the vin should be connected to source.\n"
-                        warning_message += "Suggestion: Please connect the vin to the source node.\n"
-                        warning = 1
-                elif task_id == 3:
-                    if drain == "vout" or gate == "vout":
-                        warning_message += "For a common-drain amplifier, the vout should be connected to source.\n"
-                        warning_message += "Suggestion: Please connect the vout to the source node.\n"
-                        warning = 1
-                elif task_id == 10:
-                    if gate == drain:
-                        has_diodeload = 1
-                elif task_id == 9:
-                    if gate == "vin":
-                        first_stage_out = drain
-
-                # NMOS operating checks
-                if mos_type == "NMOS":
-                    vds_error = 0
-                    vd = voltages.get(drain, 0.0)
-                    vs = voltages.get(source, 0.0)
-                    if vd == 0.0:
-                        if drain in ("0", "gnd"):
-                            warning_message += f"Suggestion: Please avoid connecting {mos_type} drain to ground.\n"
-                        else:
-                            vds_error = 1
-                            warning_message += f"For {mos_type}, the drain node ({drain}) voltage is 0.\n"
-                    elif vd < vs:
-                        vds_error = 1
-                        warning_message += f"For {mos_type}, the drain node ({drain}) voltage is lower than the source node ({source}) voltage.\n"
-                    if vds_error == 1:
-                        warning_message += "Suggestion: Ensure the device is active and V_DS > V_GS - V_TH.\n"
-
-                    vgs_error = 0
-                    vg = voltages.get(gate, 0.0)
-                    if vg == vs:
-                        if gate == source:
-                            warning_message += f"For {mos_type}, the gate node ({gate}) is shorted to the source node ({source}).\n"
-                            warning_message += "Suggestion: Separate the gate and source connections.\n"
-                        else:
-                            vgs_error = 1
-                            warning_message += f"For {mos_type}, Vg equals Vs; device may be off.\n"
-                    elif vg < vs:
-                        vgs_error = 1
-                        warning_message += f"For {mos_type}, gate voltage is lower than source voltage.\n"
-                    elif vg <= vs + vthn:
-                        vgs_error = 1
-                        warning_message += f"For {mos_type}, V_GS is not sufficiently above V_TH.\n"
-                    if vgs_error == 1:
-                        warning_message += "Suggestion: Increase gate or decrease source to satisfy V_GS > V_TH.\n"
-
-                # PMOS operating checks
-                if mos_type == "PMOS":
-                    vds_error = 0
-                    vd = voltages.get(drain, 0.0)
-                    vs = voltages.get(source, 0.0)
-                    if vd == vdd_voltage:
-                        if drain == "vdd":
-                            warning_message += "Suggestion: Please avoid connecting PMOS drain to VDD directly.\n"
-                        else:
-                            vds_error = 1
-                            warning_message += f"For PMOS, the drain node ({drain}) is at V_DD.\n"
-                    elif vd > vs:
-                        vds_error = 1
-                        warning_message += f"For PMOS, drain voltage is higher than source voltage.\n"
-                    if vds_error == 1:
-                        warning_message += "Suggestion: Ensure the device is active and V_DS < V_GS - V_TH.\n"
-
-                    vgs_error = 0
-                    vg = voltages.get(gate, 0.0)
-                    if vg == vs:
-                        if gate == source:
-                            warning_message += f"For PMOS, the gate node ({gate}) is shorted to the source node ({source}).\n"
-                            warning_message += "Suggestion: Separate the gate and source connections.\n"
-                        else:
-                            vgs_error = 1
-                            warning_message += "For PMOS, Vg equals Vs; device may be off.\n"
-                    elif vg > vs:
-                        vgs_error = 1
-                        warning_message += "For PMOS, gate voltage is higher than source voltage.\n"
-                    elif vg >= vs - vthp:
-                        vgs_error = 1
-                        warning_message += "For PMOS, |V_GS| is not sufficiently above V_TH.\n"
-                    if vgs_error == 1:
-                        warning_message += "Suggestion: Decrease gate or increase source so that V_GS < -V_TH (pmos on).\n"
-
-    # Task-wide checks
-    if task_id in [1, 2, 3, 4, 5, 6, 8, 13]:
-        if resistance_exist == 0:
-            warning_message += "There is no resistance in the netlist.\n"
-            warning_message += "Suggestion: Please add a resistive load in the netlist.\n"
-            warning = 1
-
-    if task_id == 9:
-        if first_stage_out is None:
-            warning_message += "There is no first stage output in the netlist.\n"
-            warning_message += "Suggestion: Please add a first stage output in the netlist.\n"
-            warning = 1
-        elif not (
-            (first_stage_out == miller_node_1 and miller_node_2 == "vout") or
-            (first_stage_out == miller_node_2 and miller_node_1 == "vout")
-        ):
-            if miller_node_1 is None:
-                warning_message += "There is no Miller capacitor in the netlist.\n"
-                warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
-            else:
-                warning_message += "The Miller compensation capacitor is not correctly connected.\n"
-                warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
-            warning = 1
-
-    if task_id == 10 and has_diodeload == 0:
-        warning_message += "There is no diode-connected load in the netlist.\n"
-        warning_message += "Suggestion: Please add a diode-connected load in the netlist.\n"
-        warning = 1
+    mos = netlist.mosfets()
+    mos_warnings, notes = _mosfet_messages(netlist, mos, voltages)
+    warning_message += mos_warnings
+    warning_message += "".join(get_rule_engine().violations(task_id, netlist, mos))
 
     warning_message = warning_message.strip()
     if not warning_message:
-        return 0, ""
+        return 0, ""  # triode notes alone do not fail the design
 
+    notes = f"Note (not an error by itself):\n{notes}\n" if notes else ""
     final_message = (
         "According to the operating point check, there are some issues, which defy the general operating "
         "principles of MOSFET devices.\n"
         f"{warning_message}\n\n"
+        f"{notes}"
         "Please help me fix the issues and rewrite the corrected complete code.\n"
     )
     return 1, final_message
+
+
+# -----------------------------
+# Staged evaluation (cheapest check first)
+# -----------------------------
+CHECK_STAGES = ("static", "operating_point", "checker")
+
+OP_DUMP_CODE = """
+# Operating-point dump for check_netlist
+if "circuit" in globals():
+    with open([NETLIST_PATH], "w") as _netlist_file:
+        _netlist_file.write(str(circuit))
+    _op_analysis = circuit.simulator().operating_point()
+    with open([OP_PATH], "w") as _op_file:
+        for _node in _op_analysis.nodes.values():
+            _op_file.write(f"{str(_node)}\\t{float(_node[0]):.6f}\\n")
+"""
+
+
+@dataclass
+class DesignEvaluation:
+    """Outcome of evaluate_designs() for one candidate."""
+    check: CheckResult
+    stage: str  # the stage that decided: a CHECK_STAGES entry
+    simulations: int = 0  # simulator runs spent on the candidate
+    skipped: Tuple[str, ...] = ()  # simulating stages that did not need to run
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+
+_STAGE_SECONDS: Dict[str, List[float]] = {}  # stage -> [total seconds, runs]
+_STAGE_LOCK = threading.Lock()
+
+
+def _record_stage(evaluation: DesignEvaluation, stage: str, seconds: float) -> None:
+    evaluation.seconds[stage] = seconds
+    with _STAGE_LOCK:
+        totals = _STAGE_SECONDS.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+def mean_stage_seconds(stage: str) -> float:
+    """Average wall time of a stage in this process so far (0 before it first ran)."""
+    with _STAGE_LOCK:
+        total, runs = _STAGE_SECONDS.get(stage, (0.0, 0))
+    return total / runs if runs else 0.0
+
+
+def _simulating_stages(task_type: str) -> Tuple[str, ...]:
+    return ("operating_point", "checker") if task_type in CHECKER_TYPES else ("operating_point",)
+
+
+def _netlist_part(code: str) -> str:
+    """Design code up to its analysis part (the first circuit.simulator() call)."""
+    lines = code.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if ".simulator(" in line and not line.lstrip().startswith("#"):
+            return "".join(lines[:i])
+    return code
+
+
+def _netlist_code(code_path: str) -> str:
+    """The design code up to its analysis part, read from code_path."""
+    with open(code_path, "r") as f:
+        return _netlist_part(f.read())
+
+
+def run_operating_point(task_id: int, code_path: str, task_type: str) -> Optional[CheckResult]:
+    """
+    Build the design's netlist and simulate its operating point only, then
+    run check_netlist on the result (simple tasks). Returns a failed result
+    with the error feedback, or None if the design may go on to its checker.
+    Callers run static_precheck first; it is not repeated on the OP script.
+    """
+    base = code_path.rsplit(".", 1)[0]
+    netlist_path, op_path, op_code_path = f"{base}.sp", f"{base}_op.txt", f"{base}_op.py"
+    with open(op_code_path, "w") as out:
+        out.write(_netlist_code(code_path) + OP_DUMP_CODE.replace("[NETLIST_PATH]", repr(netlist_path))
+                  .replace("[OP_PATH]", repr(op_path)))
+    for stale in (netlist_path, op_path):
+        if os.path.exists(stale):
+            os.remove(stale)
+    execution_error, simulation_error, execution_error_info, floating_node = run_code(
+        op_code_path, allow_subcircuits=allows_subcircuits(task_type), precheck=False)
+    if simulation_error:
+        return CheckResult(passed=False, code="simulation_error",
+                           message=load_template("simulation_error.md").render(NODE=floating_node))
+    if execution_error:
+        return CheckResult(passed=False, code="execution_error",
+                           message=load_template("execution_error.md").render(ERROR=execution_error_info.strip()))
+    if task_type in COMPLEX_TASK_TYPES or not os.path.exists(netlist_path):
+        return None
+    try:
+        row = get_store().task(task_id)
+    except KeyError:
+        return None
+    warning, message = check_netlist(netlist_path, op_path, row.input, row.output, task_id, task_type)
+    if warning:
+        return CheckResult(passed=False, code="netlist_warning", message=message)
+    return None
+
+
+def evaluate_designs(task_id: int, code_paths: List[str], task_type: str) -> List[DesignEvaluation]:
+    """
+    Judge candidates stage by stage, cheapest first: the static pre-check
+    (no simulation), the operating point with check_netlist, then the task's
+    AC / transient checker (batched where the type allows). A candidate
+    leaves at the first stage it fails; later stages only see survivors.
+    """
+    simulating = _simulating_stages(task_type)
+    evaluations: List[Optional[DesignEvaluation]] = [None] * len(code_paths)
+    pending: List[int] = []
+    for i, path in enumerate(code_paths):
+        evaluation = DesignEvaluation(check=CheckResult(passed=True, code="ok"), stage="static")
+        start = time.perf_counter()
+        check = static_precheck(task_id, path, task_type)
+        _record_stage(evaluation, "static", time.perf_counter() - start)
+        evaluations[i] = evaluation
+        if check is not None:
+            evaluation.check, evaluation.skipped = check, simulating
+        else:
+            pending.append(i)
+
+    survivors: List[int] = []
+    for i in pending:
+        evaluation = evaluations[i]
+        start = time.perf_counter()
+        check = run_operating_point(task_id, code_paths[i], task_type)
+        _record_stage(evaluation, "operating_point", time.perf_counter() - start)
+        evaluation.simulations += 1
+        evaluation.stage = "operating_point"
+        if check is not None:
+            evaluation.check, evaluation.skipped = check, simulating[1:]
+        else:
+            survivors.append(i)
+
+    if survivors and "checker" in simulating:
+        start = time.perf_counter()
+        checks = run_checkers(task_id, [code_paths[i] for i in survivors], task_type, precheck=False)
+        seconds = (time.perf_counter() - start) / len(survivors)
+        for i, check in zip(survivors, checks):
+            evaluation = evaluations[i]
+            _record_stage(evaluation, "checker", seconds)
+            evaluation.simulations += 1
+            evaluation.stage, evaluation.check = "checker", check
+    return evaluations
+
+
+def evaluate_design(task_id: int, code_path: str, task_type: str) -> DesignEvaluation:
+    return evaluate_designs(task_id, [code_path], task_type)[0]
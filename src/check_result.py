@@ -0,0 +1,72 @@
+"""
+Structured checker results.
+
+Test benches finish through check_exit() (see test_bench/_prelude.py), which
+prints a single record line
+
+    @@CHECK_RESULT@@ {"passed": false, "code": "low_gain", "metrics": {"gain": 3e-06}}
+
+after their human-readable messages. parse_check_output() finds that record
+in one pass over the output and returns a CheckResult; the remaining stdout
+is kept as the message that is fed back to the LLM. Batch checks (sim_batch)
+print one such record per candidate, with a "candidate" index and the
+candidate's message inside the record.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+CHECK_RESULT_MARKER = "@@CHECK_RESULT@@"
+
+
+@dataclass
+class CheckResult:
+    """Outcome of one checker run."""
+    passed: bool
+    code: str
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    message: str = ""
+    returncode: int = 0
+
+
+def parse_check_output(returncode: int, stdout: str, stderr: str = "") -> CheckResult:
+    """Build a CheckResult from a checker's exit status and output.
+
+    Checkers that crash before reporting (or legacy checkers without the
+    protocol) fall back to the exit status with code "no_record" or "crashed".
+    """
+    idx = stdout.rfind(CHECK_RESULT_MARKER)
+    if idx >= 0:
+        end = stdout.find("\n", idx)
+        line = stdout[idx + len(CHECK_RESULT_MARKER):end if end >= 0 else len(stdout)]
+        message = stdout[:idx] + (stdout[end + 1:] if end >= 0 else "")
+        try:
+            record = json.loads(line)
+            return CheckResult(passed=bool(record.get("passed")), code=str(record.get("code", "")),
+                               metrics=dict(record.get("metrics") or {}), message=message,
+                               returncode=returncode)
+        except ValueError:
+            pass
+    else:
+        message = stdout
+    if returncode == 0:
+        return CheckResult(passed=True, code="no_record", message=message, returncode=returncode)
+    return CheckResult(passed=False, code="crashed" if stderr.strip() else "no_record",
+                       message=message, returncode=returncode)
+
+
+def parse_batch_output(stdout: str) -> Dict[int, CheckResult]:
+    """Collect the per-candidate records printed by a batch check (see sim_batch)."""
+    results: Dict[int, CheckResult] = {}
+    for line in stdout.splitlines():
+        if not line.startswith(CHECK_RESULT_MARKER):
+            continue
+        try:
+            record = json.loads(line[len(CHECK_RESULT_MARKER):])
+            results[int(record["candidate"])] = CheckResult(
+                passed=bool(record.get("passed")), code=str(record.get("code", "")),
+                metrics=dict(record.get("metrics") or {}), message=record.get("message", ""),
+                returncode=0 if record.get("passed") else 2)
+        except (ValueError, KeyError, TypeError):
+            continue
+    return results
@@ -0,0 +1,106 @@
+"""
+Compaction of simulator output and repair conversations.
+
+Error text fed back to the LLM comes straight from the design script's
+stdout/stderr: full ngspice logs, tracebacks printed twice (once by PySpice,
+once by the interpreter), thousands of identical warning lines. Sending it
+verbatim makes every repair round cost more prompt tokens than the last.
+
+- estimate_tokens: cheap token estimate (about four characters per token).
+- dedupe_tracebacks: drops repeated traceback blocks and collapses runs of
+  identical lines.
+- compact_log: keeps the head, the lines around errors/warnings and the tail
+  of a long log, marking what was omitted.
+- fit_tokens: hard per-message cap (head and tail kept).
+"""
+import re
+from typing import List
+
+# Rough tokens per character of code and logs; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+LOG_MAX_LINES = 40
+LOG_HEAD_LINES = 3
+LOG_TAIL_LINES = 10
+
+TRACEBACK_START = "Traceback (most recent call last):"
+RELEVANT_LINE = re.compile(
+    r"error|warning|fatal|failed|singular|check node|timestep too small|exception|traceback",
+    re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _omitted(n: int) -> str:
+    return f"... ({n} lines omitted)"
+
+
+def dedupe_tracebacks(text: str) -> str:
+    """Keep the first copy of each traceback and collapse runs of identical lines."""
+    lines = text.split("\n")
+    out: List[str] = []
+    seen = set()
+    i = 0
+    while i < len(lines):
+        if lines[i].strip() == TRACEBACK_START:
+            # A traceback ends with its first unindented line after the header (the exception).
+            end = i + 1
+            while end < len(lines) and (lines[end].startswith((" ", "\t")) or not lines[end].strip()):
+                end += 1
+            block = tuple(lines[i:end + 1])
+            if block in seen:
+                out.append("(the same traceback again)")
+            else:
+                seen.add(block)
+                out.extend(block)
+            i = end + 1
+            continue
+        run = i
+        while run + 1 < len(lines) and lines[run + 1] == lines[i] and lines[i].strip():
+            run += 1
+        out.append(lines[i] if run == i else f"{lines[i]}  (repeated {run - i + 1} times)")
+        i = run + 1
+    return "\n".join(out)
+
+
+def compact_log(text: str, max_lines: int = LOG_MAX_LINES) -> str:
+    """Shorten a simulator log to the lines that explain the failure.
+
+    Keeps the first LOG_HEAD_LINES lines, every line matching RELEVANT_LINE
+    with one line of context, and the last LOG_TAIL_LINES lines (where the
+    final exception is printed), up to max_lines in total.
+    """
+    lines = dedupe_tracebacks(text.strip()).split("\n")
+    if len(lines) <= max_lines:
+        return "\n".join(lines)
+    keep = set(range(LOG_HEAD_LINES)) | set(range(len(lines) - LOG_TAIL_LINES, len(lines)))
+    budget = max_lines - len(keep)
+    for i, line in enumerate(lines):
+        if budget <= 0:
+            break
+        if RELEVANT_LINE.search(line):
+            for j in (i - 1, i, i + 1):
+                if 0 <= j < len(lines) and j not in keep and budget > 0:
+                    keep.add(j)
+                    budget -= 1
+    out: List[str] = []
+    gap = 0
+    for i, line in enumerate(lines):
+        if i in keep:
+            if gap:
+                out.append(_omitted(gap))
+                gap = 0
+            out.append(line)
+        else:
+            gap += 1
+    return "\n".join(out)
+
+
+def fit_tokens(text: str, budget: int) -> str:
+    """Cut the middle out of `text` so it fits in about `budget` tokens."""
+    if estimate_tokens(text) <= budget:
+        return text
+    chars = budget * CHARS_PER_TOKEN
+    head, tail = text[:chars * 2 // 3], text[-(chars // 3):]
+    return f"{head}\n... ({len(text) - len(head) - len(tail)} characters omitted)\n{tail}"
@@ -9,6 +9,7 @@ from typing import Optional, List
 
 OPEN_SOURCE_MODELS: List[str] = ["mistral", "wizardcoder", "deepseek-coder:33b-instruct", "codeqwen", "mixtral", "qwen"]
 COMPLEX_TASK_TYPES = ['Oscillator', 'Integrator', 'Differentiator', 'Adder', 'Subtractor', 'Schmitt']
+ABLATION_FLAGS = ("ngspice", "no_prompt", "no_context", "no_chain", "skill", "retrieval")
 
 @dataclass
 class AppConfig:
@@ -26,6 +27,17 @@ class AppConfig:
     no_chain: bool
     api_key: Optional[str]
     retrieval: bool
+    jobs: int = 1
+    samples: int = 1
+    cache: bool = True
+    cache_dir: Optional[str] = None
+    cache_max_mb: int = 512
+    replay: bool = False
+    sim_workers: int = 1
+    sim_memory_mb: int = 4096
+    figures: str = "failure"
+    run_store: bool = True
+    run_store_path: Optional[str] = None
 
     @property
     def is_open_source_model(self) -> bool:
@@ -37,11 +49,17 @@ class AppConfig:
         """Return True for GPT-like hosted APIs (OpenAI/DeepSeek)."""
         return "gpt" in self.model or "deepseek-chat" in self.model
 
-def parse_args() -> AppConfig:
-    """Parse CLI flags into an AppConfig instance.
+def variant_name(config: AppConfig) -> str:
+    """Name the ablation variant and repair rounds of a config, e.g. 'no_chain+skill+retry2' or 'base+retry3'.
 
-    Also resolves API key from explicit argument, local_secrets, or environment.
+    Runs with different repair budgets are different experiments, so their
+    pass@k must not be pooled.
     """
+    enabled = [flag for flag in ABLATION_FLAGS if getattr(config, flag)] or ["base"]
+    return "+".join(enabled + [f"retry{config.num_of_retry}"])
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser shared by the worker and sweep entry points."""
     parser = argparse.ArgumentParser()
     parser.add_argument('--model', type=str, default="gpt-3.5-turbo")
     parser.add_argument('--temperature', type=float, default=0.5)
@@ -56,8 +74,35 @@ def parse_args() -> AppConfig:
     parser.add_argument("--no_chain", action="store_true", default=False)
     parser.add_argument('--api_key', type=str)
     parser.add_argument("--retrieval", action="store_true", default=False)
-    args = parser.parse_args()
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of iterations of a task to run concurrently")
+    parser.add_argument("--samples", type=int, default=1,
+                        help="candidate designs requested per LLM call (each fills one iteration)")
+    parser.add_argument("--no_cache", action="store_true", default=False,
+                        help="always query the LLM instead of reusing cached answers")
+    parser.add_argument("--cache_dir", type=str, default=None,
+                        help="response cache directory (default: <project>/.llm_cache)")
+    parser.add_argument("--cache_max_mb", type=int, default=512)
+    parser.add_argument("--replay", action="store_true", default=False,
+                        help="rebuild runs from cached answers and saved outputs without network access")
+    parser.add_argument("--sim_workers", type=int, default=None,
+                        help="warm simulation worker processes (default: --jobs; 0 = one subprocess per check)")
+    parser.add_argument("--sim_memory_mb", type=int, default=4096,
+                        help="address-space limit per simulation worker")
+    parser.add_argument("--figures", choices=("off", "failure", "deferred"), default="failure",
+                        help="checker figures: none, failing checks only (rendered after the task), "
+                             "or saved for every check and rendered later with python -m src.figures")
+    parser.add_argument("--no_run_store", action="store_true", default=False,
+                        help="do not record rounds in the run store")
+    parser.add_argument("--run_store_path", type=str, default=None,
+                        help="run store database (default: <project>/outputs/runs.sqlite)")
+    return parser
+
+def config_from_args(args: argparse.Namespace) -> AppConfig:
+    """Build an AppConfig from parsed CLI flags.
 
+    Also resolves API key from explicit argument, local_secrets, or environment.
+    """
     # Python
     import os
     try:
@@ -86,4 +131,19 @@ def parse_args() -> AppConfig:
         no_chain=args.no_chain,
         api_key=api_key,
         retrieval=args.retrieval,
-    )
\ No newline at end of file
+        jobs=max(1, args.jobs),
+        samples=max(1, args.samples),
+        cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        replay=args.replay,
+        sim_workers=max(1, args.jobs) if args.sim_workers is None else max(0, args.sim_workers),
+        sim_memory_mb=args.sim_memory_mb,
+        figures=args.figures,
+        run_store=not args.no_run_store,
+        run_store_path=args.run_store_path,
+    )
+
+def parse_args() -> AppConfig:
+    """Parse CLI flags into an AppConfig instance."""
+    return config_from_args(build_parser().parse_args())
@@ -0,0 +1,200 @@
+"""
+Checker figures, kept off the pass/fail path.
+
+Test benches never import matplotlib. They describe their plots with
+check_figure() (see test_bench/_prelude.py), which hands the waveform arrays
+to a FigureRecorder; what happens to them is the figure policy:
+
+- "off":      nothing is kept.
+- "failure":  the arrays of failing checks are saved, and the worker renders
+              them once the task is done.
+- "deferred": the arrays of every check are saved and left for a later
+              `python -m src.figures <dir> ...` batch render.
+
+Figure data is one compressed .npz per check (float32 arrays, shared x axes
+stored once, layout as JSON) next to the check script: it_3_check.py ->
+it_3_figure.npz, rendered to it_3_figure.png. render_figures() renders in a
+process pool and skips figures whose PNG is up to date.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+FIGURE_POLICIES = ("off", "failure", "deferred")
+DEFAULT_FIGURE_POLICY = "failure"
+FIGURE_SUFFIX = "_figure"
+
+Series = Dict[str, Tuple[Any, Any]]
+
+_POLICY = DEFAULT_FIGURE_POLICY
+_POLICY_LOCK = threading.Lock()
+
+
+def set_figure_policy(policy: str) -> None:
+    """Select the figure policy used by the checkers started after this call."""
+    global _POLICY
+    if policy not in FIGURE_POLICIES:
+        raise ValueError(f"unknown figure policy {policy!r} (expected one of {', '.join(FIGURE_POLICIES)})")
+    with _POLICY_LOCK:
+        _POLICY = policy
+
+
+def get_figure_policy() -> str:
+    return _POLICY
+
+
+def figure_base(check_path: str) -> str:
+    """Figure path (without extension) of a check script: it_3_check.py -> it_3_figure."""
+    base = check_path.rsplit(".", 1)[0]
+    if base.endswith("_check"):
+        base = base[:-len("_check")]
+    return base + FIGURE_SUFFIX
+
+
+# -----------------------------
+# Recording (checker side)
+# -----------------------------
+class FigureRecorder:
+    """Panels of one check's figure, saved at the end of the check per the policy."""
+
+    def __init__(self, policy: str, base_path: str):
+        self.policy = policy if policy in FIGURE_POLICIES else "off"
+        self.base_path = base_path
+        self.panels: List[Dict[str, Any]] = []
+
+    def add(self, title: str, series: Union[Series, Callable[[], Series]], xlabel: str = "", ylabel: str = "",
+            xlim: Optional[Sequence[float]] = None, ylim: Optional[Sequence[float]] = None) -> None:
+        """Add a panel. `series` may be a function returning the series: it is only
+        called if the figure is kept, so a missing node cannot fail the check."""
+        if self.policy == "off":
+            return
+        # `series` is kept by reference: a checker may add traces to it until it finishes.
+        self.panels.append({"title": title, "series": series, "xlabel": xlabel, "ylabel": ylabel,
+                            "xlim": list(xlim) if xlim is not None else None,
+                            "ylim": list(ylim) if ylim is not None else None})
+
+    def finish(self, passed: bool) -> Optional[str]:
+        """Save the figure data if the policy keeps it; returns the .npz path."""
+        if not self.panels or self.policy == "off" or (self.policy == "failure" and passed):
+            return None
+        panels = []
+        for panel in self.panels:
+            series = panel["series"]
+            if callable(series):
+                try:
+                    series = series()
+                except Exception:
+                    continue  # e.g. a node the design does not have: drop the panel
+            panels.append({**panel, "series": series})
+        if not panels:
+            return None
+        path = self.base_path + ".npz"
+        try:
+            write_figure_data(path, panels)
+        except (OSError, ValueError, TypeError):
+            return None  # a figure must never change a check's outcome
+        return path
+
+
+def write_figure_data(path: str, panels: List[Dict[str, Any]]) -> None:
+    arrays: Dict[str, np.ndarray] = {}
+    keys: Dict[int, str] = {}  # id(array) -> key, so a shared time axis is stored once
+
+    def store(values) -> str:
+        if id(values) not in keys:
+            keys[id(values)] = key = f"a{len(arrays)}"
+            arrays[key] = np.asarray(values, dtype=np.float32)
+        return keys[id(values)]
+
+    layout = []
+    for panel in panels:
+        series = [[label, store(x), store(y)] for label, (x, y) in panel["series"].items()]
+        layout.append({**panel, "series": series})
+    np.savez_compressed(path, layout=np.array(json.dumps(layout)), **arrays)
+
+
+def load_figure_data(path: str) -> List[Dict[str, Any]]:
+    """Panels of a saved figure, with (label, x, y) arrays in place of the keys."""
+    with np.load(path) as data:
+        layout = json.loads(str(data["layout"]))
+        for panel in layout:
+            panel["series"] = [(label, data[x], data[y]) for label, x, y in panel["series"]]
+    return layout
+
+
+# -----------------------------
+# Rendering (off the hot path)
+# -----------------------------
+def render_figure(path: str) -> str:
+    """Render one saved figure to a PNG next to it; returns the PNG path."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    panels = load_figure_data(path)
+    columns = 1 if len(panels) == 1 else 2
+    rows = math.ceil(len(panels) / columns)
+    fig, axes = plt.subplots(rows, columns, figsize=(7 * columns, 4.5 * rows), squeeze=False)
+    for ax, panel in zip(axes.flat, panels):
+        for label, x, y in panel["series"]:
+            ax.plot(x, y, label=label)
+        ax.set_title(panel["title"])
+        ax.set_xlabel(panel["xlabel"])
+        ax.set_ylabel(panel["ylabel"])
+        if panel["xlim"]:
+            ax.set_xlim(panel["xlim"])
+        if panel["ylim"]:
+            ax.set_ylim(panel["ylim"])
+        if len(panel["series"]) > 1:
+            ax.legend()
+        ax.grid(True)
+    for ax in list(axes.flat)[len(panels):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    png_path = path.rsplit(".", 1)[0] + ".png"
+    fig.savefig(png_path)
+    plt.close(fig)
+    return png_path
+
+
+def pending_figures(roots: Iterable[str]) -> List[str]:
+    """Saved figures under `roots` whose PNG is missing or older than the data."""
+    pending = []
+    for root in roots:
+        for path in sorted(Path(root).rglob(f"*{FIGURE_SUFFIX}.npz")):
+            png = path.with_suffix(".png")
+            if not png.exists() or png.stat().st_mtime < path.stat().st_mtime:
+                pending.append(str(path))
+    return pending
+
+
+def render_figures(paths: List[str], workers: int = 1) -> List[str]:
+    """Render saved figures, in a process pool when workers > 1; returns the PNG paths."""
+    if not paths:
+        return []
+    if workers <= 1 or len(paths) == 1:
+        return [render_figure(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(render_figure, paths))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Render deferred checker figures.")
+    parser.add_argument("roots", nargs="+", help="directories searched for *_figure.npz")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    rendered = render_figures(pending_figures(args.roots), args.workers)
+    print(f"Rendered {len(rendered)} figure(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
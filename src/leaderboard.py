@@ -0,0 +1,413 @@
+"""
+Pass@k leaderboard over the run history.
+
+Scans finished runs incrementally and reports, per task, model and ablation
+variant:
+- pass@1, pass@5 and any other pass@k (the unbiased estimator
+  1 - C(n-c, k) / C(n, k) over n iterations with c passes);
+- cost per success (dollars spent on all rounds / passed iterations);
+- latency percentiles of repair rounds and LLM requests;
+and a leaderboard per model and variant: pass@k averaged over tasks and the
+number of solved tasks (at least one pass), as in the paper's table.
+
+Sources:
+- store: outputs/runs.sqlite (src/run_store.py), read by row id.
+- logs: the timestamped worker logs in the project root, the only record
+  of the verdicts of runs made before the run store existed. Model and
+  task come from the file name (see worker._open_log); the variant from the
+  log's "variant:" header, or for older logs from the flags the file name
+  suffix implies, named by config.variant_name like the run store does
+  (flags the suffix does not record, e.g. --retrieval, are not recovered;
+  such older logs are one-shot runs, retry0).
+
+Every tally is additive (iterations = rounds numbered 0, passes = passing
+rounds, latencies in log-spaced histogram bins), so a scan keeps one small
+Tally per group whatever the history size, and the tallies are cached in
+outputs/leaderboard_cache.json with the last row id / byte offset read: a
+re-run only reads the rows and log lines added since.
+
+Usage:
+- python -m src.leaderboard                       # leaderboard from the run store
+- python -m src.leaderboard --source logs --per_task --k 1,5,10
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.config import ABLATION_FLAGS, COMPLEX_TASK_TYPES, variant_name
+from src.metadata import get_store
+from src.pricing import token_cost
+from src.run_store import FIRST_SAMPLE, SCHEMA, connect, default_path
+
+CACHE_VERSION = 2
+DEFAULT_K = (1, 5)
+PERCENTILES = (50, 90, 99)
+SCAN_ROWS = 10000
+
+# Latency histogram: BINS_PER_DECADE log-spaced bins from 1 ms to 1e5 s (about 12 % wide).
+HIST_MIN_EXP = -3
+HIST_DECADES = 8
+BINS_PER_DECADE = 20
+HIST_BINS = HIST_DECADES * BINS_PER_DECADE
+
+LOG_NAME = re.compile(r"^\d{4}(?:-\d\d){5}_(?P<model>.+)_(?P<task_id>\d+)"
+                      r"(?P<suffix>_ngspice_log|_no_prompt_log|_no_context_log|_no_chain_log|_log_no_skill|_log)\.txt$")
+# Ablation flag a log suffix records (worker._decide_log_suffix); "_log" means skills on for complex tasks.
+SUFFIX_FLAGS = {"_ngspice_log": "ngspice", "_no_prompt_log": "no_prompt", "_no_context_log": "no_context",
+                "_no_chain_log": "no_chain", "_log_no_skill": None, "_log": None}
+VARIANT_LINE = re.compile(r"^variant: (\S+)$")
+ITERATION_LINE = re.compile(r"^task: \d+, it: \d+$")
+PASSED_LINE = re.compile(r"^Check passed for task \d+ \(it=\d+\)")
+ROUND_LINE = re.compile(r"^Round \d+ \(it=\d+\): .*?; tokens (\d+)\+(\d+) .*; (\d+(?:\.\d+)?) s \(~")
+
+
+def pass_at_k(n: int, c: int, k: int) -> float:
+    """Unbiased pass@k from n samples with c correct (nan if n < k)."""
+    if n < k:
+        return float("nan")
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.prod(1.0 - k / i for i in range(n - c + 1, n + 1))
+
+
+# -----------------------------
+# Additive tallies
+# -----------------------------
+def _bin(seconds: float) -> int:
+    if seconds <= 0:
+        return 0
+    return min(HIST_BINS - 1, max(0, int((math.log10(seconds) - HIST_MIN_EXP) * BINS_PER_DECADE)))
+
+
+def percentile(hist: Sequence[int], q: float) -> float:
+    """q-th percentile of a latency histogram (geometric centre of the bin it falls in)."""
+    total = sum(hist)
+    if not total:
+        return float("nan")
+    rank, seen = q / 100 * total, 0
+    for i, count in enumerate(hist):
+        seen += count
+        if seen >= rank and count:
+            return 10 ** (HIST_MIN_EXP + (i + 0.5) / BINS_PER_DECADE)
+    return float("nan")
+
+
+@dataclass
+class Tally:
+    """Additive totals of one (model, variant, task) group."""
+    iterations: int = 0
+    passed: int = 0
+    rounds: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    round_seconds: List[int] = field(default_factory=lambda: [0] * HIST_BINS)
+    llm_seconds: List[int] = field(default_factory=lambda: [0] * HIST_BINS)
+
+    def add_round(self, rnd: int, passed: bool, prompt_tokens: int, completion_tokens: int, cost: float,
+                  seconds: Optional[float], llm_seconds: Optional[float]) -> None:
+        self.iterations += rnd == 0
+        self.passed += bool(passed)
+        self.rounds += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        if seconds:
+            self.round_seconds[_bin(seconds)] += 1
+        if llm_seconds:
+            self.llm_seconds[_bin(llm_seconds)] += 1
+
+    def merge(self, other: "Tally") -> "Tally":
+        self.iterations += other.iterations
+        self.passed += other.passed
+        self.rounds += other.rounds
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+        self.round_seconds = [a + b for a, b in zip(self.round_seconds, other.round_seconds)]
+        self.llm_seconds = [a + b for a, b in zip(self.llm_seconds, other.llm_seconds)]
+        return self
+
+    def to_json(self) -> dict:
+        return {**self.__dict__}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Tally":
+        return cls(**data)
+
+
+GroupKey = Tuple[str, str, int]  # (model, variant, task_id)
+Tallies = Dict[GroupKey, Tally]
+
+
+def _key_text(key: GroupKey) -> str:
+    return f"{key[0]}\t{key[1]}\t{key[2]}"
+
+
+def _key_from_text(text: str) -> GroupKey:
+    model, variant, task_id = text.split("\t")
+    return model, variant, int(task_id)
+
+
+def merge_tallies(parts: Iterable[Tallies]) -> Tallies:
+    merged: Tallies = {}
+    for part in parts:
+        for key, tally in part.items():
+            merged.setdefault(key, Tally()).merge(tally)
+    return merged
+
+
+# -----------------------------
+# Incremental scans
+# -----------------------------
+def scan_store(path: Path, tallies: Tallies, last_id: int) -> int:
+    """Fold the run store's rows after last_id into `tallies`; returns the new last id.
+
+    A row repeating an earlier row's sample (a replay or a cached rerun of the
+    same iteration and round) is skipped, so reruns do not inflate pass@k.
+    """
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executescript(SCHEMA)  # stores written before the runs_sample index lack it
+        # Skipped repeats still move the scan forward: read up to the current last row.
+        end_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM runs").fetchone()[0]
+        cursor = conn.execute(
+            "SELECT id, model, variant, task_id, round, passed, prompt_tokens, completion_tokens, cost, seconds, "
+            f"llm_seconds FROM runs r WHERE id > ? AND id <= ? AND {FIRST_SAMPLE} ORDER BY id", (last_id, end_id))
+        while True:
+            rows = cursor.fetchmany(SCAN_ROWS)
+            if not rows:
+                break
+            for row_id, model, variant, task_id, rnd, passed, pt, ct, cost, seconds, llm in rows:
+                tally = tallies.get((model, variant, task_id))
+                if tally is None:
+                    tally = tallies[(model, variant, task_id)] = Tally()
+                tally.add_round(rnd, passed, pt or 0, ct or 0, cost or 0.0, seconds, llm)
+    finally:
+        conn.close()
+    return max(last_id, end_id)
+
+
+def _store_max_id(path: Path) -> int:
+    conn = connect(path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM runs").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def suffix_variant(suffix: str, task_id: int) -> str:
+    """Variant name (config.variant_name) of the flags a log file name suffix implies.
+
+    Logs without a "variant:" header predate the repair loop: one-shot, retry0.
+    """
+    flags = {flag: False for flag in ABLATION_FLAGS}
+    if SUFFIX_FLAGS[suffix] is not None:
+        flags[SUFFIX_FLAGS[suffix]] = True
+    elif suffix == "_log":
+        try:
+            flags["skill"] = get_store().task(task_id).type in COMPLEX_TASK_TYPES
+        except KeyError:
+            pass
+    return variant_name(argparse.Namespace(**flags, num_of_retry=0))
+
+
+def log_group(path: Path) -> Optional[GroupKey]:
+    """(model, variant, task_id) of a worker log (None if the file is not one)."""
+    match = LOG_NAME.match(path.name)
+    if match is None:
+        return None
+    task_id = int(match["task_id"])
+    with open(path, "rb") as f:
+        header = VARIANT_LINE.match(f.readline().decode("utf-8", "replace").strip())
+    variant = header[1] if header else suffix_variant(match["suffix"], task_id)
+    return match["model"], variant, task_id
+
+
+def _log_lines(path: Path, offset: int) -> Iterator[Tuple[str, int]]:
+    """Complete lines after `offset` with the offset just past each one."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # still being written
+            offset += len(raw)
+            yield raw.decode("utf-8", errors="replace").rstrip("\r\n"), offset
+
+
+def scan_log(path: Path, key: GroupKey, tally: Tally, offset: int) -> int:
+    """Fold the lines of a worker log after `offset` into `tally`; returns the new offset."""
+    model = key[0]
+    for line, offset in _log_lines(path, offset):
+        if ITERATION_LINE.match(line):
+            tally.iterations += 1
+        elif PASSED_LINE.match(line):
+            tally.passed += 1
+        else:
+            match = ROUND_LINE.match(line)
+            if match:
+                pt, ct, seconds = int(match[1]), int(match[2]), float(match[3])
+                tally.rounds += 1
+                tally.prompt_tokens += pt
+                tally.completion_tokens += ct
+                tally.cost += token_cost(model, pt, ct)
+                if seconds:
+                    tally.round_seconds[_bin(seconds)] += 1
+    return offset
+
+
+# -----------------------------
+# Cache of partial aggregates
+# -----------------------------
+def _empty_cache() -> dict:
+    return {"version": CACHE_VERSION, "store": {}, "logs": {}}
+
+
+def _load_cache(path: Path) -> dict:
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return _empty_cache()
+    if cache.get("version") != CACHE_VERSION:
+        return _empty_cache()
+    return cache
+
+
+def _save_cache(path: Path, cache: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _tallies_from_json(data: dict) -> Tallies:
+    return {_key_from_text(k): Tally.from_json(v) for k, v in data.items()}
+
+
+def _tallies_to_json(tallies: Tallies) -> dict:
+    return {_key_text(k): v.to_json() for k, v in tallies.items()}
+
+
+def collect_store(db_path: Path, cache: dict) -> Tallies:
+    """Tallies of the run store, updated in `cache` with only the rows added since the last scan."""
+    entry = cache["store"].get(str(db_path.resolve()), {})
+    last_id = entry.get("last_id", 0)
+    tallies = _tallies_from_json(entry.get("groups", {}))
+    if _store_max_id(db_path) < last_id:  # the database was replaced
+        last_id, tallies = 0, {}
+    last_id = scan_store(db_path, tallies, last_id)
+    cache["store"][str(db_path.resolve())] = {"last_id": last_id, "groups": _tallies_to_json(tallies)}
+    return tallies
+
+
+def collect_logs(log_dir: Path, cache: dict) -> Tallies:
+    """Tallies of the worker logs in `log_dir`, reading each file from where the last scan stopped."""
+    parts: List[Tallies] = []
+    for path in sorted(log_dir.glob("*.txt")):
+        key = log_group(path)
+        if key is None:
+            continue
+        entry = cache["logs"].get(str(path.resolve()), {})
+        offset = entry.get("offset", 0)
+        tally = Tally.from_json(entry["tally"]) if "tally" in entry else Tally()
+        if path.stat().st_size < offset:  # rewritten since the last scan
+            offset, tally = 0, Tally()
+        offset = scan_log(path, key, tally, offset)
+        cache["logs"][str(path.resolve())] = {"offset": offset, "tally": tally.to_json()}
+        parts.append({key: tally})
+    return merge_tallies(parts)
+
+
+# -----------------------------
+# Reports
+# -----------------------------
+def _row(tally: Tally, ks: Sequence[int]) -> dict:
+    row = {"iterations": tally.iterations, "passed": tally.passed}
+    for k in ks:
+        row[f"pass@{k}"] = pass_at_k(tally.iterations, tally.passed, k)
+    row["cost"] = tally.cost
+    row["cost_per_success"] = tally.cost / tally.passed if tally.passed else float("nan")
+    for q in PERCENTILES:
+        row[f"round_p{q}_s"] = percentile(tally.round_seconds, q)
+    for q in PERCENTILES:
+        row[f"llm_p{q}_s"] = percentile(tally.llm_seconds, q)
+    return row
+
+
+def task_table(tallies: Tallies, ks: Sequence[int] = DEFAULT_K) -> pd.DataFrame:
+    """One row per (model, variant, task)."""
+    rows = [{"model": m, "variant": v, "task_id": t, **_row(tally, ks)}
+            for (m, v, t), tally in sorted(tallies.items())]
+    return pd.DataFrame(rows)
+
+
+def leaderboard(tallies: Tallies, ks: Sequence[int] = DEFAULT_K) -> pd.DataFrame:
+    """One row per (model, variant): pass@k averaged over tasks, solved tasks, cost and latency."""
+    groups: Dict[Tuple[str, str], List[Tally]] = {}
+    for (model, variant, _), tally in tallies.items():
+        groups.setdefault((model, variant), []).append(tally)
+    rows = []
+    for (model, variant), group in groups.items():
+        total = Tally()
+        for tally in group:
+            total.merge(tally)
+        row = {"model": model, "variant": variant, "tasks": len(group),
+               "solved": sum(1 for t in group if t.passed)}
+        for k in ks:
+            row[f"avg_pass@{k}"] = pd.Series([pass_at_k(t.iterations, t.passed, k) for t in group]).mean()
+        rows.append({**row, **{k: v for k, v in _row(total, ks).items() if not k.startswith("pass@")}})
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    return table.sort_values(f"avg_pass@{ks[0]}", ascending=False).reset_index(drop=True)
+
+
+def main() -> int:
+    project = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Pass@k leaderboard over the run history.")
+    parser.add_argument("--source", choices=("store", "logs"), default="store",
+                        help="run store (default) or the worker logs of earlier runs")
+    parser.add_argument("--db", type=str, default=None, help="run database (default: outputs/runs.sqlite)")
+    parser.add_argument("--log_dir", type=str, default=str(project), help="directory of the worker logs")
+    parser.add_argument("--k", type=str, default=",".join(map(str, DEFAULT_K)), help="e.g. '1,5,10'")
+    parser.add_argument("--per_task", action="store_true", default=False, help="also print the per-task table")
+    parser.add_argument("--cache", type=str, default=str(project / "outputs" / "leaderboard_cache.json"))
+    parser.add_argument("--rebuild", action="store_true", default=False, help="ignore cached aggregates")
+    args = parser.parse_args()
+    ks = [int(k) for k in args.k.split(",") if k.strip()]
+
+    cache_path = Path(args.cache)
+    cache = _load_cache(cache_path) if not args.rebuild else _empty_cache()
+    if args.source == "store":
+        db_path = Path(args.db) if args.db else default_path()
+        if not db_path.exists():
+            print(f"No run store at {db_path}", file=sys.stderr)
+            return 1
+        tallies = collect_store(db_path, cache)
+    else:
+        tallies = collect_logs(Path(args.log_dir), cache)
+    _save_cache(cache_path, cache)
+    if not tallies:
+        print("No runs found.")
+        return 0
+
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 250,
+                           "display.float_format", "{:.4g}".format):
+        if args.per_task:
+            print(task_table(tallies, ks).to_string(index=False))
+            print()
+        print(leaderboard(tallies, ks).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
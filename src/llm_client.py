@@ -1,85 +1,129 @@
 """
 LLM client wrapper around OpenAI/DeepSeek-compatible chat APIs with robust key
-resolution and retry logic. Also contains prompt template utilities (legacy).
+resolution and retry logic. Prompt templates live in src/prompts.py.
+
+Requests can be capped per provider (see set_provider_limit) so concurrent
+sweeps never exceed a provider's rate limit. Clients are shared per
+(model, api_key) via get_client so iterations reuse pooled HTTP connections;
+AsyncLLMClient keeps many completions in flight from a single event loop.
 """
+import asyncio
+import threading
 import time
+import weakref
 from typing import Any, Dict, List, Optional, Tuple
-from pathlib import Path
 
 import httpx
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import os  # Added to read environment variables
 
-from src.config import AppConfig, COMPLEX_TASK_TYPES
+_PROVIDER_LIMITS: Dict[str, int] = {}
+_PROVIDER_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+# asyncio semaphores bind to the loop they are used on, so keep one set per loop
+_ASYNC_PROVIDER_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
 
-BIAS_USAGE = """Due to the operational range of the op-amp being 0 to 5V, please connect the nodes that were originally grounded to a 2.5V DC power source.
-Please increase the gain as much as possible to maintain oscillation.
-"""
+def provider_for(model: str) -> str:
+    """Return the provider name used for per-provider request limits."""
+    model_lower = (model or "").lower()
+    if "deepseek-chat" in model_lower:
+        return "deepseek"
+    if "gpt" in model_lower:
+        return "openai"
+    return "ollama"
 
-def _project_root() -> Path:
-    # src/ -> project root
-    return Path(__file__).resolve().parent.parent
-
-def _read_file_project_relative(rel_path: str) -> str:
-    path = _project_root() / rel_path
-    with open(path, "r") as f:
-        return f.read()
-
-def base_prompt_for(config: AppConfig) -> str:
-    # Select prompt template under templates/
-    if config.no_prompt:
-        rel = 'templates/prompt_template_wo_prompt.md'
-    elif config.no_context:
-        rel = 'templates/prompt_template_wo_context.md'
-    elif config.no_chain:
-        rel = 'templates/prompt_template_wo_chain_of_thought.md'
-    elif config.ngspice:
-        rel = 'templates/prompt_template_ngspice.md'
-    else:
-        rel = 'templates/prompt_template.md'
-    return _read_file_project_relative(rel)
-
-def complex_prompt_template() -> str:
-    return _read_file_project_relative('templates/prompt_template_complex.md')
-
-def simulation_error_prompt() -> str:
-    return _read_file_project_relative('templates/simulation_error.md')
-
-def execution_error_prompt() -> str:
-    return _read_file_project_relative('templates/execution_error.md')
-
-def build_prompt(config: AppConfig, task: str, input_nodes: str, output_nodes: str, task_type: str,
-                 subcircuits_info: str = "", note_info: str = "", call_info: str = "") -> Tuple[str, float]:
-    if task_type not in COMPLEX_TASK_TYPES or not config.skill:
-        prompt = base_prompt_for(config)
-        prompt = prompt.replace('[TASK]', task).replace('[INPUT]', input_nodes).replace('[OUTPUT]', output_nodes)
-        bias_voltage = 2.5 if task_type in COMPLEX_TASK_TYPES else None
-        if task_type in COMPLEX_TASK_TYPES:
-            # Allow subcircuits in complex tasks
-            prompt = prompt.replace('6. Avoid using subcircuits.', '').replace('7.', '6.').replace('8.', '7.')
-        return prompt, (bias_voltage if bias_voltage is not None else 0.0)
-    else:
-        prompt = complex_prompt_template()
-        prompt = (prompt.replace('[TASK]', task)
-                        .replace('[INPUT]', input_nodes)
-                        .replace('[OUTPUT]', output_nodes)
-                        .replace('[SUBCIRCUITS_INFO]', subcircuits_info)
-                        .replace('[NOTE_INFO]', note_info)
-                        .replace('[CALL_INFO]', call_info))
-        if task_type == "Oscillator":
-            prompt += "\n" + BIAS_USAGE
-        # note_info provider returns numeric bias voltage; caller can pass it back
-        return prompt, 0.0
+def set_provider_limit(provider: str, max_in_flight: int) -> None:
+    """Cap the number of concurrent requests sent to a provider process-wide."""
+    _PROVIDER_LIMITS[provider] = max(1, max_in_flight)
+    _PROVIDER_SLOTS[provider] = threading.BoundedSemaphore(_PROVIDER_LIMITS[provider])
 
+def _async_provider_slot(model: str) -> Optional[asyncio.Semaphore]:
+    """Return the running loop's semaphore for the model's provider, if capped."""
+    provider = provider_for(model)
+    if provider not in _PROVIDER_LIMITS:
+        return None
+    slots = _ASYNC_PROVIDER_SLOTS.setdefault(asyncio.get_running_loop(), {})
+    if provider not in slots:
+        slots[provider] = asyncio.Semaphore(_PROVIDER_LIMITS[provider])
+    return slots[provider]
 
 class LLMResponse:
-    def __init__(self, text: str, total_tokens: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0):
+    def __init__(self, text: str, total_tokens: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0,
+                 texts: Optional[List[str]] = None):
         self.text = text
+        # All returned choices when several samples were requested (n > 1); texts[0] == text.
+        self.texts = texts if texts is not None else [text]
         self.total_tokens = total_tokens
         self.prompt_tokens = prompt_tokens
         self.completion_tokens = completion_tokens
 
+    @classmethod
+    def from_completion(cls, completion) -> "LLMResponse":
+        """Normalize an OpenAI chat completion (possibly with several choices)."""
+        texts = [choice.message.content or "" for choice in completion.choices]
+        usage = completion.usage
+        return cls(
+            text=texts[0] if texts else "",
+            texts=texts,
+            total_tokens=getattr(usage, "total_tokens", 0),
+            prompt_tokens=getattr(usage, "prompt_tokens", 0),
+            completion_tokens=getattr(usage, "completion_tokens", 0),
+        )
+
+
+def _resolve_api_key(model: str, api_key: Optional[str]) -> str:
+    """Resolve the API key for a model.
+
+    The API key is resolved from (in order): explicit arg -> environment -> local_secrets.
+    """
+    model_lower = (model or "").lower()
+    is_deepseek = "deepseek-chat" in model_lower
+
+    # 1) explicit arg
+    resolved_key: Optional[str] = api_key
+
+    # 2) env vars
+    if not resolved_key:
+        if is_deepseek:
+            resolved_key = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
+        else:
+            resolved_key = os.getenv("OPENAI_API_KEY")
+
+    # 3) local_secrets.py (project-root level) if still missing
+    if not resolved_key:
+        try:
+            # Import lazily to avoid hard dependency
+            import local_secrets  # type: ignore
+            if is_deepseek:
+                resolved_key = getattr(local_secrets, "DEEPSEEK_API_KEY", None) or getattr(local_secrets, "OPENAI_API_KEY", None)
+            else:
+                resolved_key = getattr(local_secrets, "OPENAI_API_KEY", None)
+        except Exception:
+            # Ignore import errors; we will raise a clear message below if still missing
+            pass
+
+    if not resolved_key:
+        provider_name = "DeepSeek (DEEPSEEK_API_KEY or OPENAI_API_KEY)" if is_deepseek else "OpenAI (OPENAI_API_KEY)"
+        raise ValueError(
+            f"Missing API key for {provider_name}. "
+            f"Provide api_key via config, set the environment variable, or define it in local_secrets.py."
+        )
+    return resolved_key
+
+
+def _base_url_for(model: str) -> Optional[str]:
+    """Return the OpenAI-compatible base_url for a model (None means the OpenAI default)."""
+    if provider_for(model) == "deepseek":
+        return "https://api.deepseek.com/v1"
+    return None
+
+
+# Explicit timeouts prevent indefinite hangs (seconds).
+_HTTP_TIMEOUT = httpx.Timeout(connect=10.0, read=30.0, write=30.0, pool=10.0)
+_REQUEST_TIMEOUT = 30.0
+_MAX_RETRIES = 5
+
 
 class LLMClient:
     def __init__(self, model: str, api_key: Optional[str]):
@@ -92,78 +136,43 @@ class LLMClient:
     def _init_client(self):
         """Initialize the underlying OpenAI-compatible client with timeouts and key resolution.
 
-        The API key is resolved from (in order): explicit arg -> environment -> local_secrets.
         Also switches base_url for DeepSeek-compatible endpoints.
         """
-        # Configure a client with explicit timeouts to prevent indefinite hangs.
-        # httpx timeout in seconds
-        http_timeout = httpx.Timeout(connect=10.0, read=30.0, write=30.0, pool=10.0)
-
-        # Resolve API key robustly with fallbacks
-        model_lower = (self.model or "").lower()
-        is_deepseek = "deepseek-chat" in model_lower
-
-        # 1) explicit arg
-        resolved_key: Optional[str] = self.api_key
-
-        # 2) env vars
-        if not resolved_key:
-            if is_deepseek:
-                resolved_key = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
-            else:
-                resolved_key = os.getenv("OPENAI_API_KEY")
-
-        # 3) local_secrets.py (project-root level) if still missing
-        if not resolved_key:
-            try:
-                # Import lazily to avoid hard dependency
-                import local_secrets  # type: ignore
-                if is_deepseek:
-                    resolved_key = getattr(local_secrets, "DEEPSEEK_API_KEY", None) or getattr(local_secrets, "OPENAI_API_KEY", None)
-                else:
-                    resolved_key = getattr(local_secrets, "OPENAI_API_KEY", None)
-            except Exception:
-                # Ignore import errors; we will raise a clear message below if still missing
-                pass
-
-        if not resolved_key:
-            provider_name = "DeepSeek (DEEPSEEK_API_KEY or OPENAI_API_KEY)" if is_deepseek else "OpenAI (OPENAI_API_KEY)"
-            raise ValueError(
-                f"Missing API key for {provider_name}. "
-                f"Provide api_key via config, set the environment variable, or define it in local_secrets.py."
-            )
-
+        resolved_key = _resolve_api_key(self.model, self.api_key)
         # Instantiate the client; non-OpenAI models (e.g., local) set client to None.
-        if "gpt" in model_lower and not is_deepseek:
-            self.client = OpenAI(api_key=resolved_key, timeout=http_timeout)
-        elif is_deepseek:
-            self.client = OpenAI(api_key=resolved_key, base_url="https://api.deepseek.com/v1", timeout=http_timeout)
+        if provider_for(self.model) != "ollama":
+            self.client = OpenAI(api_key=resolved_key, base_url=_base_url_for(self.model), timeout=_HTTP_TIMEOUT)
         else:
             self.client = None  # ollama or others handled via chat_ollama
 
-    def chat_openai(self, messages: List[Dict[str, str]], temperature: float) -> LLMResponse:
-        """Call the chat completion API with retries and return a normalized response."""
+    def _create(self, messages: List[Dict[str, str]], temperature: float, n: int):
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            n=n,
+            timeout=_REQUEST_TIMEOUT,  # per-request timeout (seconds)
+        )
+
+    def chat_openai(self, messages: List[Dict[str, str]], temperature: float, n: int = 1) -> LLMResponse:
+        """Call the chat completion API with retries and return a normalized response.
+
+        With n > 1 one request returns several candidates in response.texts.
+        """
         assert self.client is not None
         # Bounded retries with exponential backoff
-        max_retries = 5
         backoff = 2.0
         last_err: Optional[Exception] = None
-        for attempt in range(max_retries):
+        slots = _PROVIDER_SLOTS.get(provider_for(self.model))
+        for attempt in range(_MAX_RETRIES):
             try:
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature,
-                    timeout=30.0,  # per-request timeout (seconds)
-                )
-                content = completion.choices[0].message.content
-                usage = completion.usage
-                return LLMResponse(
-                    text=content or "",
-                    total_tokens=getattr(usage, "total_tokens", 0),
-                    prompt_tokens=getattr(usage, "prompt_tokens", 0),
-                    completion_tokens=getattr(usage, "completion_tokens", 0),
-                )
+                # Hold a provider slot only for the request itself, never during backoff
+                if slots is not None:
+                    with slots:
+                        completion = self._create(messages, temperature, n)
+                else:
+                    completion = self._create(messages, temperature, n)
+                return LLMResponse.from_completion(completion)
             except (openai.APIStatusError, openai.RateLimitError) as e:
                 # Retry on service or rate issues with a growing backoff up to a cap
                 last_err = e
@@ -185,4 +194,87 @@ class LLMClient:
 
     def is_openai_like(self) -> bool:
         """Return True for hosted chat APIs that use the OpenAI schema."""
-        return "gpt" in self.model or "deepseek-chat" in self.model
\ No newline at end of file
+        return "gpt" in self.model or "deepseek-chat" in self.model
+
+
+_CLIENTS: Dict[Tuple[str, Optional[str]], LLMClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(model: str, api_key: Optional[str]) -> LLMClient:
+    """Return the process-wide LLMClient for (model, api_key).
+
+    The underlying OpenAI client is thread-safe and pools its HTTP connections,
+    so every iteration and worker thread shares one instance.
+    """
+    key = (model, api_key)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = LLMClient(model, api_key)
+        return _CLIENTS[key]
+
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient with one pooled HTTP connection.
+
+    Use as an async context manager so the connection pool is closed:
+
+        async with AsyncLLMClient(model, api_key, max_connections=32) as client:
+            response = await client.chat_openai(messages, temperature, n=5)
+    """
+    def __init__(self, model: str, api_key: Optional[str], max_connections: int = 32):
+        self.model = model
+        self.api_key = api_key
+        if provider_for(model) == "ollama":
+            raise NotImplementedError("AsyncLLMClient only supports OpenAI-compatible hosted models.")
+        self._http = httpx.AsyncClient(
+            timeout=_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.client = AsyncOpenAI(api_key=_resolve_api_key(model, api_key), base_url=_base_url_for(model),
+                                  timeout=_HTTP_TIMEOUT, http_client=self._http)
+
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def _create(self, messages: List[Dict[str, str]], temperature: float, n: int):
+        return await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            n=n,
+            timeout=_REQUEST_TIMEOUT,
+        )
+
+    async def chat_openai(self, messages: List[Dict[str, str]], temperature: float, n: int = 1) -> LLMResponse:
+        """Same contract as LLMClient.chat_openai, but backoff never blocks the event loop."""
+        backoff = 2.0
+        last_err: Optional[Exception] = None
+        for attempt in range(_MAX_RETRIES):
+            try:
+                slot = _async_provider_slot(self.model)
+                if slot is not None:
+                    async with slot:
+                        completion = await self._create(messages, temperature, n)
+                else:
+                    completion = await self._create(messages, temperature, n)
+                return LLMResponse.from_completion(completion)
+            except (openai.APIStatusError, openai.RateLimitError) as e:
+                last_err = e
+                await asyncio.sleep(min(60.0, backoff))
+                backoff *= 2.0
+            except (openai.APIConnectionError, httpx.TimeoutException, httpx.HTTPError) as e:
+                last_err = e
+                await asyncio.sleep(min(30.0, backoff))
+                backoff *= 2.0
+            except Exception as e:
+                last_err = e
+                break
+        if last_err:
+            raise last_err
+        raise RuntimeError("chat_openai failed without an exception (unexpected)")
@@ -0,0 +1,199 @@
+"""
+Problem-set and skill-library metadata.
+
+data_files/problem_set.tsv (one row per task) and data_files/lib_info.tsv
+(measured gains, phase and bias of the generated subcircuit library) are
+parsed once per process into typed rows and indexed by task Id, Type and
+Submodule Name, so lookups are dict hits instead of DataFrame scans:
+
+- get_store() returns the shared MetadataStore; it reloads a table only when
+  its file's mtime changes (e.g. after write_all_library regenerates lib_info).
+- TaskRow / LibRow are frozen dataclasses; TaskRow also supports row['Id']
+  style access by TSV column name for code written against pandas rows.
+- allows_subcircuits: whether designs of a task type may instantiate
+  subcircuits (circuit.X): the skill-library types, VCO and PLL.
+"""
+import os
+import threading
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.config import COMPLEX_TASK_TYPES
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data_files"
+PROBLEM_SET_PATH = DATA_DIR / "problem_set.tsv"
+LIB_INFO_PATH = DATA_DIR / "lib_info.tsv"
+# Task types whose designs may use subcircuits; every other type is built from primitives only.
+SUBCIRCUIT_TASK_TYPES = frozenset(COMPLEX_TASK_TYPES) | {"VCO", "PLL"}
+
+
+def allows_subcircuits(task_type: str) -> bool:
+    return task_type in SUBCIRCUIT_TASK_TYPES
+
+
+def split_nodes(value: str) -> List[str]:
+    """Split a comma-separated node list like 'Vin, Vbias' into ['Vin', 'Vbias']."""
+    return [part.strip() for part in str(value).split(",") if part.strip()]
+
+
+def _float_or_none(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None  # 'NA' or empty
+
+
+@dataclass(frozen=True)
+class TaskRow:
+    """One task of problem_set.tsv."""
+    id: int
+    level: str
+    circuit: str
+    input: str
+    output: str
+    type: str
+    submodule_name: str
+
+    COLUMNS = {"Id": "id", "Level": "level", "Circuit": "circuit", "Input": "input",
+               "Output": "output", "Type": "type", "Submodule Name": "submodule_name"}
+
+    def __getitem__(self, column: str):
+        return getattr(self, self.COLUMNS[column])
+
+    @property
+    def input_nodes(self) -> List[str]:
+        return split_nodes(self.input)
+
+    @property
+    def output_nodes(self) -> List[str]:
+        return split_nodes(self.output)
+
+    @property
+    def allows_subcircuits(self) -> bool:
+        return allows_subcircuits(self.type)
+
+
+@dataclass(frozen=True)
+class LibRow:
+    """One subcircuit of lib_info.tsv; gains are in dB, None where not applicable."""
+    id: int
+    type: str
+    av_db: Optional[float]
+    com_av_db: Optional[float]
+    vin_phase: str
+    voltage_bias: float
+
+
+def _read_tsv(path: Path) -> pd.DataFrame:
+    # Keep 'NA' and friends as text; the typed rows decide what is missing.
+    return pd.read_csv(path, delimiter="\t", dtype=str, keep_default_na=False)
+
+
+def _load_tasks(path: Path) -> Dict[int, TaskRow]:
+    df = _read_tsv(path)
+    names = [f.name for f in fields(TaskRow)]
+    rows: Dict[int, TaskRow] = {}
+    for record in df.to_dict("records"):
+        values = {attr: record.get(column, "").strip() for column, attr in TaskRow.COLUMNS.items()}
+        values["id"] = int(values["id"])
+        rows[values["id"]] = TaskRow(**{name: values[name] for name in names})
+    return rows
+
+
+def _load_lib(path: Path) -> Dict[int, LibRow]:
+    rows: Dict[int, LibRow] = {}
+    for record in _read_tsv(path).to_dict("records"):
+        row = LibRow(
+            id=int(record["Id"]),
+            type=record.get("Type", "").strip(),
+            av_db=_float_or_none(record.get("Av (dB)")),
+            com_av_db=_float_or_none(record.get("Com Av (dB)")),
+            vin_phase=record.get("Vin(n) Phase", "").strip(),
+            voltage_bias=_float_or_none(record.get("Voltage Bias")) or 0.0,
+        )
+        rows[row.id] = row
+    return rows
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class MetadataStore:
+    """Indexed view of problem_set.tsv and lib_info.tsv."""
+
+    def __init__(self, problem_set_path: Path = PROBLEM_SET_PATH, lib_info_path: Path = LIB_INFO_PATH):
+        self.problem_set_path = Path(problem_set_path)
+        self.lib_info_path = Path(lib_info_path)
+        self._lock = threading.Lock()
+        self._task_mtime: Optional[float] = None
+        self._lib_mtime: Optional[float] = None
+        self._tasks: Dict[int, TaskRow] = {}
+        self._by_type: Dict[str, List[TaskRow]] = {}
+        self._by_submodule: Dict[str, TaskRow] = {}
+        self._lib: Dict[int, LibRow] = {}
+
+    def refresh(self) -> None:
+        """Reload whichever table changed on disk since it was last read."""
+        with self._lock:
+            mtime = _mtime(self.problem_set_path)
+            if mtime != self._task_mtime:
+                tasks = _load_tasks(self.problem_set_path) if mtime is not None else {}
+                by_type: Dict[str, List[TaskRow]] = {}
+                for row in tasks.values():
+                    by_type.setdefault(row.type, []).append(row)
+                self._tasks, self._by_type, self._task_mtime = tasks, by_type, mtime
+                self._by_submodule = {row.submodule_name: row for row in tasks.values() if row.submodule_name}
+            mtime = _mtime(self.lib_info_path)
+            if mtime != self._lib_mtime:
+                self._lib = _load_lib(self.lib_info_path) if mtime is not None else {}
+                self._lib_mtime = mtime
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def tasks(self) -> List[TaskRow]:
+        """All tasks in file order."""
+        return list(self._tasks.values())
+
+    def task(self, task_id: int) -> TaskRow:
+        """Row for a task Id (KeyError if unknown)."""
+        return self._tasks[int(task_id)]
+
+    def tasks_of_type(self, task_type: str) -> List[TaskRow]:
+        return list(self._by_type.get(task_type, []))
+
+    def task_by_submodule(self, name: str) -> TaskRow:
+        return self._by_submodule[name]
+
+    def library(self) -> List[LibRow]:
+        """All lib_info.tsv rows in file order."""
+        return list(self._lib.values())
+
+    def lib_info(self, task_id: int) -> LibRow:
+        """lib_info.tsv row for a subcircuit Id (KeyError if not in the library)."""
+        return self._lib[int(task_id)]
+
+    def versions(self) -> Tuple[Optional[float], Optional[float]]:
+        """File mtimes the current tables were loaded from (for dependent caches)."""
+        return self._task_mtime, self._lib_mtime
+
+
+_STORE: Optional[MetadataStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> MetadataStore:
+    """Process-wide store, loaded on first use and refreshed when a TSV changes."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = MetadataStore()
+    _STORE.refresh()
+    return _STORE
@@ -0,0 +1,157 @@
+"""
+Measured metrics of successful designs, and best-design selection.
+
+write_all_library measures every successful design once (gain, common-mode
+and differential gain, phase, supply power, input bias) and records it here,
+keyed by the design's check file together with a content hash of the design.
+Choosing the design each library entry is generated from is a query over
+these records with a ranking policy, so changing the policy re-selects
+without running a single simulation:
+
+- MetricsStore: JSON-backed records indexed by task and by (task, model).
+- RANKING_POLICIES: name -> policy(task_type, records) -> best record;
+  register_policy() adds new ones. "max_gain" is the historical behaviour.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_PATH = "library_metrics.json"
+
+
+@dataclass
+class DesignRecord:
+    """One successful design and what its checker measured."""
+    path: str  # the design's _check.py
+    task_id: int
+    model: str
+    task_type: str
+    design_hash: str
+    metrics: Dict[str, float] = field(default_factory=dict)
+    bias_voltage: Optional[float] = None
+
+    def metric(self, name: str) -> Optional[float]:
+        value = self.metrics.get(name)
+        return None if value is None else float(value)
+
+
+class MetricsStore:
+    """Every measured design, persisted as JSON and indexed by task and model."""
+
+    def __init__(self, path: str = METRICS_PATH):
+        self.path = path
+        self._records: Dict[str, DesignRecord] = {}
+        self._by_task: Dict[int, List[DesignRecord]] = {}
+        self._by_task_model: Dict[Tuple[int, str], List[DesignRecord]] = {}
+
+    @classmethod
+    def load(cls, path: str = METRICS_PATH) -> "MetricsStore":
+        store = cls(path)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for record in json.load(f):
+                    store.add(DesignRecord(**record))
+        return store
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([asdict(r) for r in self._records.values()], f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def add(self, record: DesignRecord) -> None:
+        """Insert or replace the record of a design (by its check file path)."""
+        if record.path in self._records:
+            old = self._records[record.path]
+            self._by_task[old.task_id].remove(old)
+            self._by_task_model[(old.task_id, old.model)].remove(old)
+        self._records[record.path] = record
+        self._by_task.setdefault(record.task_id, []).append(record)
+        self._by_task_model.setdefault((record.task_id, record.model), []).append(record)
+
+    def get(self, path: str) -> Optional[DesignRecord]:
+        return self._records.get(path)
+
+    def records(self, task_id: Optional[int] = None, model: Optional[str] = None) -> List[DesignRecord]:
+        """Records of a task (optionally one model's), in the order they were first added."""
+        if task_id is None:
+            found = list(self._records.values())
+            return [r for r in found if r.model == model] if model is not None else found
+        if model is None:
+            return list(self._by_task.get(task_id, []))
+        return list(self._by_task_model.get((task_id, model), []))
+
+
+# -----------------------------
+# Ranking policies
+# -----------------------------
+RankingPolicy = Callable[[str, List[DesignRecord]], Optional[DesignRecord]]
+RANKING_POLICIES: Dict[str, RankingPolicy] = {}
+DEFAULT_POLICY = "max_gain"
+
+
+def register_policy(name: str):
+    """Decorator registering a policy under `name` (used by --policy)."""
+    def register(policy: RankingPolicy) -> RankingPolicy:
+        RANKING_POLICIES[name] = policy
+        return policy
+    return register
+
+
+def best_by(records: Iterable[DesignRecord], key: Callable[[DesignRecord], Optional[float]]) -> Optional[DesignRecord]:
+    """Record with the largest positive key; the first one wins ties, None keys are skipped."""
+    best, best_key = None, 0.0
+    for record in records:
+        value = key(record)
+        if value is not None and value > best_key:
+            best, best_key = record, value
+    return best
+
+
+def _amplifier_gain(record: DesignRecord) -> Optional[float]:
+    gain = record.metric("gain")
+    # Gains above 1e4 come from broken biasing rather than a real amplifier.
+    return gain if gain is not None and gain <= 1e4 else None
+
+
+@register_policy("max_gain")
+def max_gain(task_type: str, records: List[DesignRecord]) -> Optional[DesignRecord]:
+    """Highest gain (differential gain for op-amps); the last design for other types."""
+    if task_type == "Amplifier":
+        return best_by(records, _amplifier_gain)
+    if task_type == "Opamp":
+        return best_by(records, lambda r: r.metric("diff_gain"))
+    return records[-1] if records else None
+
+
+@register_policy("gain_per_watt")
+def gain_per_watt(task_type: str, records: List[DesignRecord]) -> Optional[DesignRecord]:
+    """Highest gain per watt of supply power; designs without a power figure are skipped."""
+    def efficiency(record: DesignRecord) -> Optional[float]:
+        gain = _amplifier_gain(record) if task_type == "Amplifier" else record.metric("diff_gain")
+        power = record.metric("power")
+        if gain is None or power is None or power <= 0:
+            return None
+        return gain / power
+    if task_type in ("Amplifier", "Opamp"):
+        return best_by(records, efficiency)
+    return max_gain(task_type, records)
+
+
+@register_policy("max_cmrr")
+def max_cmrr(task_type: str, records: List[DesignRecord]) -> Optional[DesignRecord]:
+    """Op-amps with the highest differential / common-mode gain ratio; max_gain otherwise."""
+    def cmrr(record: DesignRecord) -> Optional[float]:
+        diff_gain, cm_gain = record.metric("diff_gain"), record.metric("cm_gain")
+        if diff_gain is None or not cm_gain:
+            return None
+        return diff_gain / cm_gain
+    if task_type == "Opamp":
+        return best_by(records, cmrr)
+    return max_gain(task_type, records)
+
+
+def select_design(task_type: str, records: List[DesignRecord], policy: str = DEFAULT_POLICY) -> Optional[DesignRecord]:
+    """Pick the design a library entry is generated from."""
+    return RANKING_POLICIES[policy](task_type, records)
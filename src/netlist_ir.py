@@ -0,0 +1,341 @@
+"""
+Compact netlist IR for structural checks.
+
+A SPICE netlist (as printed by PySpice's `str(circuit)`) or a netlist
+rebuilt statically from design code (see static_check) is stored as:
+
+- interned node ids: node names are lower-cased (ngspice is case-insensitive)
+  and numbered in order of first appearance; "0" and "gnd" are node 0;
+- array-backed element tables: one row per element with its SPICE letter,
+  name and model, and the pins of all elements in one flat int array
+  indexed by `pin_ptr` (CSR layout);
+- `.model` cards with their numeric parameters.
+
+Structural queries (DC paths to ground, node -> element incidence, MOSFET
+terminal tables, elements connecting two nodes) and the operating region of
+every MOSFET (MosfetTable.bias, using each model card's VTO) are vectorized
+over these arrays, so they stay linear on netlists with thousands of devices.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+GROUND = 0
+GROUND_NAMES = ("0", "gnd")
+
+# SPICE letter -> number of node pins (X: every positional token before the subcircuit name).
+PIN_COUNTS: Dict[str, int] = {
+    **dict.fromkeys("RCLVIDBFHW", 2),
+    **dict.fromkeys("EGSTM", 4),
+    **dict.fromkeys("QJZ", 3),
+    "K": 0,
+}
+# SPICE letter -> groups of pins joined by a DC path through the element.
+DC_PATHS: Dict[str, Tuple[Tuple[int, ...], ...]] = {
+    **dict.fromkeys("RLVDBHW", ((0, 1),)),
+    **dict.fromkeys("ES", ((0, 1),)),  # output pins only
+    "M": ((0, 2, 3),),  # the gate is insulated
+    **dict.fromkeys("QJZ", ((0, 1, 2),)),
+    "T": ((0, 1), (2, 3)),
+    **dict.fromkeys("CIFGK", ()),
+}
+# SPICE letter -> index of the model name token (after the element name).
+MODEL_TOKEN = {"M": 4, "D": 2, "Q": 3, "J": 3, "Z": 3}
+MOSFET_PINS = ("drain", "gate", "source", "bulk")
+# |V_TH| assumed for MOSFETs whose model card is not in the netlist (e.g. an included library).
+DEFAULT_VTH = 0.5
+CUTOFF, TRIODE, SATURATION = 0, 1, 2
+REGION_NAMES = ("cutoff", "triode", "saturation")
+
+_PARAM_RE = re.compile(r"([A-Za-z_]\w*)\s*=\s*([^\s()=]+)")
+_SUFFIXES = {"t": 1e12, "g": 1e9, "meg": 1e6, "k": 1e3, "mil": 25.4e-6,
+             "m": 1e-3, "u": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15}
+_NUMBER_RE = re.compile(r"^([+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)(meg|mil|[tgkmunpf])?", re.IGNORECASE)
+
+
+def spice_number(text: str) -> Optional[float]:
+    """Parse a SPICE number like '1e-6', '10k' or '2.5Meg' (None if not numeric)."""
+    match = _NUMBER_RE.match(text.strip())
+    if match is None:
+        return None
+    value = float(match.group(1))
+    suffix = match.group(2)
+    return value * _SUFFIXES[suffix.lower()] if suffix else value
+
+
+@dataclass
+class Model:
+    """A .model card: device kind (nmos, pmos, d, npn, ...) and numeric parameters."""
+    name: str
+    kind: str
+    params: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class MosfetBias:
+    """Bias of every MOSFET, sign-normalized so that positive V_GS / V_DS turn NMOS and PMOS on."""
+    vgs: np.ndarray
+    vds: np.ndarray
+    overdrive: np.ndarray  # V_GS - V_TH
+    region: np.ndarray  # CUTOFF, TRIODE or SATURATION
+
+
+@dataclass
+class MosfetTable:
+    """Terminals of every MOSFET as parallel arrays (one entry per device)."""
+    index: np.ndarray  # element index in the netlist
+    drain: np.ndarray
+    gate: np.ndarray
+    source: np.ndarray
+    bulk: np.ndarray
+    model: List[str]
+    is_pmos: np.ndarray
+    vth: np.ndarray  # |VTO| of the device's model card
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def pin(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    @property
+    def diode_connected(self) -> np.ndarray:
+        return self.gate == self.drain
+
+    def bias(self, voltages: np.ndarray) -> MosfetBias:
+        """Classify the operating region of every device from node voltages (indexed by node id)."""
+        sign = np.where(self.is_pmos, -1.0, 1.0)
+        vs = voltages[self.source]
+        vgs = sign * (voltages[self.gate] - vs)
+        vds = sign * (voltages[self.drain] - vs)
+        overdrive = vgs - self.vth
+        region = np.where(overdrive <= 0, CUTOFF, np.where(vds < overdrive, TRIODE, SATURATION))
+        return MosfetBias(vgs, vds, overdrive, region)
+
+
+class Netlist:
+    """Interned nodes, element tables and model cards of one circuit."""
+
+    def __init__(self, title: str = ""):
+        self.title = title
+        self.node_names: List[str] = [GROUND_NAMES[0]]
+        self._node_ids: Dict[str, int] = {name: GROUND for name in GROUND_NAMES}
+        self.element_names: List[str] = []
+        self._kinds: List[str] = []
+        self._models: List[str] = []
+        self._pins: List[int] = []
+        self._pin_ptr: List[int] = [0]
+        self.models: Dict[str, Model] = {}
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    # -----------------------------
+    # Building
+    # -----------------------------
+    def node_id(self, name: str) -> int:
+        """Id of a node, interning it on first use."""
+        key = str(name).lower()
+        node = self._node_ids.get(key)
+        if node is None:
+            node = self._node_ids[key] = len(self.node_names)
+            self.node_names.append(key)
+        return node
+
+    def add(self, kind: str, name: str, nodes: Sequence[str], model: str = "") -> int:
+        """Append an element (SPICE letter `kind`) and return its index."""
+        self._kinds.append(kind.upper())
+        self.element_names.append(name)
+        self._models.append(model.lower())
+        self._pins.extend(self.node_id(n) for n in nodes)
+        self._pin_ptr.append(len(self._pins))
+        self._arrays = None
+        return len(self._kinds) - 1
+
+    def add_model(self, name: str, kind: str, params: Dict[str, float]) -> None:
+        self.models[name.lower()] = Model(name.lower(), kind.lower(), params)
+
+    @classmethod
+    def parse(cls, text: str) -> "Netlist":
+        """Build the IR from SPICE netlist text; subcircuit definitions are skipped."""
+        netlist = cls()
+        lines: List[str] = []
+        for raw in text.splitlines():
+            line = raw.strip()
+            if line.startswith("+") and lines:
+                lines[-1] += " " + line[1:]
+            elif line and not line.startswith("*"):
+                lines.append(line)
+        depth = 0
+        for line in lines:
+            lower = line.lower()
+            if lower.startswith(".subckt"):
+                depth += 1
+            elif lower.startswith(".ends"):
+                depth = max(depth - 1, 0)
+            elif depth:
+                continue
+            elif lower.startswith(".title"):
+                netlist.title = line[len(".title"):].strip()
+            elif lower.startswith(".model"):
+                tokens = line.replace("(", " ").replace(")", " ").split()
+                if len(tokens) >= 3:
+                    params = {k.lower(): spice_number(v) for k, v in _PARAM_RE.findall(line)}
+                    netlist.add_model(tokens[1], tokens[2],
+                                      {k: v for k, v in params.items() if v is not None})
+            elif not line.startswith("."):
+                netlist._add_card(line)
+        return netlist
+
+    @classmethod
+    def from_file(cls, path: str) -> "Netlist":
+        with open(path, "r") as f:
+            return cls.parse(f.read())
+
+    def _add_card(self, line: str) -> None:
+        tokens = line.split()
+        kind = tokens[0][0].upper()
+        args = tokens[1:]
+        if kind == "X":
+            positional = [t for t in args if "=" not in t]
+            nodes = positional[:-1]
+            model = positional[-1] if positional else ""
+        elif kind in PIN_COUNTS:
+            nodes = args[:PIN_COUNTS[kind]]
+            model_pos = MODEL_TOKEN.get(kind)
+            model = args[model_pos] if model_pos is not None and len(args) > model_pos else ""
+        else:
+            return  # XSPICE and other cards carry no nodes we model
+        self.add(kind, tokens[0], nodes, model)
+
+    # -----------------------------
+    # Tables
+    # -----------------------------
+    def _tables(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = (np.array(self._kinds, dtype="<U1"),
+                            np.array(self._pins, dtype=np.int64),
+                            np.array(self._pin_ptr, dtype=np.int64))
+        return self._arrays
+
+    @property
+    def kinds(self) -> np.ndarray:
+        return self._tables()[0]
+
+    @property
+    def pins(self) -> np.ndarray:
+        return self._tables()[1]
+
+    @property
+    def pin_ptr(self) -> np.ndarray:
+        return self._tables()[2]
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_names)
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def node(self, name: str) -> int:
+        """Id of an existing node, -1 if the netlist does not use it."""
+        return self._node_ids.get(str(name).lower(), -1)
+
+    def element_pins(self, index: int) -> np.ndarray:
+        return self.pins[self.pin_ptr[index]:self.pin_ptr[index + 1]]
+
+    def count(self, kind: str) -> int:
+        return int(np.count_nonzero(self.kinds == kind))
+
+    def terminals(self, kind: str, n_pins: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(element indices, pins[n_elements, n_pins]) of every element of one kind."""
+        n_pins = PIN_COUNTS[kind] if n_pins is None else n_pins
+        index = np.flatnonzero(self.kinds == kind)
+        # elements with fewer pins than expected (malformed cards) are left out
+        index = index[self.pin_ptr[index + 1] - self.pin_ptr[index] >= n_pins]
+        return index, self.pins[self.pin_ptr[index][:, None] + np.arange(n_pins)]
+
+    def mosfets(self) -> MosfetTable:
+        index, pins = self.terminals("M")
+        models = [self._models[i] for i in index]
+        # one lookup per distinct model, then broadcast to the devices
+        names, inverse = np.unique(np.array(models, dtype=str), return_inverse=True)
+        kinds = [self._model_kind(m) for m in names]
+        is_pmos = np.array([k == "pmos" for k in kinds], dtype=bool)[inverse]
+        vth = np.array([self._model_vth(m) for m in names], dtype=float)[inverse]
+        return MosfetTable(index, pins[:, 0], pins[:, 1], pins[:, 2], pins[:, 3], models,
+                           is_pmos.reshape(-1), vth.reshape(-1))
+
+    def _model_kind(self, name: str) -> str:
+        model = self.models.get(name)
+        if model is not None:
+            return model.kind
+        # no card (e.g. an included library): fall back to the model's name
+        return "pmos" if "pmos" in name else "nmos"
+
+    def _model_vth(self, name: str) -> float:
+        model = self.models.get(name)
+        if model is None:
+            return DEFAULT_VTH
+        return abs(model.params.get("vto", 0.0))  # ngspice's VTO default is 0
+
+    def connects(self, kind: str, a: int, b: int) -> bool:
+        """True if some two-pin element of `kind` sits between nodes a and b."""
+        _, pins = self.terminals(kind, 2)
+        return bool(np.any(((pins[:, 0] == a) & (pins[:, 1] == b)) | ((pins[:, 0] == b) & (pins[:, 1] == a))))
+
+    # -----------------------------
+    # Connectivity
+    # -----------------------------
+    def incidence(self) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR node -> element adjacency: elements at node n are elements[ptr[n]:ptr[n + 1]]."""
+        owner = np.repeat(np.arange(len(self)), np.diff(self.pin_ptr))
+        order = np.argsort(self.pins, kind="stable")
+        ptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.pins, minlength=self.n_nodes), out=ptr[1:])
+        return ptr, owner[order]
+
+    def dc_components(self) -> np.ndarray:
+        """Component label of every node in the graph of DC paths through elements."""
+        heads: List[np.ndarray] = []
+        tails: List[np.ndarray] = []
+        for kind, groups in DC_PATHS.items():
+            if not groups:
+                continue
+            _, pins = self.terminals(kind)
+            for group in groups:
+                for pin in group[1:]:
+                    heads.append(pins[:, group[0]])
+                    tails.append(pins[:, pin])
+        # subcircuit instances: internals unknown, assume all pins are joined
+        index = np.flatnonzero(self.kinds == "X")
+        if len(index):
+            starts, ends = self.pin_ptr[index], self.pin_ptr[index + 1]
+            first = np.repeat(starts, ends - starts)
+            pins_at = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+            heads.append(self.pins[first])
+            tails.append(self.pins[pins_at])
+        head = np.concatenate(heads) if heads else np.zeros(0, dtype=np.int64)
+        tail = np.concatenate(tails) if tails else np.zeros(0, dtype=np.int64)
+        graph = sparse.coo_matrix((np.ones(len(head), dtype=np.int8), (head, tail)),
+                                  shape=(self.n_nodes, self.n_nodes))
+        _, labels = connected_components(graph, directed=False)
+        return labels
+
+    def floating_nodes(self) -> List[str]:
+        """Used nodes without a DC path to ground, in order of first appearance."""
+        labels = self.dc_components()
+        used = np.zeros(self.n_nodes, dtype=bool)
+        used[self.pins] = True
+        floating = np.flatnonzero(used & (labels != labels[GROUND]))
+        return [self.node_names[n] for n in floating]
+
+
+def netlist_from_elements(elements: Iterable[Tuple[str, str, Sequence[str]]]) -> Netlist:
+    """Build the IR from (SPICE letter, element name, nodes) triples."""
+    netlist = Netlist()
+    for kind, name, nodes in elements:
+        netlist.add(kind, name, nodes)
+    return netlist
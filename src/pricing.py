@@ -0,0 +1,18 @@
+"""
+Dollar cost of LLM completions.
+
+One price table for everything that turns token counts into money: the
+worker's budget and run records, and the leaderboard's cost per success
+when it rebuilds tallies from old worker logs.
+"""
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Approximate dollar cost of one completion (simple money accounting)."""
+    if "ft:gpt-3.5" in model:
+        return (prompt_tokens / 1e6 * 3) + (completion_tokens / 1e6 * 6)
+    if "gpt-3" in model:
+        return (prompt_tokens / 1e6 * 0.5) + (completion_tokens / 1e6 * 1.5)
+    if "gpt-4" in model:
+        return (prompt_tokens / 1e6 * 10) + (completion_tokens / 1e6 * 30)
+    return 0.0
@@ -3,49 +3,125 @@ Prompt assembly helpers.
 
 Responsible for reading template files and filling them based on runtime config
 and task metadata (type, I/O nodes, retrieval info for complex tasks).
+
+Templates are compiled once per process: each templates/*.md file is read and
+split into literal text and [PLACEHOLDER] slots, so rendering a prompt is a
+single join instead of a file read plus one str.replace pass per placeholder.
+The complex-task variant of a base template (rule "Avoid using subcircuits."
+removed, later rules renumbered) is derived once from the parsed rule list.
+
+Run `python -m src.prompts` to time prompt rendering.
 """
-from typing import Tuple
+import re
+from functools import lru_cache
 from pathlib import Path
+from typing import List, Tuple
+
 from src.config import AppConfig, COMPLEX_TASK_TYPES
 
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+
 BIAS_USAGE = """Due to the operational range of the op-amp being 0 to 5V, please connect the nodes that were originally grounded to a 2.5V DC power source.
 Please increase the gain as much as possible to maintain oscillation.
 """
 
-def _read_file(path: str) -> str:
-    """Read a file by absolute path or relative to this module's directory."""
-    base_dir = Path(__file__).resolve().parent
-    target = Path(path)
-    final_path = target if target.is_absolute() else (base_dir / target).resolve()
-    with open(final_path, "r") as f:
-        return f.read()
+_PLACEHOLDER_RE = re.compile(r"\[([A-Z_]+)\]")
+_RULE_RE = re.compile(r"^(\d+)\. ", re.MULTILINE)
+NO_SUBCIRCUITS_RULE = "Avoid using subcircuits."
 
-def base_prompt_for(config: AppConfig) -> str:
+
+class PromptTemplate:
+    """A template parsed into literal segments and placeholder slots.
+
+    render() fills the slots in one pass; placeholders without a value are kept
+    verbatim (e.g. [ERROR] in templates that are filled elsewhere).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, str]] = []  # (index into _parts, placeholder name)
+        pos = 0
+        for m in _PLACEHOLDER_RE.finditer(text):
+            self._parts.append(text[pos:m.start()])
+            self._slots.append((len(self._parts), m.group(1)))
+            self._parts.append(m.group(0))
+            pos = m.end()
+        self._parts.append(text[pos:])
+        self.placeholders = frozenset(name for _, name in self._slots)
+
+    def render(self, **values: str) -> str:
+        parts = list(self._parts)
+        for idx, name in self._slots:
+            if name in values:
+                parts[idx] = values[name]
+        return "".join(parts)
+
+    def without_rule(self, rule: str) -> "PromptTemplate":
+        """Drop the numbered rule `rule` and renumber the rules after it.
+
+        The rule's line is left empty (as the prompts have always had it), and
+        only the numbered items that follow it in the same list are shifted.
+        """
+        lines = self.text.split("\n")
+        for i, line in enumerate(lines):
+            m = _RULE_RE.match(line)
+            if m and line[m.end():].strip() == rule:
+                break
+        else:
+            return self
+        number = int(m.group(1))
+        lines[i] = ""
+        for j in range(i + 1, len(lines)):
+            m = _RULE_RE.match(lines[j])
+            if not m or int(m.group(1)) != number + 1:
+                break
+            lines[j] = f"{number}. " + lines[j][m.end():]
+            number += 1
+        return PromptTemplate("\n".join(lines))
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> PromptTemplate:
+    """Read and compile templates/<name> (cached for the life of the process)."""
+    with open(TEMPLATE_DIR / name, "r") as f:
+        return PromptTemplate(f.read())
+
+
+@lru_cache(maxsize=None)
+def _subcircuit_template(name: str) -> PromptTemplate:
+    # Complex tasks are built from subcircuits, so the base rule forbidding them is dropped.
+    return load_template(name).without_rule(NO_SUBCIRCUITS_RULE)
+
+
+def base_template_name(config: AppConfig) -> str:
     """Select the base prompt template file according to flags in config."""
-    # Select prompt template
     if config.no_prompt:
-        path = 'prompt_template_wo_prompt.md'
-    elif config.no_context:
-        path = '../templates/prompt_template_wo_context.md'
-    elif config.no_chain:
-        path = '../templates/prompt_template_wo_chain_of_thought.md'
-    elif config.ngspice:
-        path = '../templates/prompt_template_ngspice.md'
-    else:
-        path = '../templates/prompt_template.md'
-    return _read_file(path)
+        return 'prompt_template_wo_prompt.md'
+    if config.no_context:
+        return 'prompt_template_wo_context.md'
+    if config.no_chain:
+        return 'prompt_template_wo_chain_of_thought.md'
+    if config.ngspice:
+        return 'prompt_template_ngspice.md'
+    return 'prompt_template.md'
+
+
+def base_prompt_for(config: AppConfig) -> str:
+    """Return the raw base prompt template selected by config."""
+    return load_template(base_template_name(config)).text
 
 def complex_prompt_template() -> str:
     """Return the complex-task prompt template contents."""
-    return _read_file('../templates/prompt_template_complex.md')
+    return load_template('prompt_template_complex.md').text
 
 def simulation_error_prompt() -> str:
     """Return the simulation-error hint template."""
-    return _read_file('../templates/simulation_error.md')
+    return load_template('simulation_error.md').text
 
 def execution_error_prompt() -> str:
     """Return the execution-error hint template."""
-    return _read_file('../templates/execution_error.md')
+    return load_template('execution_error.md').text
 
 def build_prompt(config: AppConfig, task: str, input_nodes: str, output_nodes: str, task_type: str,
                  subcircuits_info: str = "", note_info: str = "", call_info: str = "") -> Tuple[str, float]:
@@ -55,22 +131,39 @@ def build_prompt(config: AppConfig, task: str, input_nodes: str, output_nodes: s
     Returns (prompt_text, bias_voltage_hint).
     """
     if task_type not in COMPLEX_TASK_TYPES or not config.skill:
-        prompt = base_prompt_for(config)
-        prompt = prompt.replace('[TASK]', task).replace('[INPUT]', input_nodes).replace('[OUTPUT]', output_nodes)
-        bias_voltage = 2.5 if task_type in COMPLEX_TASK_TYPES else None
         if task_type in COMPLEX_TASK_TYPES:
             # Allow subcircuits in complex tasks
-            prompt = prompt.replace('6. Avoid using subcircuits.', '').replace('7.', '6.').replace('8.', '7.')
-        return prompt, (bias_voltage if bias_voltage is not None else 0.0)
+            template = _subcircuit_template(base_template_name(config))
+        else:
+            template = load_template(base_template_name(config))
+        prompt = template.render(TASK=task, INPUT=input_nodes, OUTPUT=output_nodes)
+        return prompt, (2.5 if task_type in COMPLEX_TASK_TYPES else 0.0)
     else:
-        prompt = complex_prompt_template()
-        prompt = (prompt.replace('[TASK]', task)
-                        .replace('[INPUT]', input_nodes)
-                        .replace('[OUTPUT]', output_nodes)
-                        .replace('[SUBCIRCUITS_INFO]', subcircuits_info)
-                        .replace('[NOTE_INFO]', note_info)
-                        .replace('[CALL_INFO]', call_info))
+        prompt = load_template('prompt_template_complex.md').render(
+            TASK=task, INPUT=input_nodes, OUTPUT=output_nodes,
+            SUBCIRCUITS_INFO=subcircuits_info, NOTE_INFO=note_info, CALL_INFO=call_info)
         if task_type == "Oscillator":
             prompt += "\n" + BIAS_USAGE
         # note_info provider returns numeric bias voltage; caller can pass it back
-        return prompt, 0.0
\ No newline at end of file
+        return prompt, 0.0
+
+
+if __name__ == "__main__":
+    import dataclasses
+    import timeit
+
+    from src.config import build_parser, config_from_args
+
+    config = config_from_args(build_parser().parse_args([]))
+    cases = [
+        ("plain", config, "Amplifier"),
+        ("complex, no skill", config, "Integrator"),
+        ("complex, skill", dataclasses.replace(config, skill=True), "Oscillator"),
+    ]
+    n = 10000
+    for label, cfg, task_type in cases:
+        build_prompt(cfg, "a circuit", "Vin", "Vout", task_type, "subcircuits", "note", "call")
+        seconds = timeit.timeit(
+            lambda: build_prompt(cfg, "a circuit", "Vin", "Vout", task_type, "subcircuits", "note", "call"),
+            number=n)
+        print(f"{label:18s} {seconds / n * 1e6:8.1f} us/prompt")
@@ -0,0 +1,152 @@
+"""
+Closed-loop repair of generated designs.
+
+Every iteration of a task is a short conversation: the design the LLM
+returns is judged by analysis.evaluate_designs() (static pre-check, then the
+operating point with check_netlist, then the task's AC / transient checker),
+and the message of the first failing stage becomes the next user turn. The
+loop stops when a design passes or after config.num_of_retry repair rounds.
+
+The conversation is kept compact by RepairContext rather than growing by a
+full answer and a full error dump per round: only the latest answer keeps its
+code (earlier ones are reduced to their prose), error feedback goes through
+compaction.compact_log, feedback repeated in a later round is replaced by a
+reference to it, every message is capped at MESSAGE_TOKEN_BUDGET and the
+oldest rounds are dropped once the whole prompt exceeds CONTEXT_TOKEN_BUDGET.
+
+Each round is accounted in a RoundStats record (tokens spent and reused from
+the response cache, the prompt size and what compaction saved, simulations
+run and skipped by the cheaper stages, wall time and the estimated time
+those skipped simulations would have taken), written to the task log after
+the round and summed per iteration.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.analysis import DesignEvaluation, mean_stage_seconds
+from src.check_result import CheckResult
+from src.compaction import compact_log, estimate_tokens, fit_tokens
+
+# Sent back when an answer contains no code block at all.
+NO_CODE_MESSAGE = ("I could not find a Python code block in your answer. "
+                   "Please write the complete code in a single ```python code block.")
+# Per repair message (answer prose or feedback) and for the whole prompt.
+MESSAGE_TOKEN_BUDGET = 1500
+CONTEXT_TOKEN_BUDGET = 12000
+SAME_FEEDBACK = "The code failed with the same error as in the latest round below."
+
+CODE_BLOCK = re.compile(r"```[a-zA-Z]*\n.*?(?:```|$)", re.DOTALL)
+
+
+@dataclass
+class RoundStats:
+    """Cost and savings of one repair round of one iteration."""
+    it: int
+    round: int
+    code: str = "no_code"
+    stage: str = ""
+    passed: bool = False
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reused_tokens: int = 0  # answered from the response cache
+    context_tokens: int = 0  # estimated prompt size of the round
+    compacted_tokens: int = 0  # estimated prompt tokens removed by RepairContext
+    simulations: int = 0
+    simulations_skipped: int = 0
+    seconds: float = 0.0
+    seconds_saved: float = 0.0  # estimated run time of the skipped simulations
+    llm_seconds: float = 0.0  # latency of the LLM request (0 for reused answers)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    def record(self, evaluation: Optional[DesignEvaluation]) -> None:
+        """Fill in the check outcome and the simulation accounting of a round."""
+        if evaluation is None:
+            return
+        self.code, self.stage, self.passed = evaluation.check.code, evaluation.stage, evaluation.check.passed
+        self.metrics, self.stage_seconds = dict(evaluation.check.metrics), dict(evaluation.seconds)
+        self.simulations = evaluation.simulations
+        self.simulations_skipped = len(evaluation.skipped)
+        self.seconds_saved = sum(mean_stage_seconds(stage) for stage in evaluation.skipped)
+
+    def line(self) -> str:
+        outcome = "passed" if self.passed else f"failed at {self.stage or 'extraction'} ({self.code})"
+        return (f"Round {self.round} (it={self.it}): {outcome}; "
+                f"tokens {self.prompt_tokens}+{self.completion_tokens} ({self.reused_tokens} reused, "
+                f"prompt ~{self.context_tokens}, ~{self.compacted_tokens} compacted away); "
+                f"simulations {self.simulations} run, {self.simulations_skipped} skipped; "
+                f"{self.seconds:.2f} s (~{self.seconds_saved:.2f} s saved)\n")
+
+
+def summary_line(rounds: List[RoundStats]) -> str:
+    """Totals of one iteration's rounds."""
+    if not rounds:
+        return ""
+    outcome = "passed" if rounds[-1].passed else "not repaired"
+    return (f"Repair summary (it={rounds[0].it}): {outcome} after {len(rounds)} round(s); "
+            f"tokens {sum(r.prompt_tokens + r.completion_tokens for r in rounds)} spent, "
+            f"{sum(r.reused_tokens for r in rounds)} reused, ~{sum(r.compacted_tokens for r in rounds)} compacted away; "
+            f"simulations {sum(r.simulations for r in rounds)} run, "
+            f"{sum(r.simulations_skipped for r in rounds)} skipped; "
+            f"{sum(r.seconds for r in rounds):.2f} s (~{sum(r.seconds_saved for r in rounds):.2f} s saved)\n")
+
+
+def feedback(check: Optional[CheckResult]) -> str:
+    """The user turn that asks for a repair of a failed round."""
+    if check is None:
+        return NO_CODE_MESSAGE
+    return check.message.strip() or f"The design failed the {check.code} check. Please rewrite the corrected complete code."
+
+
+def _without_code(answer: str, rnd: int) -> str:
+    """An earlier answer with its code blocks replaced by a placeholder."""
+    return CODE_BLOCK.sub(f"```python\n# code of round {rnd} omitted; the latest revision follows\n```", answer)
+
+
+def _raw_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+class RepairContext:
+    """The conversation of one iteration: its prompt plus the rounds tried so far."""
+
+    def __init__(self, messages: List[Dict[str, str]], message_budget: int = MESSAGE_TOKEN_BUDGET,
+                 context_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.base = list(messages)
+        self.message_budget = message_budget
+        self.context_budget = context_budget
+        self.rounds: List[Tuple[str, str]] = []  # (answer, feedback) of every failed round
+        self._raw = _raw_tokens(self.base)
+
+    def add_round(self, answer: str, check: Optional[CheckResult]) -> None:
+        """Record a failed round; the next messages() asks for its repair."""
+        text = feedback(check)
+        self._raw += estimate_tokens(answer) + estimate_tokens(text)
+        self.rounds.append((answer, compact_log(text)))
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Compacted conversation for the next request."""
+        last = len(self.rounds) - 1
+        pairs: List[List[Dict[str, str]]] = []
+        for i, (answer, text) in enumerate(self.rounds):
+            if i < last:
+                answer = fit_tokens(_without_code(answer, i), self.message_budget)
+                if any(text == later for _, later in self.rounds[i + 1:]):
+                    text = SAME_FEEDBACK
+            pairs.append([{"role": "assistant", "content": answer},
+                          {"role": "user", "content": fit_tokens(text, self.message_budget)}])
+        # Oldest rounds go first once the prompt is over budget; the latest one always stays.
+        size = _raw_tokens(self.base) + sum(_raw_tokens(pair) for pair in pairs)
+        while len(pairs) > 1 and size > self.context_budget:
+            size -= _raw_tokens(pairs.pop(0))
+        return self.base + [m for pair in pairs for m in pair]
+
+    def token_counts(self) -> List[int]:
+        """Estimated tokens of each message of messages()."""
+        return [estimate_tokens(m["content"]) for m in self.messages()]
+
+    def fill(self, stats: RoundStats) -> None:
+        """Record the prompt size of the round and what compaction saved."""
+        stats.context_tokens = sum(self.token_counts())
+        stats.compacted_tokens = max(0, self._raw - stats.context_tokens)
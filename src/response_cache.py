@@ -0,0 +1,97 @@
+"""
+Content-addressed on-disk cache for LLM completions.
+
+Entries are keyed by (model, temperature, messages hash, sample index): the
+same prompt asked again for the same iteration returns the stored answer
+instead of paying for a new request. Each entry is a small JSON file under
+the cache root; the total size is bounded and the least recently used
+entries (by file mtime, refreshed on every hit) are evicted first.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def messages_hash(messages: List[Dict[str, str]]) -> str:
+    """Stable hash of a chat message list."""
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(model: str, temperature: float, msg_hash: str, index: int) -> str:
+    """Content address of one sampled completion."""
+    raw = f"{model}\0{temperature!r}\0{msg_hash}\0{index}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of completion texts, safe to share between threads."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._size = sum(p.stat().st_size for p in self.root.glob("*/*.json"))
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, model: str, temperature: float, msg_hash: str, index: int) -> Optional[dict]:
+        """Return the cached entry ({'text', 'prompt_tokens', 'completion_tokens'}) or None."""
+        path = self._path(cache_key(model, temperature, msg_hash, index))
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, model: str, temperature: float, msg_hash: str, index: int, text: str,
+            prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """Store one completion and evict old entries if the cache grew past max_bytes."""
+        path = self._path(cache_key(model, temperature, msg_hash, index))
+        payload = json.dumps({"model": model, "temperature": temperature, "index": index, "text": text,
+                              "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+                             ensure_ascii=False).encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += len(payload) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is at 90% of max_bytes."""
+        entries: List[Tuple[float, int, Path]] = []
+        for p in self.root.glob("*/*.json"):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+
+
+_CACHES: Dict[Path, ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(root: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> ResponseCache:
+    """Return the process-wide cache for a directory."""
+    root = Path(root).resolve()
+    with _CACHES_LOCK:
+        if root not in _CACHES:
+            _CACHES[root] = ResponseCache(root, max_bytes)
+        return _CACHES[root]
@@ -1,88 +1,230 @@
 """
-Lightweight retrieval helper for complex tasks.
+Subcircuit retrieval for complex tasks.
 
-Selects related subcircuit IDs from data_files/problem_set.tsv based on type
-(and optionally circuit name), returning up to top-k IDs.
+Ranks the entries of the subcircuit library (data_files/lib_info.tsv) against
+the task description with a TF-IDF index, returning the top-k library IDs:
+
+- One document per library entry: circuit description, type, submodule name,
+  I/O signature, input phase and a coarse gain label.
+- The index (term counts, vocabulary and per-document content hashes) is kept
+  in data_files/retrieval_index.npz. Updates are incremental: only new or
+  changed entries are tokenized; the weights are recomputed from the stored
+  counts, which is a handful of vectorized operations.
+- Queries touch only the columns of the query's terms, so top-k stays well
+  under a millisecond for thousands of library entries.
 """
+import hashlib
+import math
+import re
+import threading
 from pathlib import Path
-from typing import List
-import pandas as pd
+from typing import Dict, List, Optional, Tuple
 
-def get_retrieval(config, task: str, task_id: int) -> List[int]:
-    """
-    Return related subcircuit IDs for complex tasks, based on problem_set.tsv.
+import numpy as np
+from scipy import sparse
 
-    Strategy:
-    - Load ../data_files/problem_set.tsv relative to this file.
-    - Find the row for `task_id` to get its Type (and Circuit if present).
-    - Return up to K IDs of the same Type, prioritizing exact Circuit matches if available.
-    - Gracefully fall back to [task_id] if the file/columns/rows are missing.
+from src.metadata import DATA_DIR, LibRow, TaskRow, get_store
 
-    K is taken from config.top_k (or config.k) if present, else defaults to 5.
-    """
-    # Determine how many related IDs to return
-    k = int(getattr(config, "top_k", getattr(config, "k", 5)))
+INDEX_PATH = DATA_DIR / "retrieval_index.npz"
 
-    # Resolve data file path relative to this source file
-    base_dir = Path(__file__).resolve().parent
-    problem_set_path = (base_dir.parent / "data_files" / "problem_set.tsv")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_STOPWORDS = frozenset("a an and are as at be by for from in is it its of on or the to with".split())
 
-    try:
-        df = pd.read_csv(problem_set_path, delimiter="\t")
-    except Exception:
-        # If we cannot read the table, at least return the current task for downstream logic
-        try:
-            return [int(task_id)]
-        except Exception:
-            return []
+# Complex tasks are built around op-amps, which their descriptions rarely spell out.
+QUERY_HINTS = {
+    "Oscillator": "opamp high gain",
+    "Integrator": "opamp",
+    "Differentiator": "opamp",
+    "Adder": "opamp",
+    "Subtractor": "opamp differential",
+    "Schmitt": "opamp high gain",
+}
 
-    # Ensure required columns are present
-    if "Id" not in df.columns or "Type" not in df.columns:
-        try:
-            return [int(task_id)]
-        except Exception:
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase unigrams and bigrams (CamelCase names are split into words)."""
+    words = [w for w in _TOKEN_RE.findall(_CAMEL_RE.sub(" ", text).lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def library_document(task: TaskRow, lib: LibRow) -> str:
+    """Text indexed for one library entry."""
+    inputs = [n for n in task.input_nodes if "bias" not in n.lower()]
+    outputs = task.output_nodes
+    parts = [
+        task.circuit,
+        task.type,
+        task.submodule_name,
+        "differential input" if len(inputs) > 1 else "single input",
+        "two outputs" if len(outputs) > 1 else "single output",
+        lib.vin_phase.replace("-", ""),
+    ]
+    if lib.av_db is not None:
+        parts.append("high gain" if lib.av_db >= 40 else "gain")
+    return " ".join(parts)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RetrievalIndex:
+    """TF-IDF index over library documents keyed by library Id."""
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hashes: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._weights = sparse.csc_matrix((0, 0), dtype=np.float32)
+
+    def update(self, documents: Dict[int, str]) -> bool:
+        """Make the index match `documents`; return True if anything changed."""
+        old_rows = {int(i): (row, h) for row, (i, h) in enumerate(zip(self.ids, self.hashes))}
+        ids = list(documents)
+        hashes = [_hash(documents[i]) for i in ids]
+        if ids == list(self.ids) and hashes == self.hashes:
+            return False
+
+        kept_rows, new_rows = [], []
+        for pos, (doc_id, doc_hash) in enumerate(zip(ids, hashes)):
+            old = old_rows.get(doc_id)
+            if old is not None and old[1] == doc_hash:
+                kept_rows.append((pos, old[0]))
+            else:
+                new_rows.append(pos)
+
+        # Only new or changed documents are tokenized.
+        new_counts: List[Dict[int, int]] = []
+        for pos in new_rows:
+            counts: Dict[int, int] = {}
+            for token in tokenize(documents[ids[pos]]):
+                col = self.vocab.setdefault(token, len(self.vocab))
+                counts[col] = counts.get(col, 0) + 1
+            new_counts.append(counts)
+
+        width = len(self.vocab)
+        old = self.counts.tocsr()
+        old.resize((old.shape[0], width))
+        kept = old[[old_row for _, old_row in kept_rows]]
+        coo_rows, coo_cols, coo_vals = [], [], []
+        for row, counts in enumerate(new_counts):
+            coo_rows.extend([row] * len(counts))
+            coo_cols.extend(counts.keys())
+            coo_vals.extend(counts.values())
+        fresh = sparse.csr_matrix((np.asarray(coo_vals, dtype=np.float32), (coo_rows, coo_cols)),
+                                  shape=(len(new_counts), width))
+        # kept rows then fresh rows, permuted back into document order
+        order = np.argsort(np.array([pos for pos, _ in kept_rows] + new_rows, dtype=np.int64))
+        self.counts = sparse.vstack([kept, fresh], format="csr", dtype=np.float32)[order]
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.hashes = hashes
+        self._reweight()
+        return True
+
+    def _reweight(self) -> None:
+        n_docs = self.counts.shape[0]
+        df = np.asarray((self.counts > 0).sum(axis=0)).ravel()
+        self._idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        weights = self.counts.copy()
+        weights.data = 1.0 + np.log(weights.data)
+        weights = weights.multiply(self._idf[np.newaxis, :]).tocsr()
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self._weights = sparse.diags(1.0 / norms).dot(weights).tocsc().astype(np.float32)
+
+    def query(self, text: str, k: int) -> List[int]:
+        """Library Ids most similar to `text`, best first (only non-zero matches)."""
+        counts: Dict[int, int] = {}
+        for token in tokenize(text):
+            col = self.vocab.get(token)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        if not counts or not len(self.ids):
             return []
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        q = np.array([(1.0 + math.log(c)) for c in counts.values()], dtype=np.float32) * self._idf[cols]
+        scores = np.asarray(self._weights[:, cols].dot(q)).ravel()
+        k = min(k, len(scores)) if k > 0 else len(scores)
+        top = np.argpartition(-scores, k - 1)[:k]
+        # best score first; ties keep library order
+        top = top[np.lexsort((top, -scores[top]))]
+        return [int(self.ids[i]) for i in top if scores[i] > 0]
 
-    # Locate the current task row
-    try:
-        row = df.loc[df["Id"] == task_id].iloc[0]
-    except Exception:
-        # If the task is not found, return the ID itself
+    def save(self, path: Path) -> None:
+        counts = self.counts.tocsr()
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez(path, ids=self.ids, hashes=np.array(self.hashes, dtype=str),
+                 terms=np.array(terms, dtype=str), data=counts.data, indices=counts.indices,
+                 indptr=counts.indptr, shape=np.array(counts.shape))
+
+    @classmethod
+    def load(cls, path: Path) -> "RetrievalIndex":
+        index = cls()
+        with np.load(path, allow_pickle=False) as f:
+            index.ids = f["ids"].astype(np.int64)
+            index.hashes = [str(h) for h in f["hashes"]]
+            index.vocab = {str(t): i for i, t in enumerate(f["terms"])}
+            index.counts = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]),
+                                             shape=tuple(f["shape"]), dtype=np.float32)
+        index._reweight()
+        return index
+
+
+def library_documents() -> Dict[int, str]:
+    """Index documents for every library entry that has a problem-set row."""
+    store = get_store()
+    documents: Dict[int, str] = {}
+    for lib in store.library():
         try:
-            return [int(task_id)]
-        except Exception:
-            return []
+            documents[lib.id] = library_document(store.task(lib.id), lib)
+        except KeyError:
+            continue
+    return documents
+
+
+_INDEX: Optional[RetrievalIndex] = None
+_INDEX_VERSION: Optional[Tuple] = None
+_INDEX_LOCK = threading.Lock()
 
-    task_type = str(row.get("Type", "")).strip()
-    task_circuit = str(row.get("Circuit", "")).strip() if "Circuit" in df.columns else ""
-
-    # Collect candidates of the same Type
-    candidates = df.loc[df["Type"].astype(str).str.strip() == task_type].copy()
-
-    # If Circuit column exists, prioritize exact circuit name matches first
-    prioritized_ids: List[int] = []
-    if "Circuit" in candidates.columns and task_circuit:
-        exact = candidates.loc[candidates["Circuit"].astype(str).str.strip() == task_circuit]
-        others = candidates.loc[candidates["Circuit"].astype(str).str.strip() != task_circuit]
-        prioritized_ids.extend(exact["Id"].tolist())
-        prioritized_ids.extend(others["Id"].tolist())
-    else:
-        prioritized_ids.extend(candidates["Id"].tolist())
-
-    # Deduplicate while preserving order; ensure current task_id is included
-    seen = set()
-    ordered: List[int] = []
-    for cid in prioritized_ids:
-        if cid not in seen:
-            seen.add(cid)
-            ordered.append(int(cid))
-
-    if task_id not in seen:
-        ordered.insert(0, int(task_id))
-
-    # Limit to top-k
-    if k > 0:
-        ordered = ordered[:k]
-
-    # Final fallback to guarantee a non-empty list
-    return ordered or [int(task_id)]
\ No newline at end of file
+
+def update_retrieval_index(path: Path = INDEX_PATH) -> RetrievalIndex:
+    """Bring the on-disk index up to date with the library (incremental) and return it."""
+    global _INDEX, _INDEX_VERSION
+    with _INDEX_LOCK:
+        version = get_store().versions()
+        if _INDEX is not None and version == _INDEX_VERSION:
+            return _INDEX
+        index = _INDEX
+        if index is None:
+            try:
+                index = RetrievalIndex.load(path)
+            except (OSError, KeyError, ValueError):
+                index = RetrievalIndex()
+        if index.update(library_documents()):
+            try:
+                index.save(path)
+            except OSError:
+                pass  # read-only checkout: keep the in-memory index
+        _INDEX, _INDEX_VERSION = index, version
+        return index
+
+
+def get_retrieval(config, task: str, task_id: int) -> List[int]:
+    """
+    Return up to K library subcircuit IDs relevant to a complex task.
+
+    The query is the task description plus its Type and a per-type hint
+    (QUERY_HINTS). K is taken from config.top_k (or config.k) if present,
+    else defaults to 5.
+    """
+    k = int(getattr(config, "top_k", getattr(config, "k", 5)))
+    query = task
+    try:
+        row = get_store().task(task_id)
+        query = f"{task} {row.type} {QUERY_HINTS.get(row.type, '')}"
+    except (KeyError, ValueError, TypeError):
+        pass
+    return update_retrieval_index().query(query, k)
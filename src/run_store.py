@@ -0,0 +1,305 @@
+"""
+Indexed store of every generation round and its outcome.
+
+One SQLite database (outputs/runs.sqlite by default) replaces grepping the
+timestamped *_log.txt files and the outputs/ trees:
+
+- runs: one row per repair round of every iteration — model, ablation
+  variant, task, iteration, round, prompt hash, the check outcome (passed,
+  deciding stage, error class = the check code, metrics as JSON), tokens,
+  dollar cost, LLM latency, wall time, per-stage checker seconds and the
+  simulations run / skipped.
+- texts: answers and extracted code, zlib-compressed and stored once per
+  content hash, so the runs table stays narrow and aggregate scans stay fast.
+- iterations (view): the rounds of one iteration folded into one row.
+
+A replay, or a rerun answered from the response cache, records the same
+(model, variant, task, iteration, round) again under a new run_id. Only the
+first row of each such sample counts (FIRST_SAMPLE): the iterations view,
+pass_rates and the leaderboard skip the repeats.
+
+Writers buffer records and insert them in batches (one transaction per
+FLUSH_ROWS records, at the end of every worker iteration or request batch,
+and on exit); the database runs in WAL mode with a busy
+timeout, so concurrent worker and sweep processes can write while others
+read. Every process gets its own run_id.
+
+Usage:
+- python -m src.run_store                    # pass rate per model / variant / task
+- python -m src.run_store --model gpt-4o --task_id 9 --variant skill+retry2
+- python -m src.run_store --group_by model,stage,error   # repair rounds per failing stage
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+FLUSH_ROWS = 256
+BUSY_TIMEOUT_SECONDS = 60
+GROUP_COLUMNS = ("model", "variant", "task_id", "task_type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    model TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    task_type TEXT NOT NULL,
+    it INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    prompt_hash TEXT,
+    answer_hash TEXT,
+    code_hash TEXT,
+    passed INTEGER NOT NULL,
+    stage TEXT,
+    error TEXT,
+    metrics TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    reused_tokens INTEGER,
+    context_tokens INTEGER,
+    cost REAL,
+    llm_seconds REAL,
+    seconds REAL,
+    stage_seconds TEXT,
+    simulations INTEGER,
+    simulations_skipped INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_cell ON runs (model, variant, task_id, passed);
+CREATE INDEX IF NOT EXISTS runs_iteration ON runs (run_id, model, variant, task_id, it);
+CREATE INDEX IF NOT EXISTS runs_sample ON runs (model, variant, task_id, it, round, id);
+CREATE TABLE IF NOT EXISTS texts (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL
+);
+DROP VIEW IF EXISTS iterations;
+CREATE VIEW iterations AS
+    SELECT MIN(run_id) AS run_id, model, variant, task_id, task_type, it,
+           MAX(passed) AS passed, COUNT(*) AS rounds, MIN(recorded) AS recorded,
+           SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+           SUM(reused_tokens) AS reused_tokens, SUM(cost) AS cost,
+           SUM(llm_seconds) AS llm_seconds, SUM(seconds) AS seconds,
+           SUM(simulations) AS simulations, MAX(id) AS last_id
+    FROM runs r WHERE {first_sample} GROUP BY model, variant, task_id, it;
+"""
+
+# Condition on a runs row `r`: no earlier row recorded the same sample (replays and cached reruns repeat it).
+FIRST_SAMPLE = ("NOT EXISTS (SELECT 1 FROM runs p WHERE p.model = r.model AND p.variant = r.variant "
+                "AND p.task_id = r.task_id AND p.it = r.it AND p.round = r.round AND p.id < r.id)")
+SCHEMA = SCHEMA.replace("{first_sample}", FIRST_SAMPLE)
+
+RUN_COLUMNS = ("run_id", "recorded", "model", "variant", "task_id", "task_type", "it", "round", "prompt_hash",
+               "answer_hash", "code_hash", "passed", "stage", "error", "metrics", "prompt_tokens",
+               "completion_tokens", "reused_tokens", "context_tokens", "cost", "llm_seconds", "seconds",
+               "stage_seconds", "simulations", "simulations_skipped")
+ITERATION_COLUMNS = ("run_id", "model", "variant", "task_id", "task_type", "it", "passed", "rounds", "recorded",
+                     "prompt_tokens", "completion_tokens", "reused_tokens", "cost", "llm_seconds", "seconds",
+                     "simulations", "last_id")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RunRecord:
+    """One repair round of one iteration, as stored in the runs table."""
+    model: str
+    variant: str
+    task_id: int
+    task_type: str
+    it: int
+    round: int
+    passed: bool = False
+    stage: str = ""
+    error: str = ""  # the check code, e.g. "low_gain" or "no_code"
+    prompt_hash: str = ""
+    answer: str = ""
+    code: str = ""
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reused_tokens: int = 0
+    context_tokens: int = 0
+    cost: float = 0.0
+    llm_seconds: float = 0.0
+    seconds: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    simulations: int = 0
+    simulations_skipped: int = 0
+    recorded: float = field(default_factory=time.time)
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class RunStore:
+    """Buffered writer and query helper for one run database, safe to share between threads."""
+
+    def __init__(self, path: Path, run_id: Optional[str] = None, flush_rows: int = FLUSH_ROWS):
+        self.path = Path(path)
+        self.run_id = run_id or new_run_id()
+        self.flush_rows = flush_rows
+        self._lock = threading.Lock()
+        self._pending: List[RunRecord] = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = connect(self.path)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def add(self, record: RunRecord) -> None:
+        """Queue one record; the queue is written once it holds flush_rows records."""
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.flush_rows:
+                self._flush_locked()
+
+    def add_many(self, records: Sequence[RunRecord]) -> None:
+        with self._lock:
+            self._pending.extend(records)
+            if len(self._pending) >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self) -> int:
+        """Write the queued records in one transaction; returns how many were written."""
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> int:
+        records, self._pending = self._pending, []
+        if not records:
+            return 0
+        texts: Dict[str, bytes] = {}
+        rows = []
+        for r in records:
+            hashes = []
+            for text in (r.answer, r.code):
+                key = text_hash(text) if text else None
+                if key is not None and key not in texts:
+                    texts[key] = zlib.compress(text.encode("utf-8"))
+                hashes.append(key)
+            rows.append((self.run_id, r.recorded, r.model, r.variant, int(r.task_id), r.task_type, int(r.it),
+                         int(r.round), r.prompt_hash or None, hashes[0], hashes[1], int(bool(r.passed)), r.stage,
+                         r.error, json.dumps(r.metrics, default=float) if r.metrics else None, r.prompt_tokens,
+                         r.completion_tokens, r.reused_tokens, r.context_tokens, r.cost, r.llm_seconds, r.seconds,
+                         json.dumps(r.stage_seconds) if r.stage_seconds else None, r.simulations,
+                         r.simulations_skipped))
+        placeholders = ", ".join("?" * len(RUN_COLUMNS))
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO texts (hash, body) VALUES (?, ?)", texts.items())
+            self._conn.executemany(f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def text(self, key: Optional[str]) -> Optional[str]:
+        """An answer or code body by its hash."""
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM texts WHERE hash = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """Run a read query against the store (pending records are written first)."""
+        with self._lock:
+            self._flush_locked()
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def pass_rates(self, group_by: Sequence[str] = GROUP_COLUMNS, **where: Any) -> pd.DataFrame:
+        """Iterations, passes and totals per group, optionally filtered (e.g. model="gpt-4o").
+
+        Repeated samples count once (FIRST_SAMPLE). Groupings and filters on iteration columns count iterations (the
+        iterations view); any per-round column (stage, error, round, ...)
+        counts repair rounds of the runs table instead.
+        """
+        used = list(group_by) + list(where)
+        unknown = [c for c in used if c not in RUN_COLUMNS and c not in ITERATION_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown column(s): {', '.join(unknown)}")
+        columns = ", ".join(group_by)
+        condition = " AND ".join(f"{c} = ?" for c in where) or "1"
+        if all(c in ITERATION_COLUMNS for c in used):
+            sql = (f"SELECT {columns}, COUNT(*) AS iterations, SUM(passed) AS passed, "
+                   f"ROUND(AVG(passed), 4) AS pass_rate, AVG(rounds) AS mean_rounds, "
+                   f"SUM(prompt_tokens + completion_tokens) AS tokens, SUM(cost) AS cost, "
+                   f"AVG(seconds) AS mean_seconds "
+                   f"FROM iterations WHERE {condition} GROUP BY {columns} ORDER BY {columns}")
+        else:
+            not_per_round = [c for c in used if c not in RUN_COLUMNS]
+            if not_per_round:
+                raise ValueError(f"column(s) {', '.join(not_per_round)} cannot be combined with per-round columns")
+            sql = (f"SELECT {columns}, COUNT(*) AS rounds, SUM(passed) AS passed, "
+                   f"ROUND(AVG(passed), 4) AS pass_rate, "
+                   f"SUM(prompt_tokens + completion_tokens) AS tokens, SUM(cost) AS cost, "
+                   f"AVG(seconds) AS mean_seconds "
+                   f"FROM runs r WHERE {FIRST_SAMPLE} AND {condition} GROUP BY {columns} ORDER BY {columns}")
+        return self.query(sql, list(where.values()))
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Connection in WAL mode, shared between threads under the store's lock."""
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+_STORES: Dict[Path, RunStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_run_store(path: Path) -> RunStore:
+    """Return the process-wide store for a database file (flushed at exit)."""
+    path = Path(path).resolve()
+    with _STORES_LOCK:
+        if path not in _STORES:
+            _STORES[path] = store = RunStore(path)
+            atexit.register(store.flush)
+        return _STORES[path]
+
+
+def default_path() -> Path:
+    return Path(__file__).resolve().parent.parent / "outputs" / "runs.sqlite"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pass rates from the run store.")
+    parser.add_argument("--db", type=str, default=None, help="run database (default: outputs/runs.sqlite)")
+    parser.add_argument("--model", type=str, default=None)
+    parser.add_argument("--variant", type=str, default=None)
+    parser.add_argument("--task_id", type=int, default=None)
+    parser.add_argument("--group_by", type=str, default=",".join(GROUP_COLUMNS))
+    args = parser.parse_args()
+    path = Path(args.db) if args.db else default_path()
+    if not path.exists():
+        print(f"No run store at {path}", file=sys.stderr)
+        return 1
+    where = {k: v for k, v in (("model", args.model), ("variant", args.variant), ("task_id", args.task_id))
+             if v is not None}
+    store = RunStore(path)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(store.pass_rates([c.strip() for c in args.group_by.split(",") if c.strip()], **where))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Batched multi-candidate simulation.
+
+When several candidate designs for one task are checked together, each one
+used to get its own checker script, netlist load and set of ngspice runs.
+This module evaluates them as one job instead:
+
+- Every candidate's netlist is wrapped in its own subcircuit (cand0, cand1,
+  ...) and instantiated once (xcand0, xcand1, ...), so ngspice namespaces
+  all nodes, devices, models and nested subcircuits per candidate.
+- The merged netlist is loaded once and each analysis the task needs runs
+  once for all candidates; result vectors are split back per candidate by
+  their `xcand<i>.` prefix.
+- Candidates are given as their netlist-building code only (the part before
+  the design's own circuit.simulator() call), so loading them runs no
+  analysis.
+- The batchable task types take the same measurements as the
+  single-candidate test benches and are judged by the same src.verdicts
+  functions, so both give the same verdicts, codes, metrics and messages.
+
+Candidates the batch cannot judge (their code does not build a circuit,
+a vector is missing, ...) are reported as None so the caller can check
+them one by one with the regular test bench.
+"""
+import contextlib
+import io
+import json
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.check_result import CHECK_RESULT_MARKER, CheckResult
+from src.verdicts import amplifier_verdict, drain_current_verdict, inverter_verdict, opamp_verdict
+from src.waveform import gain_at
+
+BATCHABLE_TYPES = ("Amplifier", "Opamp", "Inverter")
+_GLOBAL_CARDS = (".include", ".lib", ".global", ".options", ".temp")
+# node 'xcand0.vout', branch 'v.xcand0.vin#branch', internal '@m.xcand0.m1[id]'
+_VECTOR_NAME = re.compile(r"^(@?)(?:[a-z]+\.)?xcand(\d+)\.(.+)$")
+# Scale vectors shared by every candidate of a plot.
+_SCALE_VECTORS = ("frequency", "time")
+
+Vectors = Dict[str, np.ndarray]
+
+
+# -----------------------------
+# Netlist merging and result splitting
+# -----------------------------
+def merge_netlists(netlists: Sequence[str], saves: Sequence[str] = ()) -> str:
+    """Merge candidate netlists into one, each wrapped in its own subcircuit instance."""
+    header = [".title batch"]
+    body: List[str] = []
+    for i, netlist in enumerate(netlists):
+        body.append(f".subckt cand{i} batch_ref")
+        for line in netlist.splitlines():
+            card = line.strip().lower()
+            if not card or card.startswith(".title") or card == ".end":
+                continue
+            if card.startswith(_GLOBAL_CARDS):
+                if line.strip() not in header:
+                    header.append(line.strip())
+                continue
+            body.append(line)
+        body.append(f".ends cand{i}")
+        body.append(f"xcand{i} 0 cand{i}")
+    if saves:
+        body.append(".save all " + " ".join(saves))
+    return "\n".join(header + body + [".end"]) + "\n"
+
+
+def candidate_internal(index: int, device: str, parameter: str) -> str:
+    """Name of a device's internal vector inside candidate `index`, e.g. '@m.xcand0.m1[id]'."""
+    device = device.lower()
+    return f"@{device[0]}.xcand{index}.{device}[{parameter}]"
+
+
+def split_vectors(plot, count: int) -> List[Vectors]:
+    """Split a plot of the merged circuit into per-candidate {local name: array} dicts.
+
+    The scale vectors (frequency, time) are copied to every candidate.
+    """
+    per_candidate: List[Vectors] = [{} for _ in range(count)]
+    for name, vector in plot.items():
+        match = _VECTOR_NAME.match(name.lower())
+        if match is None:
+            if name.lower() in _SCALE_VECTORS:
+                scale = np.real(np.array(vector.to_waveform()))
+                for vectors in per_candidate:
+                    vectors[name.lower()] = scale
+            continue
+        index = int(match.group(2))
+        if index < count:
+            per_candidate[index][match.group(1) + match.group(3)] = np.array(vector.to_waveform())
+    return per_candidate
+
+
+def simulate_batch(netlists: Sequence[str], commands: Sequence[str],
+                   saves: Sequence[str] = ()) -> List[List[Vectors]]:
+    """Load the merged netlist once and run each analysis command against it.
+
+    Returns results[command][candidate]. Raises if ngspice rejects the
+    netlist or an analysis fails.
+    """
+    from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+    ngspice = NgSpiceShared.new_instance()
+    ngspice.destroy()
+    ngspice.load_circuit(merge_netlists(netlists, saves))
+    results = []
+    for command in commands:
+        ngspice.destroy()
+        ngspice.exec_command(command)
+        plot_name = ngspice.last_plot
+        if plot_name == "const":
+            raise NameError("Simulation failed")
+        results.append(split_vectors(ngspice.plot(None, plot_name), len(netlists)))
+    return results
+
+
+# -----------------------------
+# Candidate loading
+# -----------------------------
+def load_circuit(code: str, filename: str):
+    """Execute a design's netlist code and return (circuit, captured stdout); circuit is None on failure."""
+    stdout = io.StringIO()
+    namespace = {"__name__": "__candidate__", "__file__": filename}
+    try:
+        with contextlib.redirect_stdout(stdout):
+            exec(compile(code, filename, "exec"), namespace)
+    except BaseException:
+        return None, stdout.getvalue()
+    return namespace.get("circuit"), stdout.getvalue()
+
+
+def _find_source(circuit, node: str) -> str:
+    """Name of the voltage source attached to `node` (last match, as the test benches pick it)."""
+    name = ""
+    for element in circuit.elements:
+        if node in [str(pin.node).lower() for pin in element.pins] and element.name.lower().startswith("v"):
+            name = element.name
+    return name
+
+
+def _mosfet_names(circuit) -> List[str]:
+    import PySpice.Spice.BasicElement
+    return [e.name for e in circuit.elements if isinstance(e, PySpice.Spice.BasicElement.Mosfet)]
+
+
+def _first_values(runs: List[Vectors], name: str) -> np.ndarray:
+    """First sample of vector `name` for every candidate, NaN where the vector is missing."""
+    name = name.lower()
+    return np.array([v[name][0] if name in v else np.nan for v in runs])
+
+
+@contextlib.contextmanager
+def _source_values(circuits: list, names: List[str], values: List[str]):
+    """Temporarily set the dc_value of one source per circuit."""
+    saved = [circuit.element(name).dc_value for circuit, name in zip(circuits, names)]
+    try:
+        for circuit, name, value in zip(circuits, names, values):
+            circuit.element(name).dc_value = value
+        yield
+    finally:
+        for circuit, name, value in zip(circuits, names, saved):
+            circuit.element(name).dc_value = value
+
+
+# -----------------------------
+# Batched checkers (measurements of test_bench/*.py, verdicts from src.verdicts)
+# -----------------------------
+def _drain_currents(op: List[Vectors], mosfets: List[List[str]]) -> List[Optional[List[float]]]:
+    """Per candidate: the drain current of each MOSFET (None if a vector is missing)."""
+    currents: List[Optional[List[float]]] = []
+    for vectors, names in zip(op, mosfets):
+        ids = [float(np.real(vectors.get(f"@{n.lower()}[id]", [np.nan])[0])) for n in names]
+        currents.append(None if np.isnan(ids).any() else ids)
+    return currents
+
+
+def _supply_power(circuits: list, op: List[Vectors]) -> List[Optional[float]]:
+    """Per candidate: DC power delivered by its voltage sources (supply_power in the prelude)."""
+    powers: List[Optional[float]] = []
+    for circuit, vectors in zip(circuits, op):
+        power = 0.0
+        for element in circuit.elements:
+            branch = f"{element.name.lower()}#branch"
+            if not element.name.lower().startswith("v") or branch not in vectors:
+                continue
+            try:
+                power -= float(element.dc_value) * float(np.real(vectors[branch][0]))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        powers.append(power)
+    return powers
+
+
+def _mosfet_saves(circuits: list):
+    mosfets = [_mosfet_names(c) for c in circuits]
+    saves = [candidate_internal(i, m, "id") for i, names in enumerate(mosfets) for m in names]
+    return mosfets, saves
+
+
+def _gain_at_100hz(vectors: Vectors) -> float:
+    """The test benches' gain: |vout| at 100 Hz over the 1 uV AC drive (NaN if vout is missing)."""
+    if "vout" not in vectors or "frequency" not in vectors:
+        return float("nan")
+    return gain_at(vectors["frequency"], vectors["vout"], 100, input_amplitude=1e-6)
+
+
+def check_amplifiers(circuits: list) -> List[Optional[CheckResult]]:
+    mosfets, saves = _mosfet_saves(circuits)
+    op, ac = simulate_batch([str(c) for c in circuits], ["op", "ac dec 2 100 1000"], saves)
+    currents = _drain_currents(op, mosfets)
+    power = _supply_power(circuits, op)
+    phase = np.angle(_first_values(ac, "vout"), deg=True)
+
+    results: List[Optional[CheckResult]] = []
+    for i in range(len(circuits)):
+        gain = _gain_at_100hz(ac[i])
+        if currents[i] is None or np.isnan(gain):
+            results.append(None)
+            continue
+        results.append(drain_current_verdict(mosfets[i], currents[i])
+                       or amplifier_verdict(gain, phase[i], power=power[i]))
+    return results
+
+
+def check_opamps(circuits: list) -> List[Optional[CheckResult]]:
+    vinn_names = [_find_source(c, "vinn") for c in circuits]
+    if not all(vinn_names):
+        raise KeyError("vinn source not found")
+    mosfets, saves = _mosfet_saves(circuits)
+    op, ac = simulate_batch([str(c) for c in circuits], ["op", "ac dec 2 100 1000"], saves)
+    # Differential mode: vinn in anti-phase, as the test bench does.
+    with _source_values(circuits, vinn_names,
+                        [c.element(n).dc_value + " 180" for c, n in zip(circuits, vinn_names)]):
+        (ac2,) = simulate_batch([str(c) for c in circuits], ["ac dec 1 100 100"])
+    currents = _drain_currents(op, mosfets)
+    power = _supply_power(circuits, op)
+    phase = np.angle(np.abs(_first_values(ac2, "vout")), deg=True)
+
+    results: List[Optional[CheckResult]] = []
+    for i in range(len(circuits)):
+        gain, gain2 = _gain_at_100hz(ac[i]), _gain_at_100hz(ac2[i])
+        if currents[i] is None or np.isnan(gain) or np.isnan(gain2):
+            results.append(None)
+            continue
+        results.append(drain_current_verdict(mosfets[i], currents[i])
+                       or opamp_verdict(gain, gain2, phase[i], power=power[i]))
+    return results
+
+
+def check_inverters(circuits: list) -> List[Optional[CheckResult]]:
+    vin_names = [_find_source(c, "vin") for c in circuits]
+    if not all(vin_names):
+        raise KeyError("vin source not found")
+    (op,) = simulate_batch([str(c) for c in circuits], ["op"])
+    runs = []
+    for value in ("5", "0"):
+        with _source_values(circuits, vin_names, [value] * len(circuits)):
+            runs.append(simulate_batch([str(c) for c in circuits], ["op"])[0])
+    vout2 = np.real(_first_values(runs[0], "vout"))
+    vout3 = np.real(_first_values(runs[1], "vout"))
+
+    results: List[Optional[CheckResult]] = []
+    for i in range(len(circuits)):
+        if np.isnan(vout2[i]) or np.isnan(vout3[i]):
+            results.append(None)
+            continue
+        # The test bench prints the operating point before its verdict.
+        nodes = "".join(f"{name}\t{float(np.real(values[0])):.6f}\n"
+                        for name, values in op[i].items() if not name.startswith("@") and "#" not in name)
+        verdict = inverter_verdict(vout2[i], vout3[i])
+        verdict.message = nodes + verdict.message
+        results.append(verdict)
+    return results
+
+
+BATCH_CHECKERS: Dict[str, Callable[[list], List[Optional[CheckResult]]]] = {
+    "Amplifier": check_amplifiers,
+    "Opamp": check_opamps,
+    "Inverter": check_inverters,
+}
+
+
+def judge_candidates(task_type: str, circuits: list) -> List[Optional[CheckResult]]:
+    """Check circuits together; if the merged simulation fails, split the batch and retry.
+
+    A single candidate that still fails is left as None (checked alone later).
+    """
+    try:
+        return BATCH_CHECKERS[task_type](circuits)
+    except Exception:
+        if len(circuits) == 1:
+            return [None]
+        half = len(circuits) // 2
+        return judge_candidates(task_type, circuits[:half]) + judge_candidates(task_type, circuits[half:])
+
+
+def run_batch_job(task_type: str, codes: Sequence[str], filenames: Sequence[str]) -> None:
+    """Entry point of a batch check script: print one result record per candidate judged.
+
+    Candidates whose code fails to build a circuit, or that the batch cannot
+    judge, get no record and are re-checked one by one by the caller.
+    """
+    loaded = [load_circuit(code, filename) for code, filename in zip(codes, filenames)]
+    indices = [i for i, (circuit, _) in enumerate(loaded) if circuit is not None]
+    if not indices:
+        return
+    results = judge_candidates(task_type, [loaded[i][0] for i in indices])
+    for index, result in zip(indices, results):
+        if result is None:
+            continue
+        record = {"candidate": index, "passed": result.passed, "code": result.code,
+                  "metrics": result.metrics, "message": loaded[index][1] + result.message}
+        print(CHECK_RESULT_MARKER + " " + json.dumps(record), flush=True)
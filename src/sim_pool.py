@@ -0,0 +1,291 @@
+"""
+Persistent simulation worker pool.
+
+Generated design scripts (and the design + checker scripts built by
+check_function) used to run in a fresh `python -u` interpreter each, paying
+for interpreter start-up, numpy/scipy/PySpice imports and ngspice
+initialisation on every check. This module keeps a few long-lived worker
+processes with those modules already imported and executes each script in a
+clean namespace inside one of them.
+
+- Per-job timeouts: a worker that does not answer in time is killed and
+  replaced.
+- Memory limits: each worker runs under RLIMIT_AS (Linux/macOS).
+- Crash isolation: a worker that dies (e.g. ngspice segfault) is replaced and
+  the job reports a negative return code, as subprocess would.
+
+Scripts can import the project's src package (checkers use src.sim_session).
+
+run_python() is a drop-in for
+`subprocess.run(["python", "-u", path], check=True, text=True, ...)`: it
+returns a CompletedProcess or raises CalledProcessError / TimeoutExpired, so
+callers keep their existing stdout/stderr handling. With 0 workers it falls
+back to exactly that subprocess call.
+"""
+import atexit
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import runpy
+import subprocess
+import sys
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Imported once per worker. PySpice's ngspice modules must stay loaded so the
+# shared ngspice instance survives from one job to the next.
+_PRELOAD = (
+    "numpy",
+    "scipy.signal",
+    "scipy.stats",
+    "PySpice.Unit",
+    "PySpice.Spice.Netlist",
+    "PySpice.Spice.BasicElement",
+    "PySpice.Spice.NgSpice.Shared",
+    "PySpice.Spice.NgSpice.Simulation",
+    "src.sim_session",
+)
+# Checkers import helpers from src/ (e.g. src.sim_session), so scripts always
+# run with the project root importable.
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_PREFIXES = tuple({os.path.realpath(p) for p in (sys.prefix, sys.base_prefix, sys.exec_prefix)})
+
+
+@dataclass
+class SimResult:
+    """Outcome of running one script in the pool."""
+    returncode: int
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    crashed: bool = False
+
+
+# -----------------------------
+# Worker process side
+# -----------------------------
+def _preload() -> None:
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    for name in _PRELOAD:
+        try:
+            __import__(name)
+        except Exception:
+            # Missing optional modules only matter to scripts that use them.
+            pass
+    try:
+        from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+        NgSpiceShared.new_instance()
+    except Exception:
+        pass
+
+
+def _is_user_module(module) -> bool:
+    path = getattr(module, "__file__", None)
+    return bool(path) and not os.path.realpath(path).startswith(_LIBRARY_PREFIXES)
+
+
+def _reset_state(baseline_modules: set) -> None:
+    """Undo per-job state so the next script starts from a clean interpreter."""
+    # Drop modules imported from the job's directory (e.g. p1_lib) so a later
+    # job with a same-named module gets its own copy; library imports stay warm.
+    for name in [n for n in sys.modules if n not in baseline_modules]:
+        if _is_user_module(sys.modules[name]):
+            del sys.modules[name]
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close("all")
+    try:
+        from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+        for ngspice in NgSpiceShared._instances.values():
+            ngspice.remove_circuit()
+            ngspice.destroy()
+    except Exception:
+        pass
+
+
+def _exec_script(path: str, cwd: str, baseline_modules: set) -> Tuple[int, str, str]:
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_path, saved_argv = list(sys.path), list(sys.argv)
+    returncode = 0
+    try:
+        os.chdir(cwd)
+        # Mirror `python -u path`: the script's directory comes first on sys.path.
+        sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+        sys.argv = [path]
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                runpy.run_path(path, run_name="__main__")
+            except SystemExit as e:
+                if e.code is None:
+                    returncode = 0
+                elif isinstance(e.code, int):
+                    returncode = e.code
+                else:
+                    print(e.code, file=sys.stderr)
+                    returncode = 1
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+    finally:
+        sys.path[:], sys.argv[:] = saved_path, saved_argv
+        _reset_state(baseline_modules)
+    return returncode, stdout.getvalue(), stderr.getvalue()
+
+
+def _worker_main(conn, memory_limit_mb: int) -> None:
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    if _PROJECT_ROOT not in sys.path:
+        sys.path.append(_PROJECT_ROOT)
+    _preload()
+    baseline_modules = set(sys.modules)
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        conn.send(_exec_script(*job, baseline_modules))
+
+
+# -----------------------------
+# Parent side
+# -----------------------------
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.ready = False
+
+    def wait_ready(self, timeout: float = 300.0) -> bool:
+        """Block until the worker finished its imports, so job timeouts exclude start-up."""
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = self.conn.recv() == "ready"
+        return self.ready
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SimulationPool:
+    """Fixed-size pool of warm simulation workers, safe to share between threads."""
+
+    def __init__(self, workers: int, memory_limit_mb: int = 4096, timeout: Optional[float] = 600.0,
+                 max_jobs_per_worker: int = 200):
+        self.memory_limit_mb = memory_limit_mb
+        self.timeout = timeout
+        # Recycle workers periodically so leaks in ngspice cannot accumulate.
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = workers
+        for _ in range(workers):
+            self._idle.put(_Worker(self._ctx, memory_limit_mb))
+
+    def run(self, path: str, timeout: Optional[float] = None) -> SimResult:
+        """Execute a Python script in a warm worker and return its outcome."""
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        replace = False
+        try:
+            if not worker.wait_ready():
+                replace = True
+                return SimResult(-1, "", "Simulation worker failed to start.", crashed=True)
+            worker.conn.send((os.path.abspath(path), os.getcwd()))
+            worker.jobs += 1
+            if not worker.conn.poll(timeout):
+                replace = True
+                return SimResult(-9, "", f"Simulation timed out after {timeout} s.", timed_out=True)
+            try:
+                returncode, stdout, stderr = worker.conn.recv()
+            except (EOFError, OSError):
+                replace = True
+                worker.process.join(timeout=5)
+                exitcode = worker.process.exitcode
+                return SimResult(exitcode if exitcode else -1, "",
+                                 f"Simulation worker crashed (exit code {exitcode}).", crashed=True)
+            if "MemoryError" in stderr or worker.jobs >= self.max_jobs_per_worker:
+                replace = True
+            return SimResult(returncode, stdout, stderr)
+        except (EOFError, OSError):
+            replace = True
+            return SimResult(-1, "", "Simulation worker was not available.", crashed=True)
+        finally:
+            if replace:
+                worker.kill()
+                worker = _Worker(self._ctx, self.memory_limit_mb)
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        for _ in range(self._workers):
+            worker = self._idle.get()
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            worker.kill()
+
+
+_POOL: Optional[SimulationPool] = None
+_POOL_SETTINGS = {"workers": 1, "memory_limit_mb": 4096, "timeout": 600.0}
+_POOL_LOCK = threading.Lock()
+
+
+def configure_pool(workers: int, memory_limit_mb: int = 4096, timeout: Optional[float] = 600.0) -> None:
+    """Set the size and limits of the process-wide pool (0 workers = plain subprocesses)."""
+    global _POOL
+    with _POOL_LOCK:
+        _POOL_SETTINGS.update(workers=workers, memory_limit_mb=memory_limit_mb, timeout=timeout)
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+def get_pool() -> Optional[SimulationPool]:
+    """Return the process-wide pool, starting it on first use (None when disabled)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None and _POOL_SETTINGS["workers"] > 0:
+            _POOL = SimulationPool(_POOL_SETTINGS["workers"], _POOL_SETTINGS["memory_limit_mb"],
+                                   _POOL_SETTINGS["timeout"])
+        return _POOL
+
+
+@atexit.register
+def _close_pool() -> None:
+    if _POOL is not None:
+        _POOL.close()
+
+
+def run_python(path: str, timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Run a Python script like `python -u path` with check=True and captured text output."""
+    cmd = ["python", "-u", path]
+    pool = get_pool()
+    if pool is None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (env.get("PYTHONPATH"), _PROJECT_ROOT) if p)
+        return subprocess.run(cmd, check=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=timeout, env=env)
+    result = pool.run(path, timeout)
+    if result.timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout if timeout is not None else pool.timeout,
+                                        output=result.stdout, stderr=result.stderr)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+    return subprocess.CompletedProcess(cmd, 0, result.stdout, result.stderr)
@@ -0,0 +1,268 @@
+"""
+Simulation sessions on the shared ngspice backend.
+
+Every `circuit.simulator().<analysis>()` call serializes the whole netlist
+and loads it into ngspice again, so a checker that runs an operating point,
+two AC analyses and a DC sweep parses the same circuit four times. A
+SimulationSession loads the circuit once and runs op / ac / dc / tran
+against the loaded copy:
+
+- Sources, resistors and capacitors are changed in place with ngspice
+  `alter` commands (set_source, set_resistance, ...); no re-parsing.
+- Changes ngspice cannot apply in place (elements added or detached, new
+  initial conditions or saved vectors) mark the session dirty; the netlist is
+  reloaded once before the next analysis and earlier alterations are replayed.
+
+Analyses return the same PySpice analysis objects as the simulator methods,
+so checker code indexes them exactly as before.
+
+streaming_transient() runs a transient in ngspice's background thread and
+hands the waveform computed so far to a monitor at evenly spaced
+checkpoints of simulated time; the run is halted as soon as the monitor
+reports a verdict (see oscillation_monitor: stable periods or a flat
+output). Verdicts depend only on the data up to a checkpoint, never on how
+fast the simulation happened to run.
+"""
+import time
+import warnings
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import PySpice
+from PySpice.Spice.NgSpice.Shared import NgSpiceCommandError
+
+from PySpice.Spice.Simulation import (
+    ACAnalysisParameters, DCAnalysisParameters, OperatingPointAnalysisParameters, TransientAnalysisParameters
+)
+from PySpice.Tools.StringTools import str_spice
+
+from src.waveform import peak_to_peak, periods
+
+# streaming_transient: monitor checkpoints per run, and how often the background run is polled.
+STREAM_CHECKPOINTS = 20
+STREAM_POLL_SECONDS = 0.02
+# PySpice releases whose NgSpiceShared keeps the cffi library handle in _ngspice_shared.
+NGSPICE_HANDLE_VERSIONS = ("1.4", "1.5")
+
+
+def ngspice_running(ngspice) -> bool:
+    """Whether ngspice's background thread is still running.
+
+    PySpice does not expose the library's ngSpice_running(); its is_running
+    flag is set by a callback and lags behind a run that just finished. The
+    library call is used on the PySpice versions known to keep the handle in
+    _ngspice_shared; other versions fall back to is_running with a warning.
+    """
+    version = ".".join(PySpice.__version__.split(".")[:2])
+    handle = getattr(ngspice, "_ngspice_shared", None)
+    if version in NGSPICE_HANDLE_VERSIONS and hasattr(handle, "ngSpice_running"):
+        return bool(handle.ngSpice_running())
+    warnings.warn(f"PySpice {PySpice.__version__}: ngSpice_running() unavailable, using is_running",
+                  RuntimeWarning, stacklevel=2)
+    return bool(ngspice.is_running)
+
+
+class SimulationSession:
+    """A circuit loaded once into shared ngspice and analysed repeatedly."""
+
+    def __init__(self, circuit, **simulator_kwargs):
+        self.circuit = circuit
+        self.simulator = circuit.simulator(simulator="ngspice-shared", **simulator_kwargs)
+        self.ngspice = self.simulator.ngspice
+        self.loads = 0
+        self._alterations: Dict[str, Dict[str, str]] = {}
+        self._dirty = True
+
+    # -----------------------------
+    # Netlist-level changes (applied by a reload)
+    # -----------------------------
+    def save_internal_parameters(self, *names: str) -> None:
+        """Save device internals (e.g. '@m1[id]') in addition to all node vectors."""
+        self.simulator.save_internal_parameters(*names)
+        self._dirty = True
+
+    def initial_condition(self, **node_voltages) -> None:
+        """Set .ic node voltages used by later transient analyses."""
+        self.simulator.initial_condition(**node_voltages)
+        self._dirty = True
+
+    def circuit_changed(self) -> None:
+        """Call after adding or detaching circuit elements."""
+        self._dirty = True
+
+    # -----------------------------
+    # In-place alterations
+    # -----------------------------
+    def alter(self, element: str, **parameters) -> None:
+        """Change device parameters of the loaded circuit (ngspice `alter`)."""
+        values = {key: str_spice(value) for key, value in parameters.items()}
+        self._alterations.setdefault(element.lower(), {}).update(values)
+        if not self._dirty:
+            self.ngspice.alter_device(element, **values)
+
+    def set_source(self, name: str, dc=None, ac=None, ac_phase=None) -> None:
+        """Change the DC value, AC magnitude and/or AC phase (degrees) of a source."""
+        parameters = {}
+        if dc is not None:
+            parameters["dc"] = dc
+        if ac is not None:
+            parameters["acmag"] = ac
+        if ac_phase is not None:
+            parameters["acphase"] = ac_phase
+        self.alter(name, **parameters)
+
+    def set_resistance(self, name: str, value) -> None:
+        self.alter(name, resistance=value)
+
+    def set_capacitance(self, name: str, value) -> None:
+        self.alter(name, capacitance=value)
+
+    # -----------------------------
+    # Analyses
+    # -----------------------------
+    def operating_point(self):
+        return self._run(OperatingPointAnalysisParameters())
+
+    def dc(self, **sweeps):
+        """DC sweep, e.g. session.dc(Vin=slice(0, 5, 0.1))."""
+        return self._run(DCAnalysisParameters(**sweeps))
+
+    def ac(self, variation, number_of_points, start_frequency, stop_frequency):
+        return self._run(ACAnalysisParameters(variation, number_of_points, start_frequency, stop_frequency))
+
+    def transient(self, step_time, end_time, start_time=0, max_time=None, use_initial_condition=False):
+        return self._run(TransientAnalysisParameters(step_time, end_time, start_time, max_time,
+                                                     use_initial_condition))
+
+    def streaming_transient(self, step_time, end_time, monitor: "TransientMonitor", start_time=0,
+                            max_time=None, use_initial_condition=False,
+                            checkpoints: int = STREAM_CHECKPOINTS) -> "StreamedTransient":
+        """Transient analysis that stops at the first checkpoint where `monitor` returns a reason.
+
+        The waveform up to each of `checkpoints` evenly spaced times is passed
+        to monitor(waveform) -> Optional[str]; a returned reason ends the run
+        there and is kept as the result's stop_reason (None if it ran to the end).
+        """
+        parameters = TransientAnalysisParameters(step_time, end_time, start_time, max_time,
+                                                  use_initial_condition)
+        end = float(parameters.end_time)
+        marks = list(np.linspace(end / checkpoints, end, checkpoints))
+        if self._dirty:
+            self._load()
+        self.ngspice.destroy()
+        self.ngspice.exec_command("bg_" + str(parameters).strip().lstrip("."))
+        while True:
+            time.sleep(STREAM_POLL_SECONDS)
+            running = self._halt()
+            plot_name = self.ngspice.last_plot
+            if plot_name == "const":  # the background run has not produced its plot yet
+                if not running:
+                    raise NameError("Simulation failed")
+                self._resume()
+                continue
+            waveform = StreamedTransient(self.ngspice.plot(self.simulator, plot_name).to_analysis())
+            reached = waveform.time[-1] if len(waveform.time) else 0.0
+            if not running and reached < end - float(parameters.step_time):
+                raise NameError("Simulation failed")
+            while marks and marks[0] <= reached:
+                partial = waveform.until(marks.pop(0))
+                partial.stop_reason = monitor(partial)
+                if partial.stop_reason:
+                    if running:
+                        # The halted run is abandoned; reload before the next analysis.
+                        self._dirty = True
+                    return partial
+            if not running:
+                return waveform
+            self._resume()
+
+    def _background_running(self) -> bool:
+        return ngspice_running(self.ngspice)
+
+    def _halt(self) -> bool:
+        """Pause the background run; returns False if it had already finished."""
+        if not self._background_running():
+            return False
+        try:
+            self.ngspice.halt()
+        except NgSpiceCommandError:  # finished in the meantime
+            return False
+        return True
+
+    def _resume(self) -> None:
+        self.ngspice.resume(background=True)
+
+    def _load(self) -> None:
+        self.ngspice.destroy()
+        self.ngspice.load_circuit(str(self.simulator))
+        self.loads += 1
+        self._dirty = False
+        for element, values in self._alterations.items():
+            self.ngspice.alter_device(element, **values)
+
+    def _run(self, parameters):
+        if self._dirty:
+            self._load()
+        # Drop the previous results so a failed run cannot return a stale plot.
+        self.ngspice.destroy()
+        self.ngspice.exec_command(str(parameters).strip().lstrip("."))
+        plot_name = self.ngspice.last_plot
+        if plot_name == "const":
+            raise NameError("Simulation failed")
+        return self.ngspice.plot(self.simulator, plot_name).to_analysis()
+
+
+# -----------------------------
+# Streaming transient
+# -----------------------------
+class StreamedTransient:
+    """Node and branch waveforms (numpy arrays) of a transient, possibly cut short.
+
+    Indexed like a PySpice analysis: waveform['Vout'], waveform.time.
+    """
+
+    def __init__(self, analysis=None, stop_reason: Optional[str] = None):
+        self.stop_reason = stop_reason
+        self.time = np.array(analysis.time, dtype=float) if analysis is not None else np.zeros(0)
+        self._vectors: Dict[str, np.ndarray] = {}
+        if analysis is not None:
+            for name, vector in list(analysis.nodes.items()) + list(analysis.branches.items()):
+                self._vectors[str(name).lower()] = np.array(vector, dtype=float)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._vectors[str(name).lower()]
+
+    def until(self, end_time: float) -> "StreamedTransient":
+        """The samples at or before end_time."""
+        n = int(np.searchsorted(self.time, end_time, side="right"))
+        cut = StreamedTransient(stop_reason=self.stop_reason)
+        cut.time = self.time[:n]
+        cut._vectors = {name: values[:n] for name, values in self._vectors.items()}
+        return cut
+
+
+TransientMonitor = Callable[[StreamedTransient], Optional[str]]
+
+
+def oscillation_monitor(node: str, min_time: float, min_periods: int = 8, period_tolerance: float = 0.05,
+                        flat_tolerance: float = 1e-6, startup: float = 0.0) -> TransientMonitor:
+    """Monitor that stops an oscillator transient once its verdict is clear.
+
+    From min_time on it returns "flatline" when the output's peak-to-peak
+    swing over everything after `startup` is below flat_tolerance, and
+    "periodic" once at least min_periods periods (mid-level rising crossings,
+    the first one skipped as start-up) vary by less than period_tolerance.
+    min_time - startup must span several of the longest accepted periods:
+    a rail-saturated square wave is flat between its edges.
+    """
+    def monitor(waveform: StreamedTransient) -> Optional[str]:
+        t, y = waveform.time, waveform[node]
+        if len(t) < 2 or t[-1] < min_time:
+            return None
+        if peak_to_peak(y[t >= startup]) < flat_tolerance:
+            return "flatline"
+        stable = periods(t, y, skip=1)
+        if len(stable) >= min_periods and np.std(stable) < period_tolerance * np.mean(stable):
+            return "periodic"
+        return None
+    return monitor
@@ -1,8 +1,11 @@
 """
 Simulation utilities.
 
-- run_code: executes a generated Python design script and heuristically parses its
-  stdout/stderr to classify failures as execution vs. simulation errors.
+- run_code: executes a generated Python design script (in a warm worker of the
+  simulation pool, see sim_pool) and heuristically parses its stdout/stderr to
+  classify failures as execution vs. simulation errors. Scripts that fail the
+  static pre-check (see static_check) are classified without running. Raw
+  stdout/stderr dumps are shortened with compaction.compact_log.
 - write_pyspice_code: converts a simple SPICE-like netlist into a minimal PySpice
   script that computes operating point voltages.
 - tmux helpers: start/kill background sessions for long-running tasks.
@@ -11,14 +14,42 @@ import os
 import sys
 import time
 import subprocess
-from typing import Tuple
+from typing import Iterable, List, Tuple
 
-def run_code(file: str) -> Tuple[int, int, str, str]:
+from src.compaction import compact_log
+from src.sim_pool import run_python
+from src.static_check import analyze_design_file
+
+
+def _collect_error_info(lines: List[str], info: str) -> str:
+    """Pick the 'ERROR ...' / 'Error ...' fragments from lines 1-3 of simulator output.
+
+    A fragment on line 1 replaces `info`; fragments on lines 2-3 are appended.
+    """
+    for i, line in enumerate(lines[1:4], start=1):
+        for tag in ("ERROR", "Error"):
+            if tag in line:
+                fragment = tag + line.split(tag)[-1]
+                info = fragment if i == 1 else info + "\n" + fragment
+                break
+    return info
+
+
+def run_code(file: str, input_nodes: Iterable[str] = (), output_nodes: Iterable[str] = (),
+             allow_subcircuits: bool = False, precheck: bool = True) -> Tuple[int, int, str, str]:
     """Run a Python file and attempt to detect execution vs. simulation failures.
 
+    allow_subcircuits is the task's subcircuit policy (metadata.allows_subcircuits);
+    precheck=False skips the static check when the caller already ran it.
     Returns (execution_error, simulation_error, execution_error_info, floating_node).
     """
     print("IN RUN_CODE : {}".format(file))
+    if precheck:
+        report = analyze_design_file(file, input_nodes, output_nodes, allow_subcircuits)
+        if report.floating_node:
+            return 0, 1, "", report.floating_node
+        if not report.ok:
+            return 1, 0, report.error_info(), ""
     simulation_error = 0
     execution_error = 0
     execution_error_info = ""
@@ -26,67 +57,43 @@ def run_code(file: str) -> Tuple[int, int, str, str]:
     try:
         print("-----------------running code-----------------")
         print("file:", file)
-        result = subprocess.run(["python", "-u", file], check=True, text=True,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
-        # Mirror the original parsing
-        if len(result.stdout.split("\n")) >= 2 and ("failed" in result.stdout.split("\n")[-2] or "failed" in result.stdout.split("\n")[-1]):
-            if len(result.stdout.split("\n")) >= 2:
-                if "check node" in result.stdout.split("\n")[1]:
-                    simulation_error = 1
-                    floating_node = result.stdout.split("\n")[1].split()[-1]
-                else:
-                    execution_error = 1
-                    if "ERROR" in result.stdout.split("\n")[1]:
-                        execution_error_info = "ERROR" + result.stdout.split("\n")[1].split("ERROR")[-1]
-                    elif "Error" in result.stdout.split("\n")[1]:
-                        execution_error_info = "Error" + result.stdout.split("\n")[1].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=3 and "ERROR" in result.stdout.split("\n")[2]:
-                        execution_error_info += "\nERROR" + result.stdout.split("\n")[2].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=3 and "Error" in result.stdout.split("\n")[2]:
-                        execution_error_info += "\nError" + result.stdout.split("\n")[2].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=4 and "ERROR" in result.stdout.split("\n")[3]:
-                        execution_error_info += "\nERROR" + result.stdout.split("\n")[3].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=4 and "Error" in result.stdout.split("\n")[3]:
-                        execution_error_info += "\nError" + result.stdout.split("\n")[3].split("Error")[-1]
-            if len(result.stderr.split("\n")) >= 2:
-                if "check node" in result.stderr.split("\n")[1]:
+        result = run_python(file, timeout=60)
+        # Split once; the classification below only looks at the first and last lines.
+        out_lines = result.stdout.split("\n")
+        err_lines = result.stderr.split("\n")
+        if len(out_lines) >= 2 and ("failed" in out_lines[-2] or "failed" in out_lines[-1]):
+            for lines in (out_lines, err_lines):
+                if len(lines) < 2:
+                    continue
+                if "check node" in lines[1]:
                     simulation_error = 1
-                    floating_node = result.stderr.split("\n")[1].split()[-1]
+                    floating_node = lines[1].split()[-1]
                 else:
                     execution_error = 1
-                    if "ERROR" in result.stderr.split("\n")[1]:
-                        execution_error_info = "ERROR" + result.stderr.split("\n")[1].split("ERROR")[-1]
-                    elif "Error" in result.stderr.split("\n")[1]:
-                        execution_error_info = "Error" + result.stderr.split("\n")[1].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=3 and "ERROR" in result.stderr.split("\n")[2]:
-                        execution_error_info += "\nERROR" + result.stderr.split("\n")[2].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=3 and "Error" in result.stderr.split("\n")[2]:
-                        execution_error_info += "\nError" + result.stderr.split("\n")[2].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=4 and "ERROR" in result.stderr.split("\n")[3]:
-                        execution_error_info += "\nERROR" + result.stderr.split("\n")[3].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=4 and "Error" in result.stderr.split("\n")[3]:
-                        execution_error_info += "\nError" + result.stderr.split("\n")[3].split("Error")[-1]
+                    execution_error_info = _collect_error_info(lines, execution_error_info)
             if simulation_error == 1:
                 execution_error = 0
             if execution_error_info == "" and execution_error == 1:
                 execution_error_info = "Simulation failed."
         code_content = open(file, "r").read()
-        if "circuit.X" in code_content:
+        if "circuit.X" in code_content and not allow_subcircuits:
             execution_error_info += "\nPlease avoid using the subcircuit (X) in the code."
-        if "error" in result.stdout.lower() and not "<<NAN, error".lower() in result.stdout.lower() and simulation_error == 0:
+        stdout_lower = result.stdout.lower()
+        if "error" in stdout_lower and "<<nan, error" not in stdout_lower and simulation_error == 0:
             execution_error = 1
-            execution_error_info = result.stdout + result.stderr
+            execution_error_info = compact_log(result.stdout + result.stderr)
         return execution_error, simulation_error, execution_error_info, floating_node
     except subprocess.CalledProcessError as e:
         print(f"error when running: {e}")
         print("stderr", e.stderr, file=sys.stderr)
         simulation_error = 0
         if "failed" in e.stdout:
-            if len(e.stderr.split("\n")) >= 2 and "check node" in e.stderr.split("\n")[1]:
+            err_lines = e.stderr.split("\n")
+            if len(err_lines) >= 2 and "check node" in err_lines[1]:
                 simulation_error = 1
-                floating_node = e.stderr.split("\n")[1].split()[-1]
+                floating_node = err_lines[1].split()[-1]
         execution_error = 1
-        execution_error_info = e.stdout + e.stderr
+        execution_error_info = compact_log(e.stdout + e.stderr)
         if simulation_error == 1:
             execution_error = 0
             execution_error_info = "Simulation failed."
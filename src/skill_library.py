@@ -0,0 +1,175 @@
+"""
+Precomputed skill-library table for complex-task prompts.
+
+Complex tasks (--skill) are prompted with three sections about the retrieved
+subcircuits: an info table, notes on input phase / DC bias, and example call
+snippets. Every library entry's share of those sections is rendered once from
+data_files/lib_info.tsv, data_files/problem_set.tsv and the NODES of
+subcircuit_lib/p<Id>_lib.py; skill_prompt() then joins the pieces for any
+set of Ids and memoizes the result per Id tuple.
+
+The table is rebuilt when either TSV changes (see src/metadata.py) or a
+library file is added or removed.
+"""
+import ast
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.metadata import MetadataStore, get_store
+
+LIB_DIR = Path(__file__).resolve().parent.parent / "subcircuit_lib"
+
+INFO_COLUMNS = (
+    "Id",
+    "Circuit Type",
+    "Gain/Differential-mode gain (dB)",
+    "Common-mode gain (dB)",
+    "Input",
+    "Output",
+)
+
+CALL_TEMPLATE = (
+    "```python\n"
+    "from p{id}_lib import *\n"
+    "# declare the subcircuit\n"
+    "circuit.subcircuit({name}())\n"
+    "# create a subcircuit instance\n"
+    "circuit.X('1', '{name}', {pins})\n"
+    "```\n"
+)
+
+
+@dataclass(frozen=True)
+class SkillPrompt:
+    """Rendered skill sections for one set of subcircuit Ids."""
+    subcircuits_info: str
+    note_info: str
+    bias_voltage: float
+    call_info: str
+
+
+@dataclass(frozen=True)
+class _Entry:
+    info_row: str  # tab-separated row of the info table
+    notes: Tuple[str, ...]
+    bias_voltage: float
+
+
+def _db(value: Optional[float]) -> str:
+    # lib_info.tsv leaves gains that do not apply as NA
+    return f"{float('nan') if value is None else value:.2f}"
+
+
+def library_pins(lib_path: Path) -> Optional[List[str]]:
+    """Read NODES = (...) from a generated p<Id>_lib.py without importing it."""
+    try:
+        tree = ast.parse(lib_path.read_text())
+    except (OSError, SyntaxError):
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "NODES" for t in node.targets):
+            try:
+                nodes = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+            # ('Vout') is a plain string, not a one-element tuple
+            return [nodes] if isinstance(nodes, str) else [str(n) for n in nodes]
+    return None
+
+
+def _notes(sub_type: str, name: str, phase: str, bias: float) -> Tuple[str, ...]:
+    other_phase = "non-inverting" if phase.lower() == "inverting" else "inverting"
+    if sub_type == "Amplifier":
+        return (f"The Vin of {name} is the {phase} input.",
+                f"There is NO {other_phase} input in {name}.",
+                f"The DC operating voltage for Vin is {bias} V.")
+    if sub_type == "Opamp":
+        return (f"The Vinn of {name} is the {phase} input.",
+                f"The Vinp of {name} is the {other_phase} input.",
+                f"The DC operating voltage for Vinn/Vinp is {bias} V.")
+    return ()
+
+
+class SkillLibrary:
+    """Per-Id prompt fragments of the subcircuit library."""
+
+    def __init__(self, store: MetadataStore, lib_dir: Path = LIB_DIR):
+        self._entries: Dict[int, _Entry] = {}
+        self._calls: Dict[int, str] = {}
+        self._missing_note = store.problem_set_path.name
+        self._memo: Dict[Tuple[int, ...], SkillPrompt] = {}
+        for task in store.tasks():
+            pins = library_pins(lib_dir / f"p{task.id}_lib.py")
+            if pins is None:
+                # No generated library file: fall back to the task's declared I/O
+                pins = [*task.input_nodes, *task.output_nodes]
+            self._calls[task.id] = CALL_TEMPLATE.format(id=task.id, name=task.submodule_name,
+                                                        pins=", ".join(pins))
+            try:
+                lib = store.lib_info(task.id)
+            except KeyError:
+                continue
+            inputs = [n for n in task.input_nodes if "bias" not in n.lower()]
+            # keep only "plain" outputs (drop differential labels)
+            outputs = [n for n in task.output_nodes if "outn" not in n.lower() and "outp" not in n.lower()]
+            info_row = "\t".join([str(task.id), task.type, _db(lib.av_db), _db(lib.com_av_db),
+                                  ", ".join(inputs), ", ".join(outputs)])
+            self._entries[task.id] = _Entry(info_row=info_row,
+                                            notes=_notes(task.type, task.submodule_name, lib.vin_phase,
+                                                         lib.voltage_bias),
+                                            bias_voltage=lib.voltage_bias)
+
+    def render(self, ids: Tuple[int, ...]) -> SkillPrompt:
+        """Info table, notes, bias voltage (of the last library entry) and call snippets for ids."""
+        cached = self._memo.get(ids)
+        if cached is not None:
+            return cached
+        rows: List[str] = ["\t".join(INFO_COLUMNS)]
+        notes: List[str] = []
+        calls: List[str] = []
+        bias_voltage = 0.0
+        for sub_id in ids:
+            entry = self._entries.get(sub_id)
+            if entry is not None:
+                rows.append(entry.info_row)
+                notes.extend(entry.notes)
+                bias_voltage = entry.bias_voltage
+            call = self._calls.get(sub_id)
+            calls.append(call if call is not None else
+                         f"# Warning: subcircuit Id {sub_id} not found in {self._missing_note}\n")
+        prompt = SkillPrompt(
+            subcircuits_info="\n".join(rows) + "\n",
+            note_info="\n".join(notes) + ("\n" if notes else ""),
+            bias_voltage=bias_voltage,
+            call_info="".join(calls),
+        )
+        self._memo[ids] = prompt
+        return prompt
+
+
+_LIBRARY: Optional[SkillLibrary] = None
+_LIBRARY_KEY = None
+_LIBRARY_LOCK = threading.Lock()
+
+
+def get_skill_library() -> SkillLibrary:
+    """Shared SkillLibrary, rebuilt when the TSVs or the library directory change."""
+    global _LIBRARY, _LIBRARY_KEY
+    store = get_store()
+    try:
+        lib_mtime = os.stat(LIB_DIR).st_mtime
+    except OSError:
+        lib_mtime = None
+    key = (store.versions(), lib_mtime)
+    with _LIBRARY_LOCK:
+        if _LIBRARY is None or key != _LIBRARY_KEY:
+            _LIBRARY, _LIBRARY_KEY = SkillLibrary(store), key
+        return _LIBRARY
+
+
+def skill_prompt(subcircuits: Iterable[int]) -> SkillPrompt:
+    """Render the skill sections for the retrieved subcircuit Ids."""
+    return get_skill_library().render(tuple(int(i) for i in subcircuits))
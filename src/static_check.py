@@ -0,0 +1,277 @@
+"""
+Static pre-validation of generated PySpice designs.
+
+The design script is parsed with `ast` (never executed) and the netlist is
+rebuilt symbolically from its `circuit.<Element>(name, node, ...)` calls, so
+problems that would otherwise cost a simulator run (seconds, plus a worker
+slot) are found in about a millisecond:
+
+- syntax errors and names that are used but never imported or defined;
+- calls to methods a PySpice Circuit does not have;
+- subcircuits (circuit.X / circuit.subcircuit) where the prompt forbids them;
+- required input/output nodes that never appear in the netlist;
+- floating nodes: nodes without a DC path to ground (ngspice's "singular
+  matrix ... check node" failure).
+
+Connectivity checks only run when every element and node was resolved from
+literals; designs that build their netlist dynamically (loops over computed
+names, helper functions) are left to the simulator. StaticReport.feedback()
+renders the first problem with the same templates as the simulator errors
+(templates/simulation_error.md and execution_error.md).
+"""
+import ast
+import builtins
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.netlist_ir import GROUND_NAMES, PIN_COUNTS, Netlist, netlist_from_elements
+from src.prompts import load_template
+
+# Element methods of PySpice's Circuit -> SPICE letter (pin counts and DC paths: see netlist_ir).
+ELEMENT_KINDS: Dict[str, str] = {
+    **dict.fromkeys(("R", "Resistor", "BehavioralResistor", "SemiconductorResistor"), "R"),
+    **dict.fromkeys(("L", "Inductor", "BehavioralInductor"), "L"),
+    **dict.fromkeys(("C", "Capacitor", "BehavioralCapacitor", "SemiconductorCapacitor"), "C"),
+    **dict.fromkeys(("V", "VoltageSource", "SinusoidalVoltageSource", "PulseVoltageSource",
+                     "ExponentialVoltageSource", "PieceWiseLinearVoltageSource",
+                     "SingleFrequencyFMVoltageSource", "AmplitudeModulatedVoltageSource",
+                     "RandomVoltageSource"), "V"),
+    **dict.fromkeys(("I", "CurrentSource", "SinusoidalCurrentSource", "PulseCurrentSource",
+                     "ExponentialCurrentSource", "PieceWiseLinearCurrentSource",
+                     "SingleFrequencyFMCurrentSource", "AmplitudeModulatedCurrentSource",
+                     "RandomCurrentSource"), "I"),
+    **dict.fromkeys(("B", "BehavioralSource", "NonLinearVoltageSource"), "B"),
+    "NonLinearCurrentSource": "G",
+    **dict.fromkeys(("D", "Diode"), "D"),
+    **dict.fromkeys(("E", "VCVS", "VoltageControlledVoltageSource"), "E"),
+    **dict.fromkeys(("G", "VCCS", "VoltageControlledCurrentSource"), "G"),
+    **dict.fromkeys(("F", "CCCS", "CurrentControlledCurrentSource"), "F"),
+    **dict.fromkeys(("H", "CCVS", "CurrentControlledVoltageSource"), "H"),
+    **dict.fromkeys(("S", "VoltageControlledSwitch"), "S"),
+    **dict.fromkeys(("W", "CurrentControlledSwitch"), "W"),
+    **dict.fromkeys(("M", "MOSFET", "Mosfet"), "M"),
+    **dict.fromkeys(("Q", "BJT", "BipolarJunctionTransistor"), "Q"),
+    **dict.fromkeys(("J", "JFET", "JunctionFieldEffectTransistor"), "J"),
+    **dict.fromkeys(("Z", "MESFET", "Mesfet"), "Z"),
+    **dict.fromkeys(("T", "TransmissionLine", "LosslessTransmissionLine"), "T"),
+}
+SUBCIRCUIT_METHODS = ("X", "SubCircuitElement", "subcircuit")
+# Circuit attributes that are not elements (or elements whose pins we do not model).
+OTHER_CIRCUIT_ATTRIBUTES = frozenset((
+    "model", "include", "lib", "parameter", "simulator", "element", "node", "nodes", "elements", "gnd",
+    "clone", "copy_to", "str", "str_end", "get_node", "has_ground_node", "element_names", "node_names",
+    "model_names", "models", "subcircuit_names", "subcircuits", "raw_spice", "title",
+    "A", "K", "N", "O", "P", "U", "Y", "AcLine", "CoupledInductor", "CoupledMulticonductorLine",
+    "GSSElement", "LossyTransmission", "SingleLossyTransmissionLine", "UniformDistributedRCLine",
+    "XSpiceElement", "CCS", "VCS",
+))
+# Names `from PySpice.Unit import *` provides besides the u_* / U_* unit shortcuts.
+_UNIT_STAR_NAMES = frozenset(("kilo", "mega", "giga", "tera", "milli", "micro", "nano", "pico", "femto",
+                              "as_V", "as_A", "as_Ohm", "as_F", "as_H", "as_Hz", "as_s", "as_W", "as_Degree"))
+_BUILTINS = frozenset(dir(builtins)) | {"__file__", "__name__"}
+
+
+@dataclass
+class StaticIssue:
+    kind: str  # syntax, undefined_name, unsupported_element, subcircuit, missing_io, no_ground, floating_node
+    message: str
+    node: str = ""
+
+
+@dataclass
+class StaticReport:
+    """Outcome of analyze_design(); `complete` is False when the netlist could not be fully resolved."""
+    issues: List[StaticIssue] = field(default_factory=list)
+    elements: List[Tuple[str, str, Tuple[str, ...]]] = field(default_factory=list)  # (SPICE letter, name, nodes)
+    complete: bool = True
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    @property
+    def code(self) -> str:
+        return f"static_{self.issues[0].kind}" if self.issues else "ok"
+
+    def nodes(self) -> Set[str]:
+        return {node for _, _, nodes in self.elements for node in nodes}
+
+    def netlist(self) -> Netlist:
+        return netlist_from_elements(self.elements)
+
+    @property
+    def floating_node(self) -> str:
+        """The floating node, if that is the only kind of problem found."""
+        if self.issues and all(i.kind == "floating_node" for i in self.issues):
+            return self.issues[0].node
+        return ""
+
+    def error_info(self) -> str:
+        """Messages of the problems other than floating nodes, one per line."""
+        return "\n".join(i.message for i in self.issues if i.kind != "floating_node")
+
+    def feedback(self) -> str:
+        """Error text for the LLM, rendered like the simulator's error feedback."""
+        if not self.issues:
+            return ""
+        if self.floating_node:
+            return load_template("simulation_error.md").render(NODE=self.floating_node)
+        return load_template("execution_error.md").render(ERROR=self.error_info())
+
+
+# -----------------------------
+# AST helpers
+# -----------------------------
+def _is_circuit_constructor(node: ast.AST) -> bool:
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    return (isinstance(func, ast.Name) and func.id == "Circuit") or \
+        (isinstance(func, ast.Attribute) and func.attr == "Circuit")
+
+
+def _bound_names(walk: List[ast.AST]) -> Tuple[Set[str], List[str]]:
+    """All names bound anywhere in the module, and the modules star-imported."""
+    bound: Set[str] = set()
+    star_modules: List[str] = []
+    for node in walk:
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    star_modules.append(getattr(node, "module", "") or "")
+                else:
+                    bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+    return bound, star_modules
+
+
+def _undefined_names(walk: List[ast.AST]) -> List[str]:
+    bound, star_modules = _bound_names(walk)
+    if any(module != "PySpice.Unit" for module in star_modules):
+        return []  # an unknown star import could define anything
+    unit_star = bool(star_modules)
+    missing: List[str] = []
+    for node in walk:
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            name = node.id
+            if name in bound or name in _BUILTINS or name in missing:
+                continue
+            if unit_star and (name.startswith(("u_", "U_")) or name in _UNIT_STAR_NAMES):
+                continue
+            missing.append(name)
+    return missing
+
+
+def _node_name(arg: ast.AST, circuits: Set[str]) -> Optional[str]:
+    """Resolve a node argument to a lower-case node name (None if not a literal)."""
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, (str, int)):
+        name = str(arg.value).lower()
+        return GROUND_NAMES[0] if name in GROUND_NAMES else name
+    if isinstance(arg, ast.Attribute) and arg.attr == "gnd" and \
+            isinstance(arg.value, ast.Name) and arg.value.id in circuits:
+        return GROUND_NAMES[0]
+    return None
+
+
+def _element_name(arg: ast.AST) -> str:
+    if isinstance(arg, ast.Constant):
+        return str(arg.value)
+    return "?"
+
+
+# -----------------------------
+# Entry points
+# -----------------------------
+def analyze_design(code: str, input_nodes: Iterable[str] = (), output_nodes: Iterable[str] = (),
+                   allow_subcircuits: bool = False) -> StaticReport:
+    """Statically check a generated PySpice design script."""
+    report = StaticReport()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        report.issues.append(StaticIssue("syntax", f"SyntaxError: {e.msg} (line {e.lineno})"))
+        report.complete = False
+        return report
+
+    walk = list(ast.walk(tree))  # every pass below shares one traversal
+    for name in _undefined_names(walk):
+        report.issues.append(StaticIssue("undefined_name", f"NameError: name '{name}' is not defined"))
+
+    circuits = {target.id for node in walk if isinstance(node, ast.Assign)
+                and _is_circuit_constructor(node.value)
+                for target in node.targets if isinstance(target, ast.Name)}
+    if not circuits:
+        report.complete = False
+        return report
+
+    for node in walk:
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name) and node.func.value.id in circuits):
+            continue
+        method = node.func.attr
+        if method in SUBCIRCUIT_METHODS:
+            if not allow_subcircuits:
+                report.issues.append(StaticIssue("subcircuit", "Please avoid using the subcircuit (X) in the code."))
+            if method == "subcircuit":
+                continue
+            # circuit.X(name, subcircuit_name, *nodes)
+            kind = "X"
+            nodes = [_node_name(arg, circuits) for arg in node.args[2:]]
+        elif method in ELEMENT_KINDS:
+            kind = ELEMENT_KINDS[method]
+            pin_count = PIN_COUNTS[kind]
+            nodes = [_node_name(arg, circuits) for arg in node.args[1:1 + pin_count]]
+            if len(nodes) < pin_count:
+                nodes.append(None)  # pins passed by keyword: not resolved
+        elif method in OTHER_CIRCUIT_ATTRIBUTES:
+            if method not in ("model", "include", "lib", "parameter", "simulator"):
+                report.complete = False  # element we do not model, or netlist introspection
+            continue
+        else:
+            report.issues.append(StaticIssue(
+                "unsupported_element", f"AttributeError: 'Circuit' object has no attribute '{method}'"))
+            continue
+        if any(n is None for n in nodes) or node.args and not isinstance(node.args[0], ast.Constant):
+            report.complete = False
+            continue
+        report.elements.append((kind, _element_name(node.args[0]), tuple(nodes)))
+
+    # Elements created in loops or functions may be repeated or renamed at run time.
+    for node in walk:
+        if isinstance(node, (ast.For, ast.While, ast.FunctionDef, ast.AsyncFunctionDef, ast.ListComp)):
+            report.complete = False
+            break
+    if not report.complete or not report.elements:
+        return report
+
+    nodes = report.nodes()
+    # problem_set.tsv writes '-' for tasks without an input
+    missing_io = [n for n in (*input_nodes, *output_nodes)
+                  if n.strip() not in ("", "-") and n.strip().lower() not in nodes]
+    for n in missing_io:
+        kind = "input" if n in input_nodes else "output"
+        report.issues.append(StaticIssue("missing_io", f"The given {kind} node ({n.strip()}) is not found in the netlist."))
+    if missing_io:
+        report.issues.append(StaticIssue(
+            "missing_io", "Suggestion: You can replace the nodes actually used for input/output with the given names."))
+    if GROUND_NAMES[0] not in nodes:
+        report.issues.append(StaticIssue("no_ground", "The circuit has no connection to ground (circuit.gnd)."))
+        return report
+    for n in report.netlist().floating_nodes():
+        report.issues.append(StaticIssue("floating_node", f"Node {n} is floating.", node=n))
+    return report
+
+
+def analyze_design_file(path: str, input_nodes: Iterable[str] = (), output_nodes: Iterable[str] = (),
+                        allow_subcircuits: bool = False) -> StaticReport:
+    with open(path, "r") as f:
+        return analyze_design(f.read(), list(input_nodes), list(output_nodes), allow_subcircuits)
@@ -0,0 +1,195 @@
+"""
+Whole-benchmark sweep scheduler.
+
+Runs many (task, model, iteration) cells from one process instead of one
+worker invocation per task:
+- Task ranges and model lists come from --tasks / --models; the worker's
+  ablation flags (--no_chain, --skill, --ngspice, ...) apply to the whole sweep.
+- All cells share one bounded asyncio scheduler (--jobs), one pooled client
+  per model and per-provider request caps (--rate_limit openai=8,deepseek=4);
+  --samples N fills N cells from a single request.
+- Cells whose answer was saved are appended to outputs/sweep_ledger.tsv and
+  skipped on restart, so an interrupted sweep resumes where it stopped.
+
+Usage:
+- python -m src.sweep --tasks 1-15 --models gpt-4o,gpt-3.5-turbo --jobs 32
+"""
+import sys
+import asyncio
+import dataclasses
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import pandas as pd
+
+from src.config import AppConfig, build_parser, config_from_args, variant_name
+from src.llm_client import set_provider_limit
+from src.metadata import TaskRow, get_store
+from src.figures import set_figure_policy
+from src.sim_pool import configure_pool
+from src.worker import (
+    _Budget, _decide_log_suffix, _log_header, _open_log, _project_root, _render_failure_figures, run_batches,
+    sample_batches
+)
+
+LEDGER_COLUMNS = ("model", "variant", "task_id", "it")
+# Same per-task dollar budget that worker.main grants a single task run.
+TASK_BUDGET = 2.0
+
+
+def parse_task_ids(spec: str) -> List[int]:
+    """Expand a spec like '1-5,9,11-12' into [1, 2, 3, 4, 5, 9, 11, 12]."""
+    task_ids: List[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            task_ids.extend(range(int(lo), int(hi) + 1))
+        else:
+            task_ids.append(int(part))
+    return sorted(set(task_ids))
+
+
+def parse_rate_limits(spec: str) -> Dict[str, int]:
+    """Parse 'openai=8,deepseek=4' into {'openai': 8, 'deepseek': 4}."""
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        provider, limit = part.split("=", 1)
+        limits[provider.strip()] = int(limit)
+    return limits
+
+
+class _Ledger:
+    """Append-only TSV of finished cells (written by the scheduling thread only)."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[Tuple[str, str, int, int]] = set()
+        if path.exists():
+            df = pd.read_csv(path, delimiter="\t")
+            for _, row in df.iterrows():
+                self.done.add((row["model"], row["variant"], int(row["task_id"]), int(row["it"])))
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("\t".join(LEDGER_COLUMNS) + "\n", encoding="utf-8")
+
+    def record(self, model: str, variant: str, task_id: int, it: int) -> None:
+        self.done.add((model, variant, task_id, it))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"{model}\t{variant}\t{task_id}\t{it}\n")
+
+
+@dataclasses.dataclass
+class _Group:
+    """Cells sharing one (task, model): one config, one budget and one log."""
+    config: AppConfig
+    row: TaskRow
+    budget: _Budget
+    log_path: Path
+
+
+def build_cells(base_config: AppConfig, models: List[str], task_ids: List[int],
+                ledger: _Ledger) -> List[Tuple[_Group, List[int]]]:
+    """Build the sweep's job graph as (group, iterations) request batches.
+
+    Each batch is one LLM request for base_config.samples candidates. Batches
+    are ordered iteration-major so every task and model receives its first
+    attempts before any of them gets its last; iterations already recorded in
+    the ledger are left out.
+    """
+    base_dir = _project_root()
+    store = get_store()
+    variant = variant_name(base_config)
+
+    groups: List[_Group] = []
+    for task_id in task_ids:
+        try:
+            row = store.task(task_id)
+        except KeyError:
+            print(f"Skipping unknown task id {task_id}", file=sys.stderr)
+            continue
+        for model in models:
+            config = dataclasses.replace(base_config, model=model, task_id=task_id)
+            log_suffix = _decide_log_suffix(config, row.type)
+            groups.append(_Group(config=config, row=row, budget=_Budget(TASK_BUDGET),
+                                 log_path=base_dir / _open_log(config, task_id, log_suffix)))
+
+    its = range(base_config.num_of_done, base_config.num_per_task)
+    cells: List[Tuple[_Group, List[int]]] = []
+    for batch in sample_batches(its, base_config.samples):
+        for group in groups:
+            todo = [it for it in batch
+                    if (group.config.model, variant, group.config.task_id, it) not in ledger.done]
+            if todo:
+                cells.append((group, todo))
+    return cells
+
+
+def run_sweep(base_config: AppConfig, models: List[str], task_ids: List[int], jobs: int) -> int:
+    """Run every unfinished cell with at most `jobs` batches in flight; return the count finished."""
+    ledger = _Ledger(_project_root() / "outputs" / "sweep_ledger.tsv")
+    cells = build_cells(base_config, models, task_ids, ledger)
+    variant = variant_name(base_config)
+    print(f"Sweep: {sum(len(its) for _, its in cells)} cells to run ({len(ledger.done)} already finished)")
+
+    # Each group owns one config object, so its identity locates the group's log.
+    log_paths = {id(group.config): group.log_path for group, _ in cells}
+    batches = [(group.config, group.row, its, group.budget) for group, its in cells]
+    finished = 0
+
+    def on_done(batch, log_text: str, saved: List[int]) -> None:
+        nonlocal finished
+        config, row, its, budget = batch
+        log_path = log_paths[id(config)]
+        with open(log_path, "a") as flog:
+            if flog.tell() == 0:
+                flog.write(_log_header(config))
+            flog.write(log_text)
+        finished += len(saved)
+        # Only cells whose answer this batch saved are final; failed requests rerun on resume.
+        # (An answer file on disk may be another variant's or an earlier sweep's.)
+        for it in saved:
+            ledger.record(config.model, variant, config.task_id, it)
+
+    asyncio.run(run_batches(batches, jobs, on_done))
+    return finished
+
+
+def main() -> int:
+    parser = build_parser()
+    parser.add_argument("--tasks", type=str, default=None,
+                        help="task ids to sweep, e.g. '1-24' or '1-15,17' (default: --task_id)")
+    parser.add_argument("--models", type=str, default=None,
+                        help="comma-separated model names (default: --model)")
+    parser.add_argument("--rate_limit", type=str, default="",
+                        help="max in-flight requests per provider, e.g. 'openai=8,deepseek=4'")
+    args = parser.parse_args()
+    base_config = config_from_args(args)
+    # Let each model resolve its own provider key unless one was given explicitly.
+    base_config = dataclasses.replace(base_config, api_key=args.api_key)
+
+    task_ids = parse_task_ids(args.tasks) if args.tasks else [base_config.task_id]
+    models = [m.strip() for m in (args.models or base_config.model).split(",") if m.strip()]
+    configure_pool(base_config.sim_workers, memory_limit_mb=base_config.sim_memory_mb)
+    set_figure_policy(base_config.figures)
+    for provider, limit in parse_rate_limits(args.rate_limit).items():
+        set_provider_limit(provider, limit)
+
+    finished = run_sweep(base_config, models, task_ids, base_config.jobs)
+    store = get_store()
+    for task_id in task_ids:
+        try:
+            row = store.task(task_id)
+        except KeyError:
+            continue
+        for model in models:
+            _render_failure_figures(dataclasses.replace(base_config, model=model), row)
+    print(f"Sweep finished {finished} cells.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
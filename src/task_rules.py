@@ -0,0 +1,203 @@
+"""
+Declarative task rules for the netlist check.
+
+Task-specific structural constraints live in data_files/task_rules.tsv, next
+to problem_set.tsv. One row per rule:
+
+    Id       comma-separated task Ids the rule applies to ("1, 2, 5")
+    Rule     rule kind (see RULE_KINDS), e.g. require_element, forbid_pins
+    Args     comma-separated arguments of the kind (node names, pins, letters)
+    Message  what is wrong; Suggestion: how to fix it (both fed to the LLM)
+    Stop     1 to skip the task's later rules when this one is violated
+
+Each distinct (Rule, Args) pair is compiled once into a predicate over
+NetlistFacts, which gathers everything the rule kinds look at in a single
+vectorized pass over the netlist IR (MOSFET pin roles per node, element
+counts, capacitor node pairs). Checking a task is then a dict lookup plus
+one cheap predicate per rule, however many tasks the file describes.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.metadata import DATA_DIR, split_nodes
+from src.netlist_ir import MOSFET_PINS, MosfetTable, Netlist
+
+RULES_PATH = DATA_DIR / "task_rules.tsv"
+
+
+@dataclass(frozen=True)
+class TaskRule:
+    """A structural constraint of one task; `message` is reported when it is violated."""
+    kind: str
+    args: Tuple[str, ...]
+    message: str
+    stop: bool = False
+
+
+@dataclass
+class NetlistFacts:
+    """What the rule kinds need to know about one netlist."""
+    netlist: Netlist
+    mos: MosfetTable
+    pin_roles: np.ndarray  # per node: bit i set if the node is on MOSFET pin MOSFET_PINS[i]
+    kind_counts: Dict[str, int]
+    capacitor_pairs: Set[Tuple[int, int]]
+
+    @classmethod
+    def of(cls, netlist: Netlist, mos: Optional[MosfetTable] = None) -> "NetlistFacts":
+        mos = netlist.mosfets() if mos is None else mos
+        pin_roles = np.zeros(netlist.n_nodes, dtype=np.uint8)
+        for bit, pin in enumerate(MOSFET_PINS):
+            np.bitwise_or.at(pin_roles, mos.pin(pin), np.uint8(1 << bit))
+        kinds, counts = np.unique(netlist.kinds, return_counts=True)
+        _, caps = netlist.terminals("C", 2)
+        return cls(netlist, mos, pin_roles,
+                   {str(k): int(c) for k, c in zip(kinds, counts)},
+                   {(int(min(a, b)), int(max(a, b))) for a, b in caps})
+
+
+# -----------------------------
+# Rule kinds
+# -----------------------------
+Predicate = Callable[[NetlistFacts], bool]  # True when the rule is violated
+RULE_KINDS: Dict[str, Callable[[Tuple[str, ...]], Predicate]] = {}
+
+
+def register_rule_kind(name: str):
+    """Decorator registering a compiler args -> predicate under a Rule name."""
+    def register(compile_rule: Callable[[Tuple[str, ...]], Predicate]):
+        RULE_KINDS[name] = compile_rule
+        return compile_rule
+    return register
+
+
+def _pin_mask(pins: Tuple[str, ...]) -> int:
+    mask = 0
+    for pin in pins:
+        if pin not in MOSFET_PINS:
+            raise ValueError(f"unknown MOSFET pin {pin!r} (expected one of {', '.join(MOSFET_PINS)})")
+        mask |= 1 << MOSFET_PINS.index(pin)
+    return mask
+
+
+@register_rule_kind("forbid_pins")
+def forbid_pins(args: Tuple[str, ...]) -> Predicate:
+    """args = (node, pin, ...): no MOSFET may have `node` on one of the pins."""
+    node_name, mask = args[0], _pin_mask(args[1:])
+
+    def violated(facts: NetlistFacts) -> bool:
+        node = facts.netlist.node(node_name)
+        return node >= 0 and bool(facts.pin_roles[node] & mask)
+    return violated
+
+
+@register_rule_kind("require_element")
+def require_element(args: Tuple[str, ...]) -> Predicate:
+    """args = (SPICE letter,): the netlist must contain such an element."""
+    kind = args[0].upper()
+    return lambda facts: facts.kind_counts.get(kind, 0) == 0
+
+
+@register_rule_kind("require_diode_load")
+def require_diode_load(args: Tuple[str, ...]) -> Predicate:
+    """Some MOSFET must have its gate tied to its drain."""
+    return lambda facts: not bool(np.any(facts.mos.diode_connected))
+
+
+@register_rule_kind("require_gate")
+def require_gate(args: Tuple[str, ...]) -> Predicate:
+    """args = (node,): some MOSFET must be driven by `node` (a first stage)."""
+    node_name, mask = args[0], _pin_mask(("gate",))
+
+    def violated(facts: NetlistFacts) -> bool:
+        node = facts.netlist.node(node_name)
+        return node < 0 or not facts.pin_roles[node] & mask
+    return violated
+
+
+@register_rule_kind("miller_cap")
+def miller_cap(args: Tuple[str, ...]) -> Predicate:
+    """args = (input, output): a capacitor must join a first-stage drain to the output."""
+    input_name, output_name = args[0], args[1]
+
+    def violated(facts: NetlistFacts) -> bool:
+        output = facts.netlist.node(output_name)
+        first_stage = facts.mos.drain[facts.mos.gate == facts.netlist.node(input_name)]
+        return not any((min(d, output), max(d, output)) in facts.capacitor_pairs
+                       for d in np.unique(first_stage).tolist())
+    return violated
+
+
+# -----------------------------
+# Rule engine
+# -----------------------------
+class TaskRuleEngine:
+    """Compiled rules of every task."""
+
+    def __init__(self, rules: Dict[int, List[TaskRule]]):
+        compiled: Dict[Tuple[str, Tuple[str, ...]], Predicate] = {}
+        self._rules: Dict[int, List[Tuple[Predicate, TaskRule]]] = {}
+        for task_id, task_rules in rules.items():
+            for rule in task_rules:
+                key = (rule.kind, rule.args)
+                if key not in compiled:
+                    if rule.kind not in RULE_KINDS:
+                        raise ValueError(f"unknown rule kind {rule.kind!r} for task {task_id}")
+                    compiled[key] = RULE_KINDS[rule.kind](rule.args)
+                self._rules.setdefault(task_id, []).append((compiled[key], rule))
+
+    def violations(self, task_id: int, netlist: Netlist, mos: Optional[MosfetTable] = None) -> List[str]:
+        """Messages of the task's rules that the netlist violates, in file order."""
+        rules = self._rules.get(task_id)
+        if not rules:
+            return []
+        facts = NetlistFacts.of(netlist, mos)
+        messages: List[str] = []
+        for violated, rule in rules:
+            if violated(facts):
+                messages.append(rule.message)
+                if rule.stop:
+                    break
+        return messages
+
+
+def load_rules(path: Path = RULES_PATH) -> Dict[int, List[TaskRule]]:
+    """Rules of task_rules.tsv grouped by task Id (file order within a task)."""
+    df = pd.read_csv(path, delimiter="\t", dtype=str, keep_default_na=False)
+    rules: Dict[int, List[TaskRule]] = {}
+    for record in df.to_dict("records"):
+        message = record["Message"].strip() + "\n"
+        if record.get("Suggestion", "").strip():
+            message += record["Suggestion"].strip() + "\n"
+        rule = TaskRule(kind=record["Rule"].strip(),
+                        args=tuple(split_nodes(record.get("Args", ""))),
+                        message=message,
+                        stop=record.get("Stop", "").strip() == "1")
+        for task_id in split_nodes(record["Id"]):
+            rules.setdefault(int(task_id), []).append(rule)
+    return rules
+
+
+_ENGINE: Optional[TaskRuleEngine] = None
+_ENGINE_MTIME: Optional[float] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_rule_engine(path: Path = RULES_PATH) -> TaskRuleEngine:
+    """Shared engine, recompiled when task_rules.tsv changes (no rules if the file is missing)."""
+    global _ENGINE, _ENGINE_MTIME
+    try:
+        mtime: Optional[float] = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    with _ENGINE_LOCK:
+        if _ENGINE is None or mtime != _ENGINE_MTIME:
+            _ENGINE = TaskRuleEngine(load_rules(path) if mtime is not None else {})
+            _ENGINE_MTIME = mtime
+        return _ENGINE
@@ -0,0 +1,72 @@
+"""
+Pass/fail verdicts of the batchable checkers.
+
+The Amplifier, Opamp and Inverter test benches (test_bench/*.py, one design
+per run) and the batched checker (src/sim_batch.py, many designs per
+ngspice run) measure the same quantities and judge them here, so both give
+the same verdict, diagnostic code, metrics and feedback message:
+
+- drain_current_verdict: every MOSFET must conduct (I_D >= MIN_DRAIN_CURRENT).
+- amplifier_verdict: AC gain at 100 Hz above MIN_GAIN.
+- opamp_verdict: differential gain above MIN_GAIN and above the common-mode gain.
+- inverter_verdict: output high for a low input, low for a high input.
+
+Each returns a CheckResult whose message is the text the test bench prints.
+"""
+from typing import List, Optional, Sequence
+
+from src.check_result import CheckResult
+
+MIN_DRAIN_CURRENT = 1e-5
+MIN_GAIN = 1e-5
+INVERTER_SWING = 1.0
+INVERTER_THRESHOLD = 2.5
+
+FIX_OPERATING_POINT = "Please fix the wrong operating point.\n"
+
+
+def drain_current_verdict(names: Sequence[str], currents: Sequence[float]) -> Optional[CheckResult]:
+    """Failure listing the MOSFETs that carry no drain current, or None if all conduct."""
+    off: List[str] = [name for name, current in zip(names, currents) if float(current) < MIN_DRAIN_CURRENT]
+    if not off:
+        return None
+    message = "".join(f"The circuit does not function correctly. the current I_D for {name} is 0. \n"
+                      for name in off)
+    return CheckResult(False, "no_drain_current", message=message + FIX_OPERATING_POINT + "\n")
+
+
+def amplifier_verdict(gain: float, phase: float, **metrics) -> CheckResult:
+    message = f"Voltage Gain (Av) at 100 Hz: {gain}\n"
+    metrics = {**metrics, "gain": float(gain), "phase": float(phase)}
+    if gain > MIN_GAIN:
+        return CheckResult(True, "ok", metrics, message + "The circuit functions correctly at 100 Hz.\n\n")
+    return CheckResult(False, "low_gain", metrics,
+                       message + "The circuit does not function correctly.\n"
+                       "the gain is less than 1e-5.\n" + FIX_OPERATING_POINT + "\n")
+
+
+def opamp_verdict(cm_gain: float, diff_gain: float, phase: float, **metrics) -> CheckResult:
+    message = (f"Common-Mode Gain (Av) at 100 Hz: {cm_gain}\n"
+               f"Differential-Mode Gain (Av) at 100 Hz: {diff_gain}\n")
+    metrics = {**metrics, "cm_gain": float(cm_gain), "diff_gain": float(diff_gain), "phase": float(phase)}
+    cm_too_high = cm_gain >= diff_gain - MIN_GAIN
+    low_diff = diff_gain < MIN_GAIN
+    if not cm_too_high and not low_diff:
+        return CheckResult(True, "ok", metrics, message + "The circuit functions correctly at 100 Hz.\n\n")
+    if cm_too_high:
+        message += "Common-Mode gain is larger than Differential-Mode gain.\n\n"
+    if low_diff:
+        message += "Differential-Mode gain is smaller than 1e-5.\n\n"
+    message += "The circuit does not function correctly.\n" + FIX_OPERATING_POINT + "\n"
+    return CheckResult(False, "cm_gain_too_high" if cm_too_high else "low_diff_gain", metrics, message)
+
+
+def inverter_verdict(vout_high_in: float, vout_low_in: float, **metrics) -> CheckResult:
+    """vout_high_in / vout_low_in: output voltage with the input at 5 V / 0 V."""
+    metrics = {**metrics, "vout_high_in": float(vout_high_in), "vout_low_in": float(vout_low_in)}
+    if (vout_high_in <= INVERTER_THRESHOLD and vout_low_in >= INVERTER_THRESHOLD
+            and vout_low_in - vout_high_in >= INVERTER_SWING):
+        return CheckResult(True, "ok", metrics, "The circuit functions correctly.\n\n")
+    return CheckResult(False, "not_inverting", metrics,
+                       "The circuit does not function correctly.\n"
+                       "It can not invert the input voltage.\n" + FIX_OPERATING_POINT + "\n")
@@ -5,31 +5,56 @@ Responsibilities:
 - Build the appropriate prompt for the task (simple vs. complex with skills/retrieval).
 - Call the LLM and persist raw outputs for traceability.
 - Extract runnable code from the LLM response and save a snippet per-iteration.
-- Run lightweight checks on the produced code/netlist to validate basics.
+- Judge the produced code cheapest check first (static pre-check, operating
+  point + netlist check, task checker) and feed failures back to the LLM for
+  up to --num_of_retry repair rounds (see src/repair.py).
+- Render the figures of failed checks after the task (--figures, see src/figures.py).
 - Maintain a simple token-cost accounting approximation.
+- Record every round (prompt hash, answer, code, check outcome, tokens,
+  latency, stage timings) in the run store (src/run_store.py).
+- Reuse cached answers for identical prompts, or replay whole runs offline (--replay).
+- Optionally run several iterations of a task concurrently (--jobs), asking
+  for several candidate designs per request (--samples).
 """
+import io
+import sys
 import time
-import pandas as pd
-from typing import Optional, List
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, List, Tuple
 from pathlib import Path
 
-def _save_answer(project_root: Path, model: str, task_id: int, it: int, task: str, answer: str) -> Path:
+def _answer_path(project_root: Path, model: str, task_id: int, it: int, task: str, rnd: int = 0) -> Path:
+    """Return where the raw LLM answer of one iteration (and repair round) is stored."""
+    name = f"it{it}_{task}.md" if rnd == 0 else f"it{it}_r{rnd}_{task}.md"
+    return project_root / "outputs" / model / f"{task_id}" / name
+
+def _save_answer(project_root: Path, model: str, task_id: int, it: int, task: str, answer: str,
+                 rnd: int = 0) -> Path:
     """
     Save raw LLM answer to a markdown file and return its path.
     """
-    out_dir = project_root / "outputs" / model / f"{task_id}"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_md = out_dir / f"it{it}_{task}.md"
+    out_md = _answer_path(project_root, model, task_id, it, task, rnd)
+    out_md.parent.mkdir(parents=True, exist_ok=True)
     out_md.write_text(answer, encoding="utf-8")
     return out_md
 
-from src.config import parse_args, AppConfig, COMPLEX_TASK_TYPES
-from src.llm_client import LLMClient
-from src.prompts import build_prompt, execution_error_prompt, simulation_error_prompt
+from src.config import parse_args, AppConfig, COMPLEX_TASK_TYPES, variant_name
+from src.check_result import CheckResult
+from src.repair import RepairContext, RoundStats, summary_line
+from src.llm_client import AsyncLLMClient, LLMResponse, get_client
+from src.metadata import get_store
+from src.pricing import token_cost
+from src.response_cache import ResponseCache, get_cache, messages_hash
+from src.run_store import RunRecord, RunStore, default_path, get_run_store
+from src.prompts import build_prompt
 from src.retrieval import get_retrieval
+from src.figures import pending_figures, render_figures, set_figure_policy
+from src.sim_pool import configure_pool
+from src.skill_library import skill_prompt
 from src.analysis import (
-    get_subcircuits_info, get_note_info, get_call_info,
-    extract_code, check_function
+    evaluate_design, evaluate_designs, extract_code
 )
 
 def _project_root() -> Path:
@@ -51,107 +76,451 @@ def _decide_log_suffix(config: AppConfig, task_type: str) -> str:
     if not config.skill and task_type in COMPLEX_TASK_TYPES: return "_log_no_skill"
     return "_log"
 
-def _write_snippet(base_dir: Path, model: str, task_id: int, it: int, code_text: str) -> Path:
+def _log_header(config: AppConfig) -> str:
+    """First line of a worker log: the ablation variant the suffix cannot always tell (see leaderboard)."""
+    return f"variant: {variant_name(config)}\n"
+
+def _write_snippet(base_dir: Path, model: str, task_id: int, it: int, code_text: str, rnd: int = 0) -> Path:
     model_dir = base_dir / _model_dir_name(model) / str(task_id)
     model_dir.mkdir(parents=True, exist_ok=True)
-    out_path = model_dir / f"it_{it}.py"
+    out_path = model_dir / (f"it_{it}.py" if rnd == 0 else f"it_{it}_r{rnd}.py")
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(code_text)
     return out_path
 
-def work_one(config: AppConfig, row, it: int, flog, remaining_money: float) -> float:
-    task = row['Circuit']
-    input_nodes = row['Input'].strip()
-    output_nodes = row['Output'].strip()
-    task_type = row['Type']
+class _Budget:
+    """Thread-safe dollar budget shared by concurrently running iterations."""
+    def __init__(self, amount: float):
+        self._lock = threading.Lock()
+        self._remaining = amount
+
+    @property
+    def remaining(self) -> float:
+        with self._lock:
+            return self._remaining
+
+    def charge(self, cost: float) -> float:
+        with self._lock:
+            self._remaining -= cost
+            return self._remaining
+
+def _build_messages(config: AppConfig, row) -> List[Dict[str, str]]:
+    """Build the chat messages (system + task prompt) for one iteration of a task."""
+    task = row.circuit
+    input_nodes = row.input.strip()
+    output_nodes = row.output.strip()
+    task_type = row.type
     subcircuits: Optional[List[int]] = None
     if task_type in COMPLEX_TASK_TYPES:
         subcircuits = get_retrieval(config, task, config.task_id)
 
     # Build prompt
     if task_type in COMPLEX_TASK_TYPES and config.skill:
-        sub_info = get_subcircuits_info(subcircuits)
-        note_info, bias_voltage = get_note_info(subcircuits)
-        call_info = get_call_info(subcircuits)
+        skills = skill_prompt(subcircuits)
+        bias_voltage = skills.bias_voltage
         prompt, _ = build_prompt(config, task, input_nodes, output_nodes, task_type,
-                                 subcircuits_info=sub_info, note_info=note_info, call_info=call_info)
+                                 subcircuits_info=skills.subcircuits_info, note_info=skills.note_info,
+                                 call_info=skills.call_info)
     else:
         prompt, bias_voltage = build_prompt(config, task, input_nodes, output_nodes, task_type)
 
-    messages = [
+    return [
         {"role": "system", "content": "You are an analog integrated circuits expert."},
         {"role": "user", "content": prompt}
     ]
 
-    exec_err_prompt = execution_error_prompt()
-    sim_err_prompt = simulation_error_prompt()
+def _prepare_answer(config: AppConfig, row, it: int, answer: str, flog, rnd: int = 0) -> Optional[Path]:
+    """Persist one LLM answer and extract its code; returns the snippet path (None if no code)."""
+    task = row.circuit
+    # Persist the raw text
+    out_md = _save_answer(_project_root(), config.model, row.id, it, task, answer, rnd)
+    flog.write(f"Saved output to: {out_md}\n")
 
-    client = LLMClient(config.model, config.api_key)
-    # Call LLM
-    if client.is_openai_like():
-        try:
-            response = client.chat_openai(messages, temperature=config.temperature)
-            answer = response.text
-            total_tokens = response.total_tokens
-            prompt_tokens = response.prompt_tokens
-            completion_tokens = response.completion_tokens
-            # simple money accounting
-            if "ft:gpt-3.5" in config.model:
-                remaining_money -= (prompt_tokens / 1e6 * 3) + (completion_tokens / 1e6 * 6)
-            elif "gpt-3" in config.model:
-                remaining_money -= (prompt_tokens / 1e6 * 0.5) + (completion_tokens / 1e6 * 1.5)
-            elif "gpt-4" in config.model:
-                remaining_money -= (prompt_tokens / 1e6 * 10) + (completion_tokens / 1e6 * 30)
-
-            # Persist the raw text
-            out_md = _save_answer(_project_root(), config.model, row['Id'], it, task, answer)
-            flog.write(f"Saved output to: {out_md}\n")
-
-            # Try to extract runnable code
-            empty_err, code_text = extract_code(answer, use_ngspice=config.ngspice)
-            if empty_err or not code_text.strip():
-                flog.write(f"Extraction failed for task {row['Id']} (it={it}): no code block found\n")
-                flog.flush()
-                return remaining_money
+    # Try to extract runnable code
+    empty_err, code_text = extract_code(answer, use_ngspice=config.ngspice)
+    if empty_err or not code_text.strip():
+        flog.write(f"Extraction failed for task {row.id} (it={it}): no code block found\n")
+        flog.flush()
+        return None
 
-            # Save snippet and run checker
-            base_dir = _project_root()
-            code_path = _write_snippet(base_dir, config.model, row['Id'], it, code_text)
-            flog.write(f"Saved code to: {code_path}\n")
-            flog.flush()
+    # Save snippet for the checker
+    base_dir = _project_root()
+    code_path = _write_snippet(base_dir, config.model, row.id, it, code_text, rnd)
+    flog.write(f"Saved code to: {code_path}\n")
+    flog.flush()
+    return code_path
 
-            # Determine task_type for checker
-            task_type = row['Type']
-            func_err, msg = check_function(row['Id'], str(code_path), task_type)
-            if func_err:
-                flog.write(f"Check failed for task {row['Id']} (it={it}): {msg}\n")
-            else:
-                flog.write(f"Check passed for task {row['Id']} (it={it})\n")
-            flog.flush()
+def _log_check(row, it: int, check: CheckResult, flog) -> None:
+    metrics = "".join(f" {k}={v}" for k, v in check.metrics.items())
+    if not check.passed:
+        flog.write(f"Check failed for task {row.id} (it={it}) [{check.code}{metrics}]: {check.message}\n")
+    else:
+        flog.write(f"Check passed for task {row.id} (it={it}) [{check.code}{metrics}]\n")
+    flog.flush()
 
-        except Exception as e:
-            flog.write(f"LLM call failed on task {row['Id']} (it={it}): {repr(e)}\n")
+def _evaluate_answer(config: AppConfig, row, it: int, rnd: int, answer: str, stats: RoundStats,
+                     flog) -> Optional[CheckResult]:
+    """Persist one round's answer, judge its code and fill in the round's stats.
+
+    Returns the check result (None if the answer had no code or could not be evaluated).
+    """
+    try:
+        code_path = _prepare_answer(config, row, it, answer, flog, rnd)
+        if code_path is None:
+            return None
+        evaluation = evaluate_design(row.id, str(code_path), row.type)
+    except Exception as e:
+        flog.write(f"Evaluation failed on task {row.id} (it={it}): {repr(e)}\n")
+        flog.flush()
+        stats.code = "evaluation_failed"
+        return None
+    stats.record(evaluation)
+    _log_check(row, it, evaluation.check, flog)
+    return evaluation.check
+
+def _run_store(config: AppConfig) -> Optional[RunStore]:
+    """Return the run store configured for this run (None when disabled)."""
+    if not config.run_store:
+        return None
+    return get_run_store(Path(config.run_store_path) if config.run_store_path else default_path())
+
+def _record_round(config: AppConfig, row, stats: RoundStats, messages: List[Dict[str, str]], answer: str) -> None:
+    """Queue one finished round for the run store."""
+    store = _run_store(config)
+    if store is None:
+        return
+    _, code_text = extract_code(answer, use_ngspice=config.ngspice) if answer else (1, "")
+    store.add(RunRecord(
+        model=config.model, variant=variant_name(config), task_id=row.id, task_type=row.type, it=stats.it,
+        round=stats.round, passed=stats.passed, stage=stats.stage, error=stats.code,
+        prompt_hash=messages_hash(messages), answer=answer, code=code_text, metrics=stats.metrics,
+        prompt_tokens=stats.prompt_tokens, completion_tokens=stats.completion_tokens,
+        reused_tokens=stats.reused_tokens, context_tokens=stats.context_tokens,
+        cost=token_cost(config.model, stats.prompt_tokens, stats.completion_tokens),
+        llm_seconds=stats.llm_seconds, seconds=stats.seconds, stage_seconds=stats.stage_seconds,
+        simulations=stats.simulations, simulations_skipped=stats.simulations_skipped))
+
+def _flush_run_store(config: AppConfig) -> None:
+    """Write the queued rounds now, so finished iterations survive a killed process."""
+    store = _run_store(config)
+    if store is not None:
+        store.flush()
+
+def _finish_round(rounds: List[RoundStats], stats: RoundStats, start: float, flog) -> bool:
+    """Log a finished round; returns True if the repair loop should go on."""
+    stats.seconds = time.perf_counter() - start
+    rounds.append(stats)
+    flog.write(stats.line())
+    flog.flush()
+    return not stats.passed and stats.code != "evaluation_failed"
+
+def _response_cache(config: AppConfig) -> Optional[ResponseCache]:
+    """Return the response cache configured for this run (None when disabled)."""
+    if not config.cache and not config.replay:
+        return None
+    root = Path(config.cache_dir) if config.cache_dir else _project_root() / ".llm_cache"
+    return get_cache(root, config.cache_max_mb * 1024 * 1024)
+
+def _known_answers(config: AppConfig, row, messages: List[Dict[str, str]], its: List[int],
+                   rnd: int = 0) -> Dict[int, Tuple[str, int]]:
+    """Return (answer, reused tokens) for the `its` that need no request.
+
+    Answers come from the response cache (sample index = iteration); in replay
+    mode the saved outputs/<model>/<task>/it*.md files are used as a fallback.
+    """
+    answers: Dict[int, Tuple[str, int]] = {}
+    cache = _response_cache(config)
+    msg_hash = messages_hash(messages)
+    for it in its:
+        entry = cache.get(config.model, config.temperature, msg_hash, it) if cache else None
+        if entry is not None:
+            answers[it] = (entry["text"], entry.get("prompt_tokens", 0) + entry.get("completion_tokens", 0))
+            continue
+        if config.replay:
+            saved = _answer_path(_project_root(), config.model, row.id, it, row.circuit, rnd)
+            if saved.exists():
+                answers[it] = (saved.read_text(encoding="utf-8"), 0)
+    return answers
+
+def _store_answers(config: AppConfig, messages: List[Dict[str, str]], its: List[int], response: LLMResponse) -> None:
+    """Record freshly requested answers in the response cache."""
+    cache = _response_cache(config)
+    if cache is None:
+        return
+    msg_hash = messages_hash(messages)
+    for it, text in zip(its, response.texts):
+        cache.put(config.model, config.temperature, msg_hash, it, text,
+                  response.prompt_tokens, response.completion_tokens)
+
+def work_one(config: AppConfig, row, it: int, flog, remaining_money: float) -> float:
+    """Run one iteration: the initial design plus up to config.num_of_retry repair rounds."""
+    context = RepairContext(_build_messages(config, row))
+    rounds: List[RoundStats] = []
+    for rnd in range(config.num_of_retry + 1):
+        stats, start = RoundStats(it=it, round=rnd), time.perf_counter()
+        messages = context.messages()
+        context.fill(stats)
+        known = _known_answers(config, row, messages, [it], rnd)
+        if it in known:
+            answer, stats.reused_tokens = known[it]
+            flog.write(f"Reusing cached answer for task {row.id} (it={it}, round={rnd})\n")
+        elif config.replay:
+            flog.write(f"Replay: no cached answer for task {row.id} (it={it}, round={rnd})\n")
             flog.flush()
-            return remaining_money
-    else:
-        raise NotImplementedError("Ollama path should be wired similarly to original if needed.")
+            break
+        else:
+            client = get_client(config.model, config.api_key)
+            if not client.is_openai_like():
+                raise NotImplementedError("Ollama path should be wired similarly to original if needed.")
+            try:
+                requested = time.perf_counter()
+                response = client.chat_openai(messages, temperature=config.temperature)
+                stats.llm_seconds = time.perf_counter() - requested
+            except Exception as e:
+                flog.write(f"LLM call failed on task {row.id} (it={it}): {repr(e)}\n")
+                flog.flush()
+                break
+            remaining_money -= token_cost(config.model, response.prompt_tokens, response.completion_tokens)
+            stats.prompt_tokens, stats.completion_tokens = response.prompt_tokens, response.completion_tokens
+            _store_answers(config, messages, [it], response)
+            answer = response.text
+        check = _evaluate_answer(config, row, it, rnd, answer, stats, flog)
+        go_on = _finish_round(rounds, stats, start, flog)
+        _record_round(config, row, stats, messages, answer)
+        if not go_on or remaining_money < 0:
+            break
+        context.add_round(answer, check)
+    flog.write(summary_line(rounds))
+    flog.flush()
+    _flush_run_store(config)
     return remaining_money
 
+async def _repair_async(config: AppConfig, row, it: int, messages: List[Dict[str, str]], answer: str,
+                        check: Optional[CheckResult], client: Optional[AsyncLLMClient],
+                        rounds: List[RoundStats], budget: _Budget, flog) -> None:
+    """Repair rounds 1..num_of_retry of one iteration whose first design failed.
+
+    Each round's cost is charged to the shared budget as soon as it is known;
+    no further round starts once the budget is exhausted.
+    """
+    context = RepairContext(messages)
+    for rnd in range(1, config.num_of_retry + 1):
+        context.add_round(answer, check)
+        messages = context.messages()
+        stats, start = RoundStats(it=it, round=rnd), time.perf_counter()
+        context.fill(stats)
+        known = await asyncio.to_thread(_known_answers, config, row, messages, [it], rnd)
+        if it in known:
+            answer, stats.reused_tokens = known[it]
+            flog.write(f"Reusing cached answer for task {row.id} (it={it}, round={rnd})\n")
+        elif client is None:
+            flog.write(f"Replay: no cached answer for task {row.id} (it={it}, round={rnd})\n")
+            break
+        else:
+            try:
+                requested = time.perf_counter()
+                response = await client.chat_openai(messages, config.temperature, n=1)
+                stats.llm_seconds = time.perf_counter() - requested
+            except Exception as e:
+                flog.write(f"LLM call failed on task {row.id} (it={it}): {repr(e)}\n")
+                break
+            budget.charge(token_cost(config.model, response.prompt_tokens, response.completion_tokens))
+            stats.prompt_tokens, stats.completion_tokens = response.prompt_tokens, response.completion_tokens
+            await asyncio.to_thread(_store_answers, config, messages, [it], response)
+            answer = response.text
+        check = await asyncio.to_thread(_evaluate_answer, config, row, it, rnd, answer, stats, flog)
+        go_on = _finish_round(rounds, stats, start, flog)
+        _record_round(config, row, stats, messages, answer)
+        if not go_on or budget.remaining < 0:
+            break
+
+async def work_batch_async(config: AppConfig, row, its: List[int], client: Optional[AsyncLLMClient],
+                           budget: _Budget) -> Tuple[str, List[int]]:
+    """Request candidate designs for `its` in one completion and evaluate each.
+
+    Iterations with a cached answer are not requested again; in replay mode
+    (client is None) nothing is requested at all. All candidates of the batch
+    are evaluated together cheapest check first (see evaluate_designs), and
+    each failed candidate then goes through its own repair rounds
+    concurrently with the others. Prompt building and checker runs are
+    blocking, so they run in worker threads while the event loop keeps other
+    requests in flight. Every completion is charged to `budget` when it
+    returns, and repair rounds stop once the budget is exhausted. Returns
+    (log_text, saved): one log block per iteration, in iteration order, and
+    the iterations whose answer this batch saved to disk.
+    """
+    logs: Dict[int, str] = {it: f"task: {row.id}, it: {it}\n" for it in its}
+    try:
+        messages = await asyncio.to_thread(_build_messages, config, row)
+        known = await asyncio.to_thread(_known_answers, config, row, messages, its)
+        answers = {it: answer for it, (answer, _) in known.items()}
+        stats = {it: RoundStats(it=it, round=0, reused_tokens=known[it][1] if it in known else 0)
+                 for it in its}
+        for it in its:
+            RepairContext(messages).fill(stats[it])
+        for it in answers:
+            logs[it] += f"Reusing cached answer for task {row.id} (it={it})\n"
+        missing = [it for it in its if it not in answers]
+        if missing and client is None:
+            for it in missing:
+                logs[it] += f"Replay: no cached answer for task {row.id} (it={it})\n"
+        elif missing:
+            requested = time.perf_counter()
+            response = await client.chat_openai(messages, config.temperature, n=len(missing))
+            latency = time.perf_counter() - requested
+            budget.charge(token_cost(config.model, response.prompt_tokens, response.completion_tokens))
+            await asyncio.to_thread(_store_answers, config, messages, missing, response)
+            answers.update(zip(missing, response.texts))
+            # One request serves every sample; its tokens are shared out evenly.
+            for it in missing:
+                stats[it].prompt_tokens = response.prompt_tokens // len(missing)
+                stats[it].completion_tokens = response.completion_tokens // len(missing)
+                stats[it].llm_seconds = latency
+            for it in missing[len(response.texts):]:
+                logs[it] += f"Provider returned {len(response.texts)} of {len(missing)} samples; no answer for it={it}\n"
+    except Exception as e:
+        return "".join(f"{logs[it]}LLM call failed on task {row.id} (it={it}): {repr(e)}\n"
+                       for it in its), []
+
+    saved: List[int] = []
+
+    def prepare(it: int, answer: str) -> Tuple[Optional[Path], str]:
+        buf = io.StringIO()
+        try:
+            code_path = _prepare_answer(config, row, it, answer, buf)
+            saved.append(it)
+            return code_path, buf.getvalue()
+        except Exception as e:
+            buf.write(f"Evaluation failed on task {row.id} (it={it}): {repr(e)}\n")
+            return None, buf.getvalue()
+
+    start = time.perf_counter()
+    answered = [it for it in its if it in answers]
+    prepared = await asyncio.gather(*(asyncio.to_thread(prepare, it, answers[it]) for it in answered))
+    code_paths = {}
+    for it, (code_path, log) in zip(answered, prepared):
+        logs[it] += log
+        if code_path is not None:
+            code_paths[it] = str(code_path)
+    # All candidates of the batch are evaluated together (one simulation job per stage where the type allows).
+    checks: Dict[int, Optional[CheckResult]] = {}
+    if code_paths:
+        try:
+            evaluations = await asyncio.to_thread(evaluate_designs, row.id, list(code_paths.values()), row.type)
+            for it, evaluation in zip(code_paths, evaluations):
+                stats[it].record(evaluation)
+                checks[it] = evaluation.check
+                buf = io.StringIO()
+                _log_check(row, it, evaluation.check, buf)
+                logs[it] += buf.getvalue()
+        except Exception as e:
+            for it in code_paths:
+                logs[it] += f"Evaluation failed on task {row.id} (it={it}): {repr(e)}\n"
+                stats[it].code = "evaluation_failed"
+
+    async def repair(it: int) -> None:
+        rounds: List[RoundStats] = []
+        buf = io.StringIO()
+        go_on = _finish_round(rounds, stats[it], start, buf)
+        _record_round(config, row, stats[it], messages, answers[it])
+        if go_on and budget.remaining >= 0:
+            await _repair_async(config, row, it, messages, answers[it], checks.get(it), client, rounds, budget, buf)
+        buf.write(summary_line(rounds))
+        logs[it] += buf.getvalue()
+
+    await asyncio.gather(*(repair(it) for it in answered))
+    return "".join(logs[it] for it in its), sorted(saved)
+
+def sample_batches(its: Iterable[int], samples: int) -> List[List[int]]:
+    """Split iteration numbers into request batches of `samples` candidates each."""
+    its = list(its)
+    return [its[i:i + samples] for i in range(0, len(its), samples)]
+
+async def run_batches(batches: List[Tuple[AppConfig, Any, List[int], _Budget]], jobs: int,
+                      on_done: Callable[[Tuple[AppConfig, Any, List[int], _Budget], str, List[int]], None]) -> None:
+    """Run (config, row, its, budget) batches with at most `jobs` in flight.
+
+    One pooled AsyncLLMClient is shared per (model, api_key); replay runs
+    never create one. A batch is
+    skipped once its budget is exhausted, and each completion is charged to
+    the budget as it returns. The batch's rounds are written to the run store
+    before on_done receives the finished batch with its log text and the
+    iterations whose answer it saved.
+    """
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=jobs))
+    slots = asyncio.Semaphore(jobs)
+    clients: Dict[Tuple[str, Optional[str]], AsyncLLMClient] = {}
+
+    async def run(batch):
+        config, row, its, budget = batch
+        async with slots:
+            if budget.remaining < 0:
+                return
+            client = None
+            if not config.replay:
+                key = (config.model, config.api_key)
+                if key not in clients:
+                    clients[key] = AsyncLLMClient(config.model, config.api_key, max_connections=jobs)
+                client = clients[key]
+            log_text, saved = await work_batch_async(config, row, its, client, budget)
+            # The rounds are in the store before on_done marks the cells finished.
+            await asyncio.to_thread(_flush_run_store, config)
+        on_done(batch, log_text, saved)
+
+    try:
+        await asyncio.gather(*(run(batch) for batch in batches))
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+def _run_parallel(config: AppConfig, row, flog, remaining_money: float) -> float:
+    """Run the task's iterations with up to config.jobs requests/checks in flight.
+
+    Each request asks for config.samples candidates. LLM calls overlap with
+    the checker runs of earlier iterations, and new requests are only issued
+    while the shared budget is positive.
+    """
+    budget = _Budget(remaining_money)
+    its = range(config.num_of_done, config.num_per_task)
+    batches = [(config, row, batch, budget) for batch in sample_batches(its, config.samples)]
+
+    def on_done(batch, log_text: str, saved: List[int]) -> None:
+        flog.write(log_text)
+        flog.flush()
+
+    asyncio.run(run_batches(batches, config.jobs, on_done))
+    return budget.remaining
+
+def _render_failure_figures(config: AppConfig, row) -> None:
+    """Render the figures of the task's failed checks, now that no check is waiting on them."""
+    if config.figures != "failure":
+        return
+    task_dir = _project_root() / _model_dir_name(config.model) / str(row.id)
+    if task_dir.exists():
+        render_figures(pending_figures([str(task_dir)]), workers=max(1, config.sim_workers))
+
 def main():
     config = parse_args()
+    configure_pool(config.sim_workers, memory_limit_mb=config.sim_memory_mb)
+    set_figure_policy(config.figures)
     base_dir = _project_root()
-    df_path = base_dir / 'data_files' / 'problem_set.tsv'
-    df = pd.read_csv(df_path, delimiter='\t')
+    try:
+        row = get_store().task(config.task_id)
+    except KeyError:
+        print(f"Unknown task id {config.task_id}", file=sys.stderr)
+        return
     remaining_money = 2
-    for _, row in df.iterrows():
-        if row['Id'] != config.task_id:
-            continue
-        log_suffix = _decide_log_suffix(config, row['Type'])
-        log_path = _open_log(config, row['Id'], log_suffix)
-        with open(base_dir / log_path, 'w') as flog:
+    log_suffix = _decide_log_suffix(config, row.type)
+    log_path = _open_log(config, row.id, log_suffix)
+    with open(base_dir / log_path, 'w') as flog:
+        flog.write(_log_header(config))
+        if config.jobs > 1 or config.samples > 1:
+            _run_parallel(config, row, flog, remaining_money)
+        else:
             for it in range(config.num_of_done, config.num_per_task):
-                flog.write(f"task: {row['Id']}, it: {it}\n")
+                flog.write(f"task: {row.id}, it: {it}\n")
                 flog.flush()
                 remaining_money = work_one(config, row, it, flog, remaining_money)
                 if remaining_money < 0:
-                    break
\ No newline at end of file
+                    break
+    _render_failure_figures(config, row)
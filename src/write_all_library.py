@@ -1,11 +1,24 @@
 import os
-import subprocess
+import sys
+import json
+import argparse
+import hashlib
 import pandas as pd
 import math
+from concurrent.futures import ThreadPoolExecutor
 
+if not __package__:
+    # When executed as a script from src/, make the src package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.check_result import parse_check_output
+from src.metadata import LIB_INFO_PATH, get_store
+from src.metrics_store import DEFAULT_POLICY, RANKING_POLICIES, DesignRecord, MetricsStore, select_design
+from src.retrieval import update_retrieval_index
+from src.sim_pool import run_python
 
-data_path = '../data_files/problem_set.tsv'
-df = pd.read_csv(data_path, delimiter='\t')
+MANIFEST_PATH = "library_manifest.json"
+MODELS = ['gpt3p5', 'gpt4', 'gpt4o']
+LIB_TASK_IDS = range(1, 16)
 
 template = '''from PySpice.Unit import *
 from PySpice.Spice.Netlist import SubCircuitFactory
@@ -35,6 +48,32 @@ def write_phase_check(check_file_path, extra_check_file_path, task_type):
         f.write(extra_check_code)
 
 
+def check_metrics(check_file_path, task_type):
+    """Run a saved *_check.py and return the metrics of its result record.
+
+    Check files written before the result protocol print no record; for those
+    the phase print is injected and the printed gains are scraped instead.
+    """
+    result = run_python(check_file_path)
+    check = parse_check_output(result.returncode, result.stdout, result.stderr)
+    if check.code != "no_record" or task_type not in ("Amplifier", "Opamp"):
+        return check.metrics
+    extra_check_file_path = check_file_path.replace("_check.py", "_extra_check.py")
+    write_phase_check(check_file_path, extra_check_file_path, task_type)
+    result = run_python(extra_check_file_path)
+    metrics = {}
+    for line in result.stdout.split("\n"):
+        if line.startswith("Voltage Gain"):
+            metrics["gain"] = float(line.split(":")[-1].strip())
+        elif line.startswith("Common-Mode Gain"):
+            metrics["cm_gain"] = float(line.split(":")[-1].strip())
+        elif line.startswith("Differential-Mode Gain"):
+            metrics["diff_gain"] = float(line.split(":")[-1].strip())
+        elif line.startswith("Phase"):
+            metrics["phase"] = int(line.split(" ")[-2].strip())
+    return metrics
+
+
 def get_bias_voltage(code_path, node):
     print("code_path", code_path)
     print("node", node)
@@ -45,12 +84,47 @@ def get_bias_voltage(code_path, node):
             if line.lower().startswith(node):
                 return float(line.split("\t")[1])
 
+def input_source_node(line, input_set):
+    """Node of a `circuit.V(...)` line that drives one of the inputs, else None."""
+    if not line.startswith("circuit.V"):
+        return None
+    parts = line.split(",")
+    if len(parts) > 2 and parts[1].strip()[1:-1].lower() in input_set:
+        return parts[1].strip()[1:-1].lower()
+    return None
+
+
+def lib_input_set(task):
+    """Lower-cased non-bias input nodes of a task (the inputs a library entry exposes)."""
+    return {n.lower() for n in task.input_nodes if "bias" not in n.lower()}
+
+
+def design_bias_voltage(code_path, task):
+    """DC bias of the design's input source (as generate_lib records it), None if unknown."""
+    input_set = lib_input_set(task)
+    bias_voltage = None
+    try:
+        with open(code_path, "r") as f:
+            for line in f:
+                node = input_source_node(line, input_set)
+                if node is not None:
+                    bias_voltage = get_bias_voltage(code_path, node)
+    except (OSError, ValueError, IndexError):
+        return None
+    return bias_voltage
+
+
+def lib_path(task_id):
+    return f"subcircuit_lib/p{task_id}_lib.py"
+
+
 def generate_lib(code_path, task_id):
     code = template + "\n"
-    submodule_name = df.loc[df['Id'] == task_id, 'Submodule Name'].values[0]
+    task = get_store().task(task_id)
+    submodule_name = task.submodule_name
     code += f"class {submodule_name}(SubCircuitFactory):\n"
-    inputs = df.loc[df['Id'] == task_id, 'Input'].values[0]
-    outputs = df.loc[df['Id'] == task_id, 'Output'].values[0]
+    inputs = task.input
+    outputs = task.output
     code += f"\tNAME = ('" + submodule_name + "')\n"
     code += f"\tNODES = ("
     input_set = set()
@@ -87,13 +161,10 @@ def generate_lib(code_path, task_id):
                 continue
             if start == 0:
                 continue
-            if line.startswith("circuit.V"):
-                print(line)
-                parts = line.split(",")
-                print(parts)                
-                if len(parts) > 2 and parts[1].strip()[1:-1].lower() in input_set:
-                    bias_voltage = get_bias_voltage(code_path, parts[1].strip()[1:-1].lower())
-                    continue
+            node = input_source_node(line, input_set)
+            if node is not None:
+                bias_voltage = get_bias_voltage(code_path, node)
+                continue
             if line.startswith("simulator = circuit.simulator()"):
                 break
             if line.startswith("# Analysis Part"):
@@ -102,7 +173,7 @@ def generate_lib(code_path, task_id):
     code = code.replace("circuit.", "self.")
     if not os.path.exists("../subcircuit_lib"):
         os.mkdir("../subcircuit_lib")
-    output_file_path = f"subcircuit_lib/p{task_id}_lib.py"
+    output_file_path = lib_path(task_id)
     with open(output_file_path, "w") as f:
         f.write(code)
     return bias_voltage
@@ -112,10 +183,12 @@ def output_retrieval_prompt(output_df):
     retrieval_template = open("../templates/retrieval_prompt_template.md", "r").read()
     table_content = "| Id | Type | Circuit | Gain (dB) | Common Mode Gain (dB) | # of inputs | # of outputs | Input Phase |\n"
     table_content += "| --- | --- | --- | --- | --- | --- | --- | --- |\n"
-    for i, (index, row) in enumerate(output_df.iterrows()):
-        input_string = df.loc[df['Id'] == i, 'Input'].item()
-        output_string = df.loc[df['Id'] == i, 'Output'].item()
-        circuit = df.loc[df['Id'] == i, 'Circuit'].item()
+    store = get_store()
+    for _, row in output_df.iterrows():
+        task = store.task(row['Id'])
+        input_string = task.input
+        output_string = task.output
+        circuit = task.circuit
         if row['Type'] == "CurrentMirror":
             num_of_inputs = 1
             num_of_outputs = 1
@@ -139,77 +212,165 @@ def output_retrieval_prompt(output_df):
         table_content += f"| {row['Id']} | {row['Type']} | {circuit} | {gain} | {com_gain} | {num_of_inputs} | {num_of_outputs} | {vin_phase} |\n"
 
     retrieval_template = retrieval_template.replace("[TABLE]", table_content)
-    with open("../data_files/retrieval_prompt.md", "w") as f:
-        f.write(retrieval_template)
+    write_if_changed("../data_files/retrieval_prompt.md", retrieval_template)
+
+# -----------------------------
+# Incremental build
+# -----------------------------
+def content_hash(*paths):
+    """Hash the contents of the given files (a missing file hashes as empty)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def write_if_changed(path, text):
+    """Write text unless the file already holds it; return whether it was written."""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            if f.read() == text:
+                return False
+    with open(path, "w") as f:
+        f.write(text)
+    return True
+
 
-def work():
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"libs": {}}
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    manifest.setdefault("libs", {})
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def collect_designs(task_ids=LIB_TASK_IDS, models=MODELS):
+    """List (task_id, model, check_file_path) for every successful design on disk."""
+    designs = []
+    for task_id in task_ids:
+        for model in models:
+            base_dir = f"{model}/p{task_id}"
+            if not os.path.exists(base_dir):
+                continue
+            for it in sorted(os.listdir(base_dir)):
+                if not os.path.isdir(os.path.join(base_dir, it)):
+                    continue
+                for file in sorted(os.listdir(os.path.join(base_dir, it))):
+                    if file.endswith("_success.py"):
+                        designs.append((task_id, model,
+                                        os.path.join(base_dir, it, file.replace("_success.py", "_check.py"))))
+    return designs
+
+
+def measure_designs(designs, metrics_store, jobs=None):
+    """Record the metrics of every design, rerunning only checks whose design changed.
+
+    Checks of new or changed designs run in parallel; unchanged designs keep
+    the metrics already in the store.
+    """
+    store = get_store()
+    hashes = {path: content_hash(path.replace("_check.py", "_success.py"), path) for _, _, path in designs}
+    todo = []
+    for task_id, model, path in designs:
+        record = metrics_store.get(path)
+        if record is None or record.design_hash != hashes[path]:
+            todo.append((task_id, model, path))
+    print(f"Checking {len(todo)} of {len(designs)} designs ({len(designs) - len(todo)} unchanged)")
+
+    def measure(design):
+        task_id, model, path = design
+        task = store.task(task_id)
+        return DesignRecord(path=path, task_id=task_id, model=model, task_type=task.type,
+                            design_hash=hashes[path], metrics=check_metrics(path, task.type),
+                            bias_voltage=design_bias_voltage(path.replace("_check.py", "_success.py"), task))
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        for record in pool.map(measure, todo):
+            metrics_store.add(record)
+
+
+def build_lib(task_id, code_path, manifest):
+    """Generate p<task_id>_lib.py unless its source design and output are unchanged; return the bias voltage."""
+    task = get_store().task(task_id)
+    design_hash = content_hash(code_path, code_path.replace("_success.py", "_op.txt"))
+    inputs = hashlib.sha256((design_hash + repr(task)).encode()).hexdigest()
+    record = manifest["libs"].get(str(task_id), {})
+    if record.get("inputs") == inputs and record.get("lib") == content_hash(lib_path(task_id)):
+        return record["bias_voltage"]
+    print(f"Generating library for task {task_id} from {code_path}")
+    bias_voltage = generate_lib(code_path, task_id)
+    manifest["libs"][str(task_id)] = {"source": code_path, "inputs": inputs,
+                                      "lib": content_hash(lib_path(task_id)), "bias_voltage": bias_voltage}
+    return bias_voltage
+
+
+def normalized_phase(task_type, phase):
+    """Input phase in degrees as lib_info reports it (Opamp phases are measured on Vinn)."""
+    if phase is None:
+        return None
+    phase = round(phase)
+    if task_type == "Opamp":
+        if abs(phase) == 180:
+            phase = 0
+        elif phase == 0:
+            phase = 180
+        elif phase == 90 or phase == -90:
+            phase = -phase
+    return phase
+
+
+def work(jobs=None, policy=DEFAULT_POLICY):
     output_df = pd.DataFrame(columns=['Id', 'Type', 'Av (dB)', 'Com Av (dB)', 'Vin(n) Phase', 'Voltage Bias'])
+    manifest = load_manifest()
+    metrics_store = MetricsStore.load()
+    designs = collect_designs()
+    measure_designs(designs, metrics_store, jobs)
+    metrics_store.save()
+    present = {path for _, _, path in designs}
     flog = open("write_all_lib_log.txt", "w")
-    for task_id in range(1, 16):
-        task_type = df.loc[df['Id'] == task_id, 'Type'].values[0]
+    for task_id in LIB_TASK_IDS:
+        task_type = get_store().task(task_id).type
         print("task_type", task_type)
+        records = [r for r in metrics_store.records(task_id) if r.path in present]
+        for r in records:
+            if task_type == "Amplifier":
+                flog.write("{}\t{}\t{}\t{}\t{}\n".format(task_id, r.path, task_type, r.metric("gain"),
+                                                         normalized_phase(task_type, r.metric("phase"))))
+            elif task_type == "Opamp":
+                flog.write("{}\t{}\t{}\t{}\t{}\t{}\n".format(task_id, r.path, task_type, r.metric("diff_gain"),
+                                                             r.metric("cm_gain"),
+                                                             normalized_phase(task_type, r.metric("phase"))))
+        best = select_design(task_type, records, policy)
+        if best is None:
+            print(f"No successful design for task {task_id}; skipping")
+            continue
+        best_code_path = best.path.replace("_check.py", "_success.py")
         best_av = 0
         best_com_av = 0
         best_phase = None
-        for model in ['gpt3p5', 'gpt4', 'gpt4o']:
-            base_dir = f"{model}/p{task_id}"
-            if not os.path.exists(base_dir):
-                continue
-            for it in os.listdir(base_dir):
-                if not os.path.isdir(os.path.join(base_dir, it)):
-                    continue
-                for file in os.listdir(os.path.join(base_dir, it)):
-                    if not file.endswith("_success.py"):
-                        continue
-                    print("file", file)
-                    check_file_path = os.path.join(base_dir, it, file.replace("_success.py", "_check.py"))
-                    if task_type == "Amplifier" or task_type == "Opamp":
-                        extra_check_file_path = check_file_path.replace("_check.py", "_extra_check.py")
-                        write_phase_check(check_file_path, extra_check_file_path, task_type)
-                        result = subprocess.run(["python", "-u", extra_check_file_path], check=True, text=True, 
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    else:
-                        result = subprocess.run(["python", "-u", check_file_path], check=True, text=True,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    if task_type == "Amplifier":
-                        for line in result.stdout.split("\n"):
-                            if line.startswith("Voltage Gain"):
-                                av = float(line.split(":")[-1].strip())
-                            if line.startswith("Phase"):
-                                phase = int(line.split(" ")[-2].strip())
-                        if av > best_av and av <= 1e4:
-                            best_av = av
-                            best_code_path = check_file_path.replace("_check.py", "_success.py")
-                            best_phase = phase
-                        flog.write("{}\t{}\t{}\t{}\t{}\n".format(task_id, check_file_path, task_type, av, phase))
-                    elif task_type == "Opamp":
-                        for line in result.stdout.split("\n"):
-                            if line.startswith("Common-Mode Gain"):
-                                com_av = float(line.split(":")[-1].strip())
-                            elif line.startswith("Differential-Mode Gain"):
-                                av = float(line.split(":")[-1].strip())
-                            elif line.startswith("Phase"):
-                                phase = int(line.split(" ")[-2].strip())
-                        if abs(phase) == 180:
-                            phase = 0
-                        elif phase == 0:
-                            phase = 180
-                        elif phase == 90 or phase == -90:
-                            phase = -phase
-                        if av > best_av:
-                            best_av = av
-                            best_com_av = com_av
-                            best_code_path = check_file_path.replace("_check.py", "_success.py")
-                            best_phase = phase
-                        flog.write("{}\t{}\t{}\t{}\t{}\t{}\n".format(task_id, check_file_path, task_type, av, com_av, phase))
-                    else:
-                        best_code_path = check_file_path.replace("_check.py", "_success.py")
+        if task_type == "Amplifier":
+            best_av = best.metric("gain")
+            best_phase = normalized_phase(task_type, best.metric("phase"))
+        elif task_type == "Opamp":
+            best_av = best.metric("diff_gain")
+            best_com_av = best.metric("cm_gain")
+            best_phase = normalized_phase(task_type, best.metric("phase"))
         print("task_id", task_id)
         print("best_av", best_av)
         print("best_com_av", best_com_av)
         print("best_code_path", best_code_path)
         print("best_phase", best_phase)
-        bias_voltage = generate_lib(best_code_path, task_id)
+        bias_voltage = build_lib(task_id, best_code_path, manifest)
         assert isinstance(output_df, pd.DataFrame), "output_df is not a pandas DataFrame"
         
         if best_phase == 180 or best_phase == -180:
@@ -230,13 +391,22 @@ def work():
             com_av_db = 20*math.log10(best_com_av)
         new_row = {'Id': task_id, 'Type': task_type, 'Av (dB)': av_db, 'Com Av (dB)': com_av_db, 'Vin(n) Phase': phase_char, 'Voltage Bias': bias_voltage}
         output_df = pd.concat([output_df, pd.DataFrame([new_row])], ignore_index=True)
-    output_df.to_csv("lib_info.tsv", sep='\t', index=False)
+    # Written where get_store() and the retrieval index read it, so both see the new entries
+    write_if_changed(LIB_INFO_PATH, output_df.to_csv(sep='\t', index=False))
     output_retrieval_prompt(output_df)
+    # Index only the library entries that are new or changed since the last build
+    update_retrieval_index()
+    save_manifest(manifest)
     flog.close()
 
 def main():
-    work()
+    parser = argparse.ArgumentParser(description="Build the subcircuit library from successful designs.")
+    parser.add_argument("--policy", choices=sorted(RANKING_POLICIES), default=DEFAULT_POLICY,
+                        help="how the design of each library entry is chosen")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel checker runs (default: CPU count)")
+    args = parser.parse_args()
+    work(jobs=args.jobs, policy=args.policy)
 
 
 if __name__ == "__main__":
-    work()
+    main()
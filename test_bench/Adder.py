@@ -1,3 +1,5 @@
+from src.sim_session import SimulationSession
+
 bias_voltage = [BIAS_VOLTAGE]
 v1_amp = bias_voltage
 v2_amp = bias_voltage + 0.125
@@ -38,16 +40,16 @@ for element in circuit.elements:
 
 # print(str(circuit))
 
-simulator = circuit.simulator()
+session = SimulationSession(circuit)
 
 
 params = {vin1_name: slice(bias_voltage, bias_voltage + 0.5, 0.01)}
 # Run a DC analysis
 try:
-    analysis = simulator.dc(**params)
+    analysis = session.dc(**params)
 except:
     print("DC analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 import numpy as np
 out_voltage = np.array(analysis.Vout)
@@ -55,20 +57,17 @@ in_voltage = np.array(analysis.Vin1)
 vin2_voltage = np.array(analysis.Vin2)
 
 
-import sys
-
-
 tolerance = 0.2  # 20% Tolerance
-for i, out_v in enumerate(out_voltage):
-    in_v_1 = in_voltage[i] - bias_voltage
-    in_v_2 = v2_amp - bias_voltage
-    expected_vout = bias_voltage - (in_v_1 + in_v_2)
-    actual_vout = out_v
-    if not np.isclose(actual_vout, expected_vout, rtol=tolerance):
-        print(f"The circuit does not function correctly as an adder.\n"
-            f"Expected Vout: {expected_vout:.4f} V, Vin1 = {in_v_1+bias_voltage:.4f} V, Vin2 = {in_v_2+bias_voltage:.4f} V | Actual Vout: {actual_vout:.4f} V\n")
-        sys.exit(2)
+in_v_2 = v2_amp - bias_voltage
+expected = bias_voltage - ((in_voltage - bias_voltage) + in_v_2)
+wrong = np.flatnonzero(~np.isclose(out_voltage, expected, rtol=tolerance))
+if len(wrong):
+    i = wrong[0]
+    in_v_1, expected_vout, actual_vout = in_voltage[i] - bias_voltage, expected[i], out_voltage[i]
+    print(f"The circuit does not function correctly as an adder.\n"
+        f"Expected Vout: {expected_vout:.4f} V, Vin1 = {in_v_1+bias_voltage:.4f} V, Vin2 = {in_v_2+bias_voltage:.4f} V | Actual Vout: {actual_vout:.4f} V\n")
+    check_exit(False, "wrong_output", expected_vout=expected_vout, actual_vout=actual_vout)
 
 
 print("The op-amp adder functions correctly.\n")
-sys.exit(0)
\ No newline at end of file
+check_exit(True)
\ No newline at end of file
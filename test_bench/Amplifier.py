@@ -1,4 +1,7 @@
-simulator_id = circuit.simulator()
+from src.sim_session import SimulationSession
+from src.verdicts import amplifier_verdict, drain_current_verdict
+from src.waveform import gain_at
+
 mosfet_names = []
 import PySpice.Spice.BasicElement
 for element in circuit.elements:
@@ -9,42 +12,24 @@ mosfet_name_ids = []
 for mosfet_name in mosfet_names:
     mosfet_name_ids.append(f"@{mosfet_name}[id]")
 
-simulator_id.save_internal_parameters(*mosfet_name_ids)
-analysis_id = simulator_id.operating_point()
-
-id_correct = 1
-for mosfet_name in mosfet_names:
-    mosfet_id = float(analysis_id[f"@{mosfet_name}[id]"][0])
-    if mosfet_id < 1e-5:
-        id_correct = 0
-        print("The circuit does not function correctly. "
-          "the current I_D for {} is 0. ".format(mosfet_name)
-          .format(mosfet_name))
+# One loaded netlist serves the operating point and every AC run below.
+session = SimulationSession(circuit)
+session.save_internal_parameters(*mosfet_name_ids)
+analysis_id = session.operating_point()
+check_metric(power=supply_power(circuit, analysis_id))
 
-if id_correct == 0:
-    print("Please fix the wrong operating point.\n")
-    sys.exit(2)
+id_check = drain_current_verdict(mosfet_names, [analysis_id[name][0] for name in mosfet_name_ids])
+if id_check is not None:
+    check_verdict(id_check)
 
 
 frequency = 100@u_Hz
-analysis = simulator.ac(start_frequency=frequency, stop_frequency=frequency*10, 
+analysis = session.ac(start_frequency=frequency, stop_frequency=frequency*10, 
     number_of_points=2, variation='dec')
 
 import numpy as np
 
 node = 'vout'
 output_voltage = analysis[node].as_ndarray()[0]
-gain = np.abs(output_voltage / (1e-6))
-
-print(f"Voltage Gain (Av) at 100 Hz: {gain}")
-
-required_gain = 1e-5
-import sys
-if gain > required_gain:
-    print("The circuit functions correctly at 100 Hz.\n")
-    sys.exit(0)
-else:
-    print("The circuit does not function correctly.\n"
-          "the gain is less than 1e-5.\n"
-          "Please fix the wrong operating point.\n")
-    sys.exit(2)
\ No newline at end of file
+gain = gain_at(analysis.frequency.as_ndarray(), analysis[node].as_ndarray(), 100, input_amplitude=1e-6)
+check_verdict(amplifier_verdict(gain, np.angle(output_voltage, deg=True)))
@@ -1,3 +1,6 @@
+import numpy as np
+from src.sim_session import SimulationSession
+
 load_resistances = [100, 300, 500, 750, 1000]
 currents = []
 
@@ -9,10 +12,11 @@ for element in circuit.elements:
         break
 
 
-resistor = circuit[resistor_name]
+# The load is swept in place; the netlist is parsed only once.
+session = SimulationSession(circuit)
 for r_load in load_resistances:
-    resistor.resistance = r_load
-    analysis = simulator.operating_point()
+    session.set_resistance(resistor_name, r_load)
+    analysis = session.operating_point()
     if str(node2) == "0":
         current = float(analysis[str(node1)][0]) / r_load
     elif str(node1) == "0":
@@ -26,18 +30,16 @@ for r_load, current in zip(load_resistances, currents):
 
 tolerance = 1e-6
 
-current_variations = []
-for i in range(4):
-    current_variations.append(abs(currents[i+1] - currents[i]))
+current_variations = np.abs(np.diff(currents))
 
-import sys
+check_metric(currents=currents, max_variation=max(current_variations))
 if min(current_variations) < tolerance and min(currents) > 1e-5:
     pass
     # print("The circuit functions correctly as a constant current source within the given tolerance.")
     # sys.exit(0)
 else:
     print("The circuit does not function correctly as a current source.")
-    sys.exit(2)
+    check_exit(False, "not_current_source")
 
 iin_name = None
 for element in circuit.elements:
@@ -47,15 +49,13 @@ for element in circuit.elements:
 # print("iin_name", iin_name)
 if iin_name is None:
     print("The circuit functions correctly as a current source within the given tolerance.")
-    sys.exit(0)
-
+    check_exit(True)
 
-circuit.element(iin_name).dc_value = "0.00155"
 
-# print(str(circuit))
-simulator = circuit.simulator()
-resistor.resistance = 500
-analysis = simulator.operating_point()
+if iin_name[0].lower() in ("v", "i"):
+    session.set_source(iin_name, dc=0.00155)
+session.set_resistance(resistor_name, 500)
+analysis = session.operating_point()
 if str(node2) == "0":
     current = float(analysis[str(node1)][0]) / r_load
 elif str(node1) == "0":
@@ -68,7 +68,7 @@ else:
 # print("abs(current - currents[2])", abs(current - currents[2]))
 if abs(current - currents[2]) < 1e-6:
     print("The circuit does not as a current source because it cannot replicate the Iref current.")
-    sys.exit(2)
+    check_exit(False, "no_iref_tracking", iref_current=current)
 else:
     print("The circuit functions correctly as a current source within the given tolerance.")
-    sys.exit(0)
+    check_exit(True, iref_current=current)
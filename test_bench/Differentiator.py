@@ -1,3 +1,6 @@
+from src.sim_session import SimulationSession
+from src.waveform import extrema, level_means, mid_level
+
 vin_name = ""
 for element in circuit.elements:
     if "vin" in [str(pin.node).lower() for pin in element.pins] and element.name.lower().startswith("v"):
@@ -25,16 +28,14 @@ for element in circuit.elements:
 circuit.element(c_name).capacitance = "3u"
 
 # Initialize the simulator
-simulator = circuit.simulator()
-
+session = SimulationSession(circuit)
 
-import sys
 # Perform transient analysis
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=200@u_ms)
+    analysis = session.transient(step_time=1@u_us, end_time=200@u_ms)
 except:
     print("analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 
 import numpy as np
@@ -43,34 +44,23 @@ time = np.array(analysis.time)
 vin = np.array(analysis['vin'])
 vout = np.array(analysis['vout'])
 
-import matplotlib.pyplot as plt
 # Plot the response
-plt.figure()
-plt.plot(time, vout)
-plt.title('Response of Op-amp Differentiator')
-plt.xlabel('Time [s]')
-plt.ylabel('Output Voltage [V]')
-plt.grid(True)
-plt.savefig("[FIGURE_PATH]")
+check_figure('Response of Op-amp Differentiator', {'Vout': (time, vout)}, ylabel='Output Voltage [V]')
 
 
-from scipy.signal import find_peaks
 # Check for square wave characteristics in the output
 # Calculate the mean voltage level of the peaks and troughs
 
 # print("vout", vout)
 # print("max(vout)", max(vout))
 # print("min(vout)", min(vout))
-min_height = (max(vout) + min(vout)) / 2
+min_height = mid_level(vout)
 # print("min_height", min_height)
 num_of_peaks = 2
 min_distance = len(vout) / (2 * num_of_peaks) / 1.5 
 # print("min_distance", min_distance)
 
-peaks, _ = find_peaks(vout, height=min_height, distance=min_distance)
-
-
-troughs, _ = find_peaks(-vout, height=-min_height, distance=min_distance)
+peaks, troughs = extrema(vout, height=min_height, distance=min_distance)
 
 
 average_peak_voltage = np.mean(vout[peaks])
@@ -80,17 +70,17 @@ average_trough_voltage = np.mean(vout[troughs])
 
 if len(peaks) == 0 or len(troughs) == 0:
     print("No peaks or troughs found in output voltage. Please check the netlist.")
-    sys.exit(2)
+    check_exit(False, "no_peaks")
 
 peak_voltages = vout[peaks]
 trough_voltages = vout[troughs]
 mean_peak = np.mean(peak_voltages)
 mean_trough = np.mean(trough_voltages)
+check_metric(mean_peak=mean_peak, mean_trough=mean_trough)
 
 
 def is_square_wave(waveform, mean_peak, mean_trough, rtol=0.1):
-    high_level = np.mean([x for x in waveform if x > (mean_peak + mean_trough) / 2])
-    low_level = np.mean([x for x in waveform if x <= (mean_peak + mean_trough) / 2])
+    high_level, low_level = level_means(waveform, (mean_peak + mean_trough) / 2)
 
     is_high_close = np.isclose(high_level, mean_peak, rtol=rtol)
     is_low_close = np.isclose(low_level, mean_trough, rtol=rtol)
@@ -109,15 +99,15 @@ if np.isclose(mean_peak - bias_voltage, -mean_trough+ bias_voltage, rtol=0.2) an
 elif not np.isclose(mean_peak - bias_voltage, -mean_trough+ bias_voltage, rtol=0.2):
     print(f"The circuit does not function correctly as a differentiator.\n"
           f"When the input is a triangle wave and the output is not a square wave.\n")
-    sys.exit(2)
+    check_exit(False, "not_square_wave")
 elif not is_square_wave(vout, mean_peak, mean_trough):
     print(f"The circuit does not function correctly as a differentiator.\n"
           f"When the input is a triangle wave and the output is not a square wave.\n")
-    sys.exit(2)
+    check_exit(False, "not_square_wave")
 else:
     print(f"The circuit does not function correctly as a differentiator.\n"
           f"Output voltage peak value is wrong. Mean peak voltage: {mean_peak} V | Mean trough voltage: {mean_trough} V\n")
-    sys.exit(2)
+    check_exit(False, "wrong_amplitude")
 
 
 for element in circuit.elements:
@@ -125,12 +115,12 @@ for element in circuit.elements:
         x_name = element.name
 
 circuit.element(x_name).detach()
-simulator = circuit.simulator()
+session.circuit_changed()
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=200@u_ms)
+    analysis = session.transient(step_time=1@u_us, end_time=200@u_ms)
 except:
     print("The op-amp differentiator functions correctly.\n")
-    sys.exit(0)
+    check_exit(True)
 
 time = np.array(analysis.time)
 vin = np.array(analysis['vin'])
@@ -139,14 +129,11 @@ vout = np.array(analysis['vout'])
 
 
 
-min_height = (max(vout) + min(vout)) / 2
+min_height = mid_level(vout)
 num_of_peaks = 2
 min_distance = len(vout) / (2 * num_of_peaks) / 1.5 
 
-peaks, _ = find_peaks(vout, height=min_height, distance=min_distance)
-
-
-troughs, _ = find_peaks(-vout, height=-min_height, distance=min_distance)
+peaks, troughs = extrema(vout, height=min_height, distance=min_distance)
 
 
 average_peak_voltage = np.mean(vout[peaks])
@@ -156,7 +143,7 @@ average_trough_voltage = np.mean(vout[troughs])
 
 if len(peaks) == 0 or len(troughs) == 0:
     print(f"The op-amp differentiator functions correctly.\n")
-    sys.exit(2)
+    check_exit(False, "no_peaks_without_opamp")
 
 peak_voltages = vout[peaks]
 trough_voltages = vout[troughs]
@@ -166,9 +153,10 @@ mean_trough = np.mean(trough_voltages)
 
 if np.isclose(mean_peak - bias_voltage, -mean_trough+ bias_voltage, rtol=0.2) and np.isclose(mean_peak - bias_voltage, 0.6, rtol=0.2):  # 20% tolerance
     print("The differentiator maybe a passive differentiator.\n")
+    check_exit(True, "passive_suspected")
 elif not np.isclose(mean_peak - bias_voltage, -mean_trough+ bias_voltage, rtol=0.2):
     print(f"The op-amp differentiator functions correctly.\n")
-    sys.exit(2)
+    check_exit(False, "asymmetric_without_opamp")
 else:
     print(f"The op-amp differentiator functions correctly.\n")
-    sys.exit(2)
+    check_exit(False, "wrong_amplitude_without_opamp")
@@ -1,3 +1,6 @@
+from src.sim_session import SimulationSession
+from src.waveform import extrema, slope_fit
+
 vin_name = ""
 for element in circuit.elements:
     if "vin" in [str(pin.node).lower() for pin in element.pins] and element.name.lower().startswith("v"):
@@ -23,65 +26,51 @@ for element in circuit.elements:
         c_name = element.name
 circuit.element(c_name).capacitance = "3u"
 
-simulator = circuit.simulator()
+session = SimulationSession(circuit)
 
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=200@u_ms)
+    analysis = session.transient(step_time=1@u_us, end_time=200@u_ms)
 except:
     print("analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 
 import numpy as np
-import matplotlib.pyplot as plt
 # Plot the step response
 time = np.array(analysis.time)
 vin = np.array(analysis['vin'])
 vout = np.array(analysis['vout'])
 
 
-plt.figure()
-plt.plot(time, vout)
-plt.title('Step Response of Op-amp Integrator')
-plt.xlabel('Time [s]')
-plt.ylabel('Output Voltage [V]')
-plt.grid(True)
-plt.savefig("[FIGURE_PATH]")
+check_figure('Step Response of Op-amp Integrator', {'Vout': (time, vout)}, ylabel='Output Voltage [V]')
 
 
 expected_slope = 0.5 / 0.03
 
 
-from scipy.signal import find_peaks
-
-peaks, _ = find_peaks(vout)
-
-troughs, _ = find_peaks(-vout)
+peaks, troughs = extrema(vout)
 
 if len(peaks) < 2 or len(troughs) < 2:
     print("No peaks or troughs found in output voltage. Please check the netlist.")
-    sys.exit(2)
+    check_exit(False, "no_peaks")
 
 
 start = peaks[-2]
 end = troughs[troughs > start][0] 
 
-slope, intercept = np.polyfit(time[start:end], vout[start:end], 1)
+slope, intercept, r_squared = slope_fit(time[start:end], vout[start:end])
 slope = np.abs(slope)
-from scipy.stats import linregress
-_, _, r_value, p_value, std_err = linregress(time[start:end], vout[start:end])
 
+check_metric(slope=slope, expected_slope=expected_slope, r_squared=r_squared)
 
-
-import sys
 if not np.isclose(slope, expected_slope, rtol=0.3):  # 30% tolerance
     print(f"The circuit does not function correctly as an integrator.\n"
           f"Expected slope: {expected_slope} V/s | Actual slope: {slope} V/s\n")
-    sys.exit(2)
+    check_exit(False, "wrong_slope")
 
-if not r_value** 2 >= 0.9:
+if not r_squared >= 0.9:
     print("The op-amp integrator does not have a linear response.\n")
-    sys.exit(2)
+    check_exit(False, "nonlinear")
 
 
 for element in circuit.elements:
@@ -89,12 +78,12 @@ for element in circuit.elements:
         x_name = element.name
 
 circuit.element(x_name).detach()
-simulator = circuit.simulator()
+session.circuit_changed()
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=200@u_ms)
+    analysis = session.transient(step_time=1@u_us, end_time=200@u_ms)
 except:
     print("The op-amp integrator functions correctly.\n")
-    sys.exit(0)
+    check_exit(True)
 
 time = np.array(analysis.time)
 vin = np.array(analysis['vin'])
@@ -106,30 +95,24 @@ vout = np.array(analysis['vout'])
 expected_slope = 0.5 / 0.03
 
 
-from scipy.signal import find_peaks
-
-peaks, _ = find_peaks(vout)
-
-troughs, _ = find_peaks(-vout)
+peaks, troughs = extrema(vout)
 
 if len(peaks) < 2 or len(troughs) < 2:
     print("The op-amp integrator functions correctly.\n")
-    sys.exit(0)
+    check_exit(True)
 
 
 start = peaks[-2]
 end = troughs[troughs > start][0] 
 
-slope, intercept = np.polyfit(time[start:end], vout[start:end], 1)
+slope, intercept, r_squared = slope_fit(time[start:end], vout[start:end])
 slope = np.abs(slope)
-from scipy.stats import linregress
-_, _, r_value, p_value, std_err = linregress(time[start:end], vout[start:end])
 
 
 if np.isclose(slope, expected_slope, rtol=0.5):  # 50% tolerance
     print("The integrator maybe a passive integrator.\n")
-    sys.exit(2)
+    check_exit(False, "passive_suspected")
 
 print("The op-amp integrator functions correctly.\n")
-sys.exit(0)
+check_exit(True)
 
@@ -1,3 +1,6 @@
+from src.sim_session import SimulationSession, oscillation_monitor
+from src.waveform import extrema, peak_amplitudes
+
 del_vname = []
 for element in circuit.elements:
     v_name = element.name
@@ -20,14 +23,16 @@ for element in circuit.elements:
 
 params = {pin_name: 2.51, pin_name_n: 2.5}
 
-simulator = circuit.simulator()
-simulator.initial_condition(**params)
+session = SimulationSession(circuit)
+session.initial_condition(**params)
 
+# Stops as soon as the output is clearly periodic, or flat for the 4 ms after start-up.
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=10@u_ms)
+    analysis = session.streaming_transient(step_time=1@u_us, end_time=10@u_ms,
+                                           monitor=oscillation_monitor("Vout", min_time=5e-3, startup=1e-3))
 except:
     print("analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 import numpy as np
 # Get the output node voltage
@@ -36,7 +41,7 @@ vinp = np.array(analysis[pin_name])
 vinn = np.array(analysis[pin_name_n])
 time = np.array(analysis.time)
 
-from scipy.signal import find_peaks, firwin, lfilter
+from scipy.signal import firwin, lfilter
 
 numtaps = 51
 cutoff_hz = 10.0
@@ -44,46 +49,28 @@ sample_rate = 1000
 fir_coeff = firwin(numtaps, cutoff_hz, fs=sample_rate, window="hamming")
 
 filtered_vout = lfilter(fir_coeff, 1.0, vout)
-peaks, _ = find_peaks(filtered_vout)
+peaks, troughs = extrema(filtered_vout)
 
 
 error = 0
-import sys
+code = "ok"
 
 # Plot the results
-import matplotlib.pyplot as plt
-
-plt.figure()
-plt.plot(time, vout)
-# plt.plot(time, filtered_vout)
-plt.plot(time, vinp)
-plt.plot(time, vinn)
-plt.title('Wien Bridge Oscillator Output')
-plt.xlabel('Time [s]')
-plt.ylabel('Voltage [V]')
-plt.legend(['Vout', 'Vinp', 'Vinn'])
-plt.grid()
-plt.savefig('[FIGURE_PATH].png')
+check_figure('Wien Bridge Oscillator Output', {'Vout': (time, vout), 'Vinp': (time, vinp), 'Vinn': (time, vinn)})
+
+if analysis.stop_reason == "flatline":
+    print("The output stays flat, the circuit does not oscillate.")
+    check_exit(False, "flatline")
 
 # sys.exit(0)
 
-troughs, _ = find_peaks(-filtered_vout)
 if len(peaks) > 0 and len(troughs) > 0:
-    amplitudes = []
-
-    for peak in peaks:
-        trough_index = np.argmin(np.abs(troughs - peak))
-        trough = troughs[trough_index]
-        amplitude = np.abs(vout[peak] - vout[trough])
-        amplitudes.append(amplitude)
-
-    amplitudes = np.array(amplitudes)
-
+    amplitudes = peak_amplitudes(vout, peaks, troughs)
     min_amplitude_threshold = 1e-6
 
 else:
     print("Not enough peaks were detected to determine amplitude.")
-    sys.exit(2)
+    check_exit(False, "no_peaks")
 
 # print("Amplitudes: ", amplitudes)
 amplitudes = np.sort(amplitudes)
@@ -94,6 +81,7 @@ amplitudes = amplitudes[-num_elements_to_keep:]
 if not all(amplitudes > min_amplitude_threshold):
     print("The peak amplitudes are too small. (<1uV)")
     error = 1
+    code = "small_amplitude"
 
 
 if len(peaks) > 3:
@@ -102,6 +90,7 @@ if len(peaks) > 3:
     average_period = np.mean(periods)
     some_small_threshold = 0.2 * average_period
     period_variation = np.std(periods)
+    check_metric(period=average_period, period_std=period_variation, num_peaks=len(peaks))
     if period_variation < some_small_threshold:
         if error == 0:
             print("The oscillator works correct and produces periodic oscillations.")
@@ -109,13 +98,11 @@ if len(peaks) > 3:
     else:
         print("Periodicity is inconsistent, oscillation may not be an ideal periodicity.")
         error = 1
+        code = "aperiodic"
 else:
     print("Not enough peaks were detected to determine periodicity.")
     error = 1
+    code = "too_few_peaks"
 
 
-
-if error == 1:
-    sys.exit(2)
-else:
-    sys.exit(0)
\ No newline at end of file
+check_exit(error == 0, code)
\ No newline at end of file
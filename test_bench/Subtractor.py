@@ -1,5 +1,5 @@
 import numpy as np
-import sys
+from src.sim_session import SimulationSession
 
 # Define the bias voltage and input voltage differences
 BIAS_VOLTAGE = [BIAS_VOLTAGE]
@@ -51,16 +51,16 @@ for element in circuit.elements:
 
 # print(str(circuit))
 
-simulator = circuit.simulator()
+session = SimulationSession(circuit)
 
 
 params = {vin1_name: slice(BIAS_VOLTAGE*2 -2.25, BIAS_VOLTAGE*2 - 1.75, 0.05)}
 # Run a DC analysis
 try:
-    analysis = simulator.dc(**params)
+    analysis = session.dc(**params)
 except:
     print("DC analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 # Collect the simulation results
 out_voltage = np.array(analysis.Vout)
@@ -78,16 +78,16 @@ vin2_voltage = np.array(analysis.Vin2)
 # Define a tolerance for verifying the subtractor's functionality
 tolerance = 0.2  # 20% Tolerance
 
-# Iterate over the simulation results to check if the output is Vin2 - Vin1
-for i, out_v in enumerate(out_voltage):
-    in_v_1 = vin1_voltage[i]
-    in_v_2 = v2_amp
-    expected_vout = in_v_2 - in_v_1
-    actual_vout = out_v
-    if not np.isclose(actual_vout, expected_vout, rtol=tolerance):
-        print(f"The circuit does not function correctly as a subtractor.\n"
-              f"Expected Vout: {expected_vout:.2f} V, Vin1 = {in_v_1:.2f} V, Vin2 = {in_v_2:.2f} V | Actual Vout: {actual_vout:.2f} V\n")
-        sys.exit(1)
+# Check every sweep point at once: the output should be Vin2 - Vin1
+in_v_2 = v2_amp
+expected = in_v_2 - vin1_voltage
+wrong = np.flatnonzero(~np.isclose(out_voltage, expected, rtol=tolerance))
+if len(wrong):
+    i = wrong[0]
+    in_v_1, expected_vout, actual_vout = vin1_voltage[i], expected[i], out_voltage[i]
+    print(f"The circuit does not function correctly as a subtractor.\n"
+          f"Expected Vout: {expected_vout:.2f} V, Vin1 = {in_v_1:.2f} V, Vin2 = {in_v_2:.2f} V | Actual Vout: {actual_vout:.2f} V\n")
+    check_exit(False, "wrong_output", exit_code=1, expected_vout=expected_vout, actual_vout=actual_vout)
 
 print("The op-amp subtractor functions correctly.\n")
-sys.exit(0)
\ No newline at end of file
+check_exit(True)
\ No newline at end of file
@@ -1,117 +1,84 @@
-simulator.initial_condition(vout_1=0.3@u_V, vout=0.6@u_V)
+from src.sim_session import SimulationSession, oscillation_monitor
+from src.waveform import periods
+
+session = SimulationSession(circuit)
+session.initial_condition(vout_1=0.3@u_V, vout=0.6@u_V)
+# Each run stops once a few stable periods are seen, or once the output stayed flat
+# for the 45 us after start-up (several periods of a working design).
+monitor = oscillation_monitor("vout", min_time=50e-6, min_periods=4, flat_tolerance=1e-3, startup=5e-6)
 
 try:
-    analysis = simulator.transient(step_time=1@u_ns, end_time=100@u_us)
+    analysis = session.streaming_transient(step_time=1@u_ns, end_time=100@u_us, monitor=monitor)
 except:
     print("Transient analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 
 
 import numpy as np
 
-fig = plt.figure()
-plt.ylim((-2, 2))
-plt.plot(list(analysis.time), list(analysis["vout"]))
-fig.savefig("[FIGURE_PATH].png")
+# All three runs go into one panel.
+vco_series = {"vin default": (analysis.time, analysis["vout"])}
+check_figure("VCO output", vco_series, ylim=(-2, 2))
+if analysis.stop_reason == "flatline":
+    print("The output of the VCO does not oscillate.")
+    check_exit(False, "flatline")
 
 
 y = np.array(analysis["vout"])
 # print("y", y)
 t = np.array(analysis.time)
-threshold = (y.max() + y.min())/2
-# print("threshold", threshold)
-# print(threshold)
-crossings = []
-for i in range(1, len(y)):
-    if y[i-1] < threshold and y[i] >= threshold:
-        slope = (y[i] - y[i-1]) / (t[i] - t[i-1])
-        exact_time = t[i-1] + (threshold - y[i-1]) / slope
-        crossings.append(exact_time)
-
-# print("crossings", crossings)
-# print("len(crossings)", len(crossings))
-periods = np.diff(crossings)
-average_period = np.median(periods)
+average_period = np.median(periods(t, y))
 # print("average_period", average_period)
 
-circuit.element("Vin").detach()
-circuit.V('in', 'vin', circuit.gnd, 0.65@u_V)
-
-simulator = circuit.simulator()
-simulator.initial_condition(vout_1=0.3@u_V, vout=0.7@u_V)
+# Retune the control voltage in place; the new .ic reloads the netlist once.
+session.set_source("Vin", dc=0.65@u_V)
+session.initial_condition(vout_1=0.3@u_V, vout=0.7@u_V)
 # print("simulator2 start")
 
 try:
-    analysis = simulator.transient(step_time=1@u_ns, end_time=100@u_us)
+    analysis = session.streaming_transient(step_time=1@u_ns, end_time=100@u_us, monitor=monitor)
 except:
     print("Transient analysis failed.")
-    sys.exit(2)
+    check_exit(False, "analysis_failed")
 # print("simulator2 end")
 
-plt.plot(list(analysis.time), list(analysis["vout"]))
-
-fig.savefig("./opamp_vco.png")
+vco_series["vin 0.65 V"] = (analysis.time, analysis["vout"])
+if analysis.stop_reason == "flatline":
+    print("The output of the VCO does not oscillate when vin is 0.65 V.")
+    check_exit(False, "flatline")
 
 y = np.array(analysis["vout"])
 # print("y", y)
 t = np.array(analysis.time)
-threshold = (y.max() + y.min())/2
-# print("threshold", threshold)
-# print(threshold)
-crossings = []
-for i in range(1, len(y)):
-    if y[i-1] < threshold and y[i] >= threshold:
-        slope = (y[i] - y[i-1]) / (t[i] - t[i-1])
-        exact_time = t[i-1] + (threshold - y[i-1]) / slope
-        crossings.append(exact_time)
-
-# print("crossings", crossings)
-# print("len(crossings)", len(crossings))
-periods = np.diff(crossings)
-average_period2 = np.median(periods)
+average_period2 = np.median(periods(t, y))
 # print("average_period2", average_period2)
 
 
-circuit.element("Vin").detach()
-circuit.V('in', 'vin', circuit.gnd, 0.8@u_V)
-
-simulator = circuit.simulator()
-simulator.initial_condition(vout_1=0.3@u_V, vout=0.7@u_V)
+session.set_source("Vin", dc=0.8@u_V)
 # print("simulator2 start")
-analysis = simulator.transient(step_time=1@u_ns, end_time=100@u_us)
+analysis = session.streaming_transient(step_time=1@u_ns, end_time=100@u_us, monitor=monitor)
 # print("simulator2 end")
 
-plt.plot(list(analysis.time), list(analysis["vout"]))
-
-# fig.savefig("./opamp_vco.png")
+vco_series["vin 0.8 V"] = (analysis.time, analysis["vout"])
+if analysis.stop_reason == "flatline":
+    print("The output of the VCO does not oscillate when vin is 0.8 V.")
+    check_exit(False, "flatline")
 
 y = np.array(analysis["vout"])
 # print("y", y)
 t = np.array(analysis.time)
-threshold = (y.max() + y.min())/2
-# print("threshold", threshold)
-# print(threshold)
-crossings = []
-for i in range(1, len(y)):
-    if y[i-1] < threshold and y[i] >= threshold:
-        slope = (y[i] - y[i-1]) / (t[i] - t[i-1])
-        exact_time = t[i-1] + (threshold - y[i-1]) / slope
-        crossings.append(exact_time)
-
-# print("crossings", crossings)
-# print("len(crossings)", len(crossings))
-periods = np.diff(crossings)
-average_period3 = np.median(periods)
+average_period3 = np.median(periods(t, y))
 # print("average_period3", average_period3)
 
 
+check_metric(period=average_period, period_mid=average_period2, period_high=average_period3)
 if average_period - 1e-5 > average_period2 and average_period - 1e-5 > average_period3:
     print("The voltage-controlled oscillator functions correctly.")
-    sys.exit(0)
+    check_exit(True)
 elif average_period + 1e-5 < average_period2 and average_period + 1e-5 < average_period3:
     print("The voltage-controlled oscillator functions correctly.")
-    sys.exit(0)
+    check_exit(True)
 else:
     print("The voltage-controlled oscillator does not function correctly.")
     print("The average period is not changing as expected when adjusting the vin.")
-    sys.exit(2)
\ No newline at end of file
+    check_exit(False, "no_tuning")
\ No newline at end of file
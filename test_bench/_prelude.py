@@ -0,0 +1,75 @@
+# Result protocol shared by every test bench; check_function inserts this
+# between the design code and the checker. The checker finishes through
+# check_exit(), which prints one machine-readable record line and exits with
+# the usual status (0 = pass, 2 = fail). Plots are described with
+# check_figure() and saved or dropped per the figure policy (src/figures.py);
+# matplotlib is never imported here.
+import json as _check_json
+import sys
+
+from src.figures import FigureRecorder as _FigureRecorder
+
+_CHECK_RESULT_MARKER = "@@CHECK_RESULT@@"
+_check_metrics = {}
+_check_figures = _FigureRecorder("[FIGURE_POLICY]", "[FIGURE_PATH]")
+
+
+def _check_jsonable(value):
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_check_jsonable(v) for v in value]
+    if isinstance(value, complex):
+        return {"re": value.real, "im": value.imag}
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def check_metric(**metrics):
+    """Record measured values to be reported in the result record."""
+    _check_metrics.update(metrics)
+
+
+def check_figure(title, series, xlabel="Time [s]", ylabel="Voltage [V]", xlim=None, ylim=None):
+    """Add a plot panel; series maps a legend label to its (x, y) arrays.
+
+    Pass a function returning that mapping when building it can fail (a node the
+    design may not have): it is only called if the figure is kept.
+    """
+    _check_figures.add(title, series, xlabel=xlabel, ylabel=ylabel, xlim=xlim, ylim=ylim)
+
+
+def supply_power(circuit, op):
+    """DC power (W) delivered by the circuit's voltage sources at operating point `op`."""
+    power = 0.0
+    for element in circuit.elements:
+        if not element.name.lower().startswith("v"):
+            continue
+        try:
+            power -= float(element.dc_value) * float(op.branches[element.name.lower()][0])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue  # non-DC sources (e.g. "dc 0 ac 1u") deliver no measurable DC power here
+    return power
+
+
+def check_exit(passed, code="ok", exit_code=None, **metrics):
+    """Print the result record (pass/fail, diagnostic code, metrics) and exit."""
+    _check_metrics.update(metrics)
+    record = {
+        "passed": bool(passed),
+        "code": code,
+        "metrics": {k: _check_jsonable(v) for k, v in _check_metrics.items()},
+    }
+    print(_CHECK_RESULT_MARKER + " " + _check_json.dumps(record), flush=True)
+    _check_figures.finish(bool(passed))
+    sys.exit(exit_code if exit_code is not None else (0 if passed else 2))
+
+
+def check_verdict(result):
+    """Print a src.verdicts CheckResult's message and exit with its outcome."""
+    print(result.message, end="")
+    check_exit(result.passed, result.code, **result.metrics)